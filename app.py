@@ -4,19 +4,14 @@ from pathlib import Path
 from dotenv import load_dotenv
 import streamlit as st
 from datetime import datetime
+from typing import Iterator
 import base64
 
-from langchain_community.vectorstores import FAISS
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain.schema import Document
-from langchain.prompts import ChatPromptTemplate
 
-from utils import truncate
-from rate_limiter import (
-    check_global_limit, 
-    increment_usage,
-    get_usage_display
-)
+from core.canned import TOPICS, LIBRARY, NAV_TOPICS, SUGGESTIONS
+from core.engine import ENGINE_URL, EngineClient, get_engine
+from rate_limiter import LIMIT_MESSAGE, QueryLimitError
 
 load_dotenv()
 
@@ -28,10 +23,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-VSTORE_DIR = Path("vectorstore/faiss_index")
-EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
-CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
-
 # Load mascot image
 def get_image_base64(image_path):
     try:
@@ -154,48 +145,58 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- Vector Store ---
+# --- Engine ---
 @st.cache_resource(show_spinner=False)
-def get_vectorstore():
-    if not VSTORE_DIR.exists():
-        raise RuntimeError("Vector store not found. Run `python ingest.py` first.")
-    embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
-    vs = FAISS.load_local(str(VSTORE_DIR), embeddings, allow_dangerous_deserialization=True)
-    return vs
+def get_rag():
+    """The engine at ENGINE_URL (`python -m core.engine`), or one in this process if unset."""
+    return EngineClient(ENGINE_URL) if ENGINE_URL else get_engine()
 
-def retrieve(query: str, k: int = 6) -> list[Document]:
-    vs = get_vectorstore()
-    docs = vs.similarity_search(query, k=k)
-    return docs
+def check_global_limit() -> tuple[bool, str | None]:
+    """The global query limit as the engine counts it (with ENGINE_URL, its usage file, not ours)."""
+    if get_rag().usage()["remaining"] <= 0:
+        return False, LIMIT_MESSAGE
+    return True, None
 
-SYSTEM_PROMPT = (
-    "You are MustangsAI, the official AI assistant for MSU Texas (Midwestern State University)."
-    " You are helpful, friendly, professional, and enthusiastic about MSU Texas."
-    " Answer questions using ONLY the provided context from official MSU sources."
-    " If you see names, titles, emails, or phone numbers in the context, share them clearly."
-    " Be specific with dates and deadlines. Keep responses clear and student-friendly."
-)
+def retrieve(query: str, k: int = 6, category: str | None = None) -> list[Document]:
+    """Hybrid search; `category` (core.categories) limits it to that shard, else all shards are searched."""
+    return get_rag().retrieve(query, k=k, category=category)
 
-PROMPT_TMPL = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM_PROMPT),
-    ("human", "Question: {question}\n\nContext:\n{context}\n\nAnswer:"),
-])
+def answer_query(q: str, k: int = 6) -> tuple[str | Iterator[str], list[dict]]:
+    """(answer, citations) from the engine; a freshly generated answer is streamed (see RagEngine.answer)."""
+    return get_rag().answer(q, k=k)
 
-def answer_with_citations(question: str, docs: list[Document]) -> tuple[str, list[dict]]:
-    context = "\n\n".join([d.page_content for d in docs])
-    llm = ChatOpenAI(model=CHAT_MODEL, temperature=0)
-    prompt = PROMPT_TMPL.format_messages(question=question, context=context)
-    resp = llm.invoke(prompt)
-    
-    cites = []
-    for d in docs:
-        meta = d.metadata or {}
-        src = meta.get("source") or meta.get("file_path") or "Unknown source"
-        cites.append({
-            "source": src,
-            "preview": truncate(d.page_content, 220),
-        })
-    return resp.content.strip(), cites
+def show_sources(cites: list[dict]) -> None:
+    if cites:
+        with st.expander("📚 View Sources", expanded=False):
+            for i, c in enumerate(cites, 1):
+                st.markdown(f"**Source {i}:** [{c['source']}]({c['source']})")
+                st.caption(c['preview'])
+                if i < len(cites):
+                    st.markdown("---")
+
+def ask(q: str, k: int = 6) -> None:
+    """
+    Render one exchange and add it to the history: the sources appear as soon as
+    retrieval is done, then the answer streams in above them token by token.
+    """
+    with st.chat_message("user"):
+        st.write(q)
+    with st.chat_message("assistant"):
+        with st.spinner("Searching..."):
+            try:
+                ans, cites = answer_query(q, k=k)
+            except QueryLimitError as e:
+                # the engine enforces the limit; the checks above can be a moment behind
+                st.error(str(e))
+                return
+        body = st.container()
+        show_sources(cites)
+        with body:
+            if isinstance(ans, str):
+                st.write(ans)
+            else:
+                ans = st.write_stream(ans)
+    st.session_state.history.append((q, ans, cites))
 
 # --- Session State ---
 if "chat_started" not in st.session_state:
@@ -227,17 +228,9 @@ if not st.session_state.chat_started:
     # Row 1: All 5 buttons
     col1, col2, col3, col4, col5 = st.columns(5)
     
-    topics = [
-        ("Admissions", "What are the admission requirements for MSU Texas?"),
-        ("Financial Aid", "How do I apply for financial aid?"),
-        ("Campus Events", "What events are happening on campus?"),
-        ("Registrar", "What is the deadline for dropping classes?"),
-        ("Housing", "What are the housing requirements?")
-    ]
-    
     cols = [col1, col2, col3, col4, col5]
     
-    for i, (topic_name, question) in enumerate(topics):
+    for i, (topic_name, question, _, _) in enumerate(TOPICS):
         with cols[i]:
             if st.button(topic_name, key=f"topic_{i}", use_container_width=True):
                 allowed, error_msg = check_global_limit()
@@ -251,13 +244,13 @@ if not st.session_state.chat_started:
     # Row 2: Library (centered)
     col_left, col_center, col_right = st.columns([2, 1, 2])
     with col_center:
-        if st.button("Library", key="topic_library", use_container_width=True):
+        if st.button(LIBRARY[0], key="topic_library", use_container_width=True):
             allowed, error_msg = check_global_limit()
             if not allowed:
                 st.error(error_msg)
                 st.stop()
             st.session_state.chat_started = True
-            st.session_state.first_query = "Tell me about the MSU Texas library."
+            st.session_state.first_query = LIBRARY[1]
             st.rerun()
     
     st.markdown("<br><br>", unsafe_allow_html=True)
@@ -301,29 +294,10 @@ else:
         
         st.markdown("### Quick Topics")
         
-        if st.button("📚 Admissions", key="nav_admissions", use_container_width=True):
-            st.session_state.nav_query = "Tell me about admissions to MSU Texas."
-            st.rerun()
-        
-        if st.button("📖 Courses", key="nav_courses", use_container_width=True):
-            st.session_state.nav_query = "What courses and programs are available?"
-            st.rerun()
-        
-        if st.button("📅 Events", key="nav_events", use_container_width=True):
-            st.session_state.nav_query = "What events are happening at MSU Texas?"
-            st.rerun()
-        
-        if st.button("📝 Registrar", key="nav_registrar", use_container_width=True):
-            st.session_state.nav_query = "Tell me about registration and academic records."
-            st.rerun()
-        
-        if st.button("💰 Financial Aid", key="nav_finaid", use_container_width=True):
-            st.session_state.nav_query = "How does financial aid work at MSU Texas?"
-            st.rerun()
-        
-        if st.button("🏛️ Campus Life", key="nav_campus", use_container_width=True):
-            st.session_state.nav_query = "Tell me about campus life and student organizations."
-            st.rerun()
+        for key, label, question, _, _ in NAV_TOPICS:
+            if st.button(label, key=key, use_container_width=True):
+                st.session_state.nav_query = question
+                st.rerun()
         
         st.markdown("<br>" * 10, unsafe_allow_html=True)
         
@@ -335,17 +309,13 @@ else:
         """, unsafe_allow_html=True)
     
     with col_main:
+        # Questions from the welcome screen and buttons are answered below the history
+        pending = None
+        
         # Process first query
         if hasattr(st.session_state, 'first_query') and st.session_state.first_query:
-            q = st.session_state.first_query
+            pending = st.session_state.first_query
             del st.session_state.first_query
-            
-            with st.spinner("Searching..."):
-                docs = retrieve(q, k=6)
-                ans, cites = answer_with_citations(q, docs)
-                increment_usage()
-            
-            st.session_state.history.append((q, ans, cites))
         
         # Handle sidebar navigation
         if hasattr(st.session_state, 'nav_query') and st.session_state.nav_query:
@@ -357,16 +327,10 @@ else:
                 st.warning("Query limit reached.")
                 st.stop()
             
-            with st.spinner("Searching..."):
-                docs = retrieve(q, k=6)
-                ans, cites = answer_with_citations(q, docs)
-                increment_usage()
-            
-            st.session_state.history.append((q, ans, cites))
-            st.rerun()
+            pending = q
         
         # Welcome message
-        if len(st.session_state.history) == 0:
+        if len(st.session_state.history) == 0 and not pending:
             st.markdown("""
             <div style="background: white; border-radius: 15px; padding: 1.5rem; margin-bottom: 1rem; box-shadow: 0 2px 8px rgba(0,0,0,0.08); max-width: 600px;">
                 <p><strong>Welcome to MustangsAI!</strong> I'm here to help you with any questions 
@@ -375,14 +339,7 @@ else:
             """, unsafe_allow_html=True)
             
             cols = st.columns(2)
-            suggestions = [
-                "Tell me about the admission requirements.",
-                "What courses are available?",
-                "When do events happen?",
-                "Financial aid information"
-            ]
-            
-            for i, suggestion in enumerate(suggestions):
+            for i, (suggestion, _, _) in enumerate(SUGGESTIONS):
                 col = cols[i % 2]
                 with col:
                     if st.button(suggestion, key=f"suggest_{i}"):
@@ -399,13 +356,7 @@ else:
                 st.warning("Query limit reached.")
                 st.stop()
             
-            with st.spinner("Searching..."):
-                docs = retrieve(q, k=6)
-                ans, cites = answer_with_citations(q, docs)
-                increment_usage()
-            
-            st.session_state.history.append((q, ans, cites))
-            st.rerun()
+            pending = q
         
         # Display history
         for idx, (u, a, cites) in enumerate(st.session_state.history):
@@ -428,13 +379,10 @@ else:
                         add_feedback(u, a, 'negative')
                         st.info("We'll improve!")
                 
-                if cites:
-                    with st.expander("📚 View Sources", expanded=False):
-                        for i, c in enumerate(cites, 1):
-                            st.markdown(f"**Source {i}:** [{c['source']}]({c['source']})")
-                            st.caption(c['preview'])
-                            if i < len(cites):
-                                st.markdown("---")
+                show_sources(cites)
+        
+        if pending:
+            ask(pending, k=6)
         
         # Footer disclaimer BEFORE chat input
         st.markdown("""
@@ -453,22 +401,4 @@ else:
                 st.info("Want unlimited access? Email saimudragada1@gmail.com")
                 st.stop()
             
-            with st.chat_message("user"):
-                st.write(q)
-            
-            with st.spinner("Searching..."):
-                docs = retrieve(q, k=6)
-                ans, cites = answer_with_citations(q, docs)
-                increment_usage()
-            
-            st.session_state.history.append((q, ans, cites))
-            
-            with st.chat_message("assistant"):
-                st.write(ans)
-                if cites:
-                    with st.expander("📚 View Sources", expanded=False):
-                        for i, c in enumerate(cites, 1):
-                            st.markdown(f"**Source {i}:** [{c['source']}]({c['source']})")
-                            st.caption(c['preview'])
-                            if i < len(cites):
-                                st.markdown("---")
\ No newline at end of file
+            ask(q, k=6)
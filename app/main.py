@@ -1,20 +1,18 @@
 # app/main.py
 import os
 import re
-from typing import List, Dict, Tuple
+from typing import Iterator, List, Dict, Tuple
 
 import streamlit as st
 from dotenv import load_dotenv
-import requests
 
-import chromadb
-from chromadb.utils import embedding_functions
+from core.clients import get_gemini_client
+from core.rerank import RERANK, RERANK_TOP_K, get_reranker
+from core.retrievers import RETRIEVER, load_retriever
 
 # ---------- Load env ----------
 load_dotenv()
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-CHROMA_DIR = os.getenv("CHROMA_DIR", "./data/chroma")
-EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 
 # ---------- UI theming ----------
 MAROON = "#7A0019"
@@ -54,38 +52,28 @@ with st.sidebar:
     if not GEMINI_API_KEY:
         st.warning("Add GEMINI_API_KEY in your .env file.", icon="⚠️")
 
-# ---------- Connect to Chroma ----------
-client = chromadb.PersistentClient(path=CHROMA_DIR)
-collection = client.get_or_create_collection(
-    name="msu_docs",
-    metadata={"hnsw:space": "cosine"},
-    embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(
-        model_name=EMBED_MODEL
-    ),
-)
+# ---------- Retriever ----------
+@st.cache_resource(show_spinner=False)
+def get_retriever():
+    """Backend from RETRIEVER (chroma, faiss or local; see core.retrievers), Chroma by default."""
+    return load_retriever(RETRIEVER or "chroma", get_reranker() if RERANK else None)
 
 # ---------- Retrieval ----------
 def retrieve(query: str, k: int = 8) -> Tuple[List[Dict], str]:
-    """Query Chroma. Returns (hits, error_message_or_empty)."""
+    """
+    Hybrid query through the configured backend. Returns (hits, error_message_or_empty);
+    `score` is the dense similarity where the backend reports one, else 0.
+    """
     try:
-        res = collection.query(
-            query_texts=[query],
-            n_results=k,
-            include=["metadatas", "documents", "distances"],
-        )
-        if not res["documents"]:
-            return [], ""
-        hits: List[Dict] = []
-        for doc, meta, dist in zip(res["documents"][0], res["metadatas"][0], res["distances"][0]):
-            hits.append({
-                "text": doc,
-                "url": meta["url"],
-                "title": meta.get("title", ""),
-                "score": 1 - float(dist),
-            })
-        return hits, ""
+        docs = get_retriever().search(query, k)
     except Exception as e:
         return [], f"Retrieval error: {e}"
+    return [{
+        "text": d.page_content,
+        "url": d.metadata.get("url") or d.metadata.get("source", ""),
+        "title": d.metadata.get("title", ""),
+        "score": float(d.metadata.get("score", 0.0)),
+    } for d in docs], ""
 
 # ---------- Helpers ----------
 def looks_like_hours_without_times(ctx: List[Dict]) -> bool:
@@ -116,25 +104,16 @@ Context:
 """
 
 # ---------- Gemini API Answer ----------
-def answer_with_llm(question: str, ctx: List[Dict]) -> str:
-    """Calls Google Gemini API for the answer."""
+def stream_llm(question: str, ctx: List[Dict]) -> Iterator[str]:
+    """Streams the Google Gemini answer as text chunks (streamGenerateContent over SSE)."""
     if not GEMINI_API_KEY:
-        return "Sorry, Gemini API key is missing."
+        yield "Sorry, Gemini API key is missing."
+        return
     prompt = build_prompt(question, ctx)
-    endpoint = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-pro:generateContent?key={GEMINI_API_KEY}"
-    headers = {"Content-Type": "application/json"}
-    data = {
-        "contents": [{"parts": [{"text": prompt}]}]
-    }
     try:
-        resp = requests.post(endpoint, headers=headers, json=data)
-        resp.raise_for_status()
-        response_json = resp.json()
-        # Parse Gemini's response
-        answer = response_json['candidates'][0]['content']['parts'][0]['text']
-        return answer
+        yield from get_gemini_client().stream(prompt)
     except Exception as e:
-        return f"Gemini API error: {e}"
+        yield f"Gemini API error: {e}"
 
 # ---------- Chat history ----------
 if "history" not in st.session_state:
@@ -160,41 +139,44 @@ if user_msg:
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
             # 1) retrieve (ctx + rerr MUST be defined in this scope)
-            ctx, rerr = retrieve(user_msg, k=8)
-            # optional debug
-            if debug:
-                with st.expander("Retrieval debug"):
-                    if rerr:
-                        st.error(rerr)
-                    for c in ctx:
-                        st.write(f"{c['score']:.3f} — {c['title'] or c['url']}")
-            # 2) choose reply
-            reply = "Sorry, the information is not available."
-            if rerr:
-                # Retrieval error occurred; keep default reply but show error in debug expander.
-                pass
-            elif not ctx:
-                # No matches; keep default reply.
-                pass
-            elif looks_like_hours_without_times(ctx):
-                # Friendly fallback when we have the Library Hours page but no literal times.
-                cites = "\n".join(f"- [{c.get('title') or c['url']}]({c['url']})" for c in ctx[:3])
-                reply = (
-                    "Library hours vary by date. Please check the Moffett Library Hours page below.\n\n"
-                    "**Citations:**\n" + cites
-                )
-            elif not GEMINI_API_KEY:
-                # Missing API key; keep default reply.
-                pass
-            else:
-                # Try LLM answer with citations
-                try:
-                    body = answer_with_llm(user_msg, ctx)
-                    cites = "\n".join(f"- [{c.get('title') or c['url']}]({c['url']})" for c in ctx[:3])
-                    reply = f"{body}\n\n**Citations:**\n{cites}"
-                except Exception as e:
-                    if debug:
-                        st.error(f"LLM error: {e}")
-                    # keep default reply
+            # with RERANK=1 the cross-encoder keeps the best few (vector order if over budget)
+            ctx, rerr = retrieve(user_msg, k=RERANK_TOP_K if RERANK else 8)
+        # optional debug
+        if debug:
+            with st.expander("Retrieval debug"):
+                if rerr:
+                    st.error(rerr)
+                for c in ctx:
+                    st.write(f"{c['score']:.3f} — {c['title'] or c['url']}")
+        # 2) choose reply
+        reply = "Sorry, the information is not available."
+        stream = None
+        if rerr:
+            # Retrieval error occurred; keep default reply but show error in debug expander.
+            pass
+        elif not ctx:
+            # No matches; keep default reply.
+            pass
+        elif looks_like_hours_without_times(ctx):
+            # Friendly fallback when we have the Library Hours page but no literal times.
+            cites = "\n".join(f"- [{c.get('title') or c['url']}]({c['url']})" for c in ctx[:3])
+            reply = (
+                "Library hours vary by date. Please check the Moffett Library Hours page below.\n\n"
+                "**Citations:**\n" + cites
+            )
+        elif not GEMINI_API_KEY:
+            # Missing API key; keep default reply.
+            pass
+        else:
+            # LLM answer streamed above its citations, which show as soon as retrieval is done
+            cites = "\n".join(f"- [{c.get('title') or c['url']}]({c['url']})" for c in ctx[:3])
+            stream = stream_llm(user_msg, ctx)
+        if stream is None:
             st.markdown(reply)
-            st.session_state.history.append({"role": "assistant", "content": reply})
+        else:
+            body = st.container()
+            st.markdown(f"**Citations:**\n{cites}")
+            with body:
+                text = st.write_stream(stream)
+            reply = f"{text}\n\n**Citations:**\n{cites}"
+        st.session_state.history.append({"role": "assistant", "content": reply})
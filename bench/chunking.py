@@ -0,0 +1,125 @@
+"""
+Chunker benchmark: throughput and chunk-size distribution of
+  - core.chunk.split_markdown        (token-aware, linear time)
+  - core.chunk.split_markdown_chars  (previous character-based splitter)
+  - RecursiveCharacterTextSplitter   (used by ingest.chunk_docs)
+
+Run from the repo root:
+    python -m bench.chunking
+    python -m bench.chunking --input notes/*.md --model text-embedding-3-small
+Without --input it uses page markdown cached by the crawler under data/http_cache,
+falling back to a synthetic corpus.
+"""
+import argparse
+import glob
+import json
+import random
+import statistics
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from core.chunk import EMBED_MODEL, MAX_TOKENS, OVERLAP_TOKENS, split_markdown, split_markdown_chars
+from core.http_cache import CACHE_DIR
+from core.tokens import token_counter
+
+
+def synthetic_corpus(n_docs: int = 200, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    vocab = ("student housing admission deadline tuition semester registrar financial aid "
+             "scholarship campus library hours office policy application transcript course "
+             "program degree faculty department advising orientation residence").split()
+    docs = []
+    for _ in range(n_docs):
+        blocks = []
+        for s in range(rng.randint(2, 6)):
+            blocks.append(f"## Section {s}")
+            for _ in range(rng.randint(1, 6)):
+                blocks.append(" ".join(rng.choice(vocab) for _ in range(rng.randint(20, 160))) + ".")
+            if rng.random() < 0.2:   # a table flattened to one long block
+                blocks.append(" | ".join(rng.choice(vocab) for _ in range(rng.randint(400, 900))))
+        docs.append("\n\n".join(blocks))
+    return docs
+
+
+def load_corpus(inputs: List[str]) -> List[str]:
+    if inputs:
+        return [Path(p).read_text(errors="ignore") for pat in inputs for p in glob.glob(pat)]
+    docs = []
+    for p in CACHE_DIR.glob("**/*.parsed.html.json"):
+        try:
+            docs.append(json.loads(p.read_text())["value"]["markdown"])
+        except (OSError, ValueError, KeyError, TypeError):
+            continue
+    return docs or synthetic_corpus()
+
+
+def langchain_splitter() -> Callable[[str], List[str]] | None:
+    try:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    except ImportError:
+        return None
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1200, chunk_overlap=200)
+    return splitter.split_text
+
+
+def timed(fn: Callable[[str], List[str]], docs: List[str], repeat: int) -> tuple:
+    best, chunks = float("inf"), []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        chunks = [c for d in docs for c in fn(d)]
+        best = min(best, time.perf_counter() - t0)
+    return best, chunks
+
+
+def describe(sizes: List[int], budget: int) -> Dict[str, float]:
+    q = statistics.quantiles(sizes, n=10) if len(sizes) > 1 else sizes * 9
+    return {
+        "min": min(sizes), "p50": statistics.median(sizes), "p90": q[-1], "max": max(sizes),
+        "over": 100.0 * sum(s > budget for s in sizes) / len(sizes),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--input", nargs="*", default=[], help="markdown/text files (globs ok)")
+    ap.add_argument("--model", default=EMBED_MODEL, help="tokenizer used for the token budget and stats")
+    ap.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--scaling", type=int, default=400_000, help="chars in the single-document scaling test")
+    args = ap.parse_args()
+
+    docs = load_corpus(args.input)
+    count = token_counter(args.model)
+    # tokenizer time is part of the token chunker's cost, so let it warm up once first
+    count("warm up")
+    chars = sum(len(d) for d in docs)
+
+    splitters = {
+        "split_markdown (tokens)": lambda d: split_markdown(d, args.max_tokens, OVERLAP_TOKENS, count),
+        "split_markdown_chars": split_markdown_chars,
+    }
+    lc = langchain_splitter()
+    if lc:
+        splitters["RecursiveCharacterTextSplitter"] = lc
+
+    print(f"Corpus: {len(docs)} docs, {chars / 1e6:.2f} MB; token budget {args.max_tokens} ({args.model})\n")
+    print(f"{'splitter':32} {'MB/s':>8} {'chunks':>7} {'min':>5} {'p50':>6} {'p90':>6} {'max':>6} {'>budget':>8}")
+    for name, fn in splitters.items():
+        secs, chunks = timed(fn, docs, args.repeat)
+        st = describe([count(c) for c in chunks], args.max_tokens)
+        print(f"{name:32} {chars / 1e6 / secs:8.2f} {len(chunks):7d} {st['min']:5.0f} {st['p50']:6.0f} "
+              f"{st['p90']:6.0f} {st['max']:6.0f} {st['over']:7.1f}%")
+
+    # one large document at 1x and 4x size: linear splitters should scale ~4x
+    print(f"\nScaling on a single document ({args.scaling / 1e3:.0f}k -> {4 * args.scaling / 1e3:.0f}k chars):")
+    big = "\n\n".join(synthetic_corpus(400, seed=11))
+    small_doc, large_doc = (big * 20)[:args.scaling], (big * 80)[:4 * args.scaling]
+    for name, fn in splitters.items():
+        t1, _ = timed(fn, [small_doc], 1)
+        t4, _ = timed(fn, [large_doc], 1)
+        print(f"  {name:32} {t1:7.3f}s -> {t4:7.3f}s  (x{t4 / t1:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Rerank benchmark: prompt tokens and latency per question with
+  - vector order   (the k best hybrid search hits go into the prompt)
+  - reranked       (RERANK_CANDIDATES hits, the cross-encoder keeps RERANK_TOP_K)
+
+Run from the repo root against the live FAISS index:
+    python -m bench.rerank
+    python -m bench.rerank --answer "When is the last day to drop a class?"
+Without questions it uses the canned ones (core.canned). Retrieval latency is always
+measured; --answer also generates each answer, for end-to-end latency.
+"""
+import argparse
+import statistics
+import time
+from typing import Dict, List
+
+from core.canned import canned_questions
+from core.context import build_context
+from core.rag import (CHAT_MODEL, PROMPT_TMPL, answer_with_citations, load_lexical, load_shards,
+                      load_vectorstore, search)
+from core.rerank import RERANK_CANDIDATES, RERANK_TOP_K, Reranker, get_reranker
+from core.tokens import token_counter
+
+
+def run(question: str, k: int, reranker: Reranker | None, answer: bool, index, count) -> Dict[str, float]:
+    vs, lexical, shards = index
+    t0 = time.perf_counter()
+    docs = search(vs, question, k=RERANK_TOP_K if reranker else k, lexical=lexical, shards=shards,
+                  reranker=reranker)
+    retrieved = time.perf_counter() - t0
+    context = "\n\n".join(p["text"] for p in build_context(docs, count))
+    tokens = count(PROMPT_TMPL.format(question=question, context=context))
+    if answer:
+        answer_with_citations(question, docs)
+    return {"tokens": tokens, "retrieve_ms": retrieved * 1000, "total_ms": (time.perf_counter() - t0) * 1000}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("questions", nargs="*", help="defaults to the canned questions")
+    ap.add_argument("--k", type=int, default=6, help="passages sent without reranking")
+    ap.add_argument("--answer", action="store_true", help="also generate answers (end-to-end latency)")
+    args = ap.parse_args()
+
+    vs = load_vectorstore()
+    index = (vs, load_lexical(), load_shards(vs))
+    reranker = get_reranker()
+    if not reranker.warm():
+        raise SystemExit(f"Reranker {reranker.model_name} could not be loaded")
+    count = token_counter(CHAT_MODEL)
+    questions = args.questions or list(canned_questions())
+
+    print(f"{len(questions)} questions; vector top {args.k} vs rerank {RERANK_CANDIDATES} -> {RERANK_TOP_K} "
+          f"({reranker.model_name})\n")
+    cols = ["tokens", "retrieve_ms"] + (["total_ms"] if args.answer else [])
+    print(f"{'question':50} " + " ".join(f"{c:>19}" for c in cols))
+    rows: List[tuple] = []
+    for q in questions:
+        before = run(q, args.k, None, args.answer, index, count)
+        after = run(q, args.k, reranker, args.answer, index, count)
+        rows.append((before, after))
+        print(f"{q[:50]:50} " + " ".join(f"{before[c]:8.0f} -> {after[c]:8.0f}" for c in cols))
+    mean = {c: (statistics.mean(b[c] for b, _ in rows), statistics.mean(a[c] for _, a in rows)) for c in cols}
+    print(f"{'mean':50} " + " ".join(f"{mean[c][0]:8.0f} -> {mean[c][1]:8.0f}" for c in cols))
+    print(f"\n{reranker.summary()}")
+
+
+if __name__ == "__main__":
+    main()
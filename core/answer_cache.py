@@ -0,0 +1,143 @@
+# core/answer_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from core.canned import canned_questions
+from core.query_cache import normalize_query
+
+DAY = 86400.0
+
+# How long a cached answer stays fresh, by question category
+ANSWER_TTL_DAYS = {
+    "events": 1,
+    "calendar": 1,
+    "general": 7,
+    "policy": 30,
+}
+DEFAULT_TTL_DAYS = 7
+
+_versions: Dict[Tuple, str] = {}
+_versions_lock = threading.Lock()
+
+
+def index_version(index_dir: Path) -> str:
+    """Content hash of the live index generation's vector store files, memoized on size and mtime."""
+    from core.docstore import index_dir as live_dir
+
+    files = sorted(p for p in live_dir(index_dir).glob("*")
+                   if p.is_file() and p.name.startswith(("index.", "docstore.", "chroma.")))
+    stamp = tuple((str(p), p.stat().st_size, p.stat().st_mtime_ns) for p in files)
+    with _versions_lock:
+        if stamp in _versions:
+            return _versions[stamp]
+    h = hashlib.sha1()
+    for p in files:
+        h.update(p.name.encode())
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    version = h.hexdigest()[:16]
+    with _versions_lock:
+        _versions[stamp] = version
+    return version
+
+
+class AnswerCache:
+    """Canned-question answers stored next to the index, tagged with index_version() and a per-category TTL."""
+
+    def __init__(self, index_dir: Path, path: Path | None = None):
+        self.index_dir = Path(index_dir)
+        self.path = Path(path) if path else self.index_dir / "answer_cache.json"
+        self.categories = {normalize_query(q): cat for q, cat in canned_questions().items()}
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+        self._mtime = None
+        self.hits = 0
+        self.misses = 0
+
+    def _reload(self) -> None:
+        """Pick up entries written by another process (e.g. ingest) since the last read."""
+        try:
+            mtime = self.path.stat().st_mtime_ns
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            self._entries = json.loads(self.path.read_text()).get("answers", {})
+            self._mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable answer cache {self.path}: {e}")
+
+    def _save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"answers": self._entries}, indent=1))
+        os.replace(tmp, self.path)
+        self._mtime = self.path.stat().st_mtime_ns
+
+    def is_canned(self, question: str) -> bool:
+        return normalize_query(question) in self.categories
+
+    def ttl(self, question: str) -> float:
+        return ANSWER_TTL_DAYS.get(self.categories.get(normalize_query(question)), DEFAULT_TTL_DAYS) * DAY
+
+    def _fresh(self, entry: Dict, question: str, version: str, now: float) -> bool:
+        return entry.get("index_version") == version and now - entry.get("created", 0.0) < self.ttl(question)
+
+    def get(self, question: str, version: str | None = None) -> Optional[Tuple[str, List[dict]]]:
+        """(answer, citations) if a fresh entry exists for `version` (default: the live index), else None."""
+        key = normalize_query(question)
+        if key not in self.categories:
+            return None
+        version = version or index_version(self.index_dir)
+        with self._lock:
+            self._reload()
+            entry = self._entries.get(key)
+            if entry and self._fresh(entry, question, version, time.time()):
+                self.hits += 1
+                return entry["answer"], entry["cites"]
+            self.misses += 1
+        return None
+
+    def put(self, question: str, answer: str, cites: List[dict], version: str | None = None) -> None:
+        key = normalize_query(question)
+        if key not in self.categories:
+            return
+        entry = {"question": question, "answer": answer, "cites": cites,
+                 "index_version": version or index_version(self.index_dir), "created": time.time()}
+        with self._lock:
+            self._reload()
+            self._entries[key] = entry
+            self._save()
+
+    def precompute(self, answer_fn: Callable[[str], Tuple[str, List[dict]]], force: bool = False) -> int:
+        """Generate answers for canned questions that are missing, stale or expired."""
+        version = index_version(self.index_dir)
+        now = time.time()
+        with self._lock:
+            self._reload()
+            stale = [q for q in canned_questions()
+                     if force or not self._fresh(self._entries.get(normalize_query(q), {}), q, version, now)]
+            # drop entries for questions that are no longer canned
+            self._entries = {k: v for k, v in self._entries.items() if k in self.categories}
+        for q in stale:
+            try:
+                answer, cites = answer_fn(q)
+            except Exception as e:
+                logger.warning(f"Could not precompute an answer for {q!r}: {e}")
+                continue
+            self.put(q, answer, cites, version)
+        return len(stale)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"Answer cache: {self.hits} served, {self.misses} generated ({rate:.1f}% hit rate)"
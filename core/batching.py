@@ -0,0 +1,91 @@
+# core/batching.py
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Sequence
+
+from loguru import logger
+
+# Micro-batching of concurrent retrieval calls (0 ms window disables it)
+BATCH_WINDOW_MS = float(os.getenv("RETRIEVAL_BATCH_WINDOW_MS", "5"))   # how long a call waits for company
+BATCH_MAX = int(os.getenv("RETRIEVAL_BATCH_MAX", "32"))                # calls per batch
+BATCH_WORKERS = int(os.getenv("RETRIEVAL_BATCH_WORKERS", "4"))         # batches executing at once
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent calls into batches: submit(item) blocks until fn (a list of
+    items -> a list of results, same order) has run on a batch containing it.
+    """
+
+    def __init__(self, fn: Callable[[List], Sequence], window_ms: float = BATCH_WINDOW_MS,
+                 max_batch: int = BATCH_MAX, workers: int = BATCH_WORKERS, name: str = "batch"):
+        self.fn = fn
+        self.window = max(0.0, window_ms) / 1000
+        self.max_batch = max(1, max_batch)
+        self.name = name
+        self._queue: List[tuple] = []
+        self._cond = threading.Condition()
+        self._running = 0
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name)
+        self._thread: threading.Thread | None = None
+        self.batches = 0
+        self.items = 0
+        self._wait_total = 0.0
+
+    def submit(self, item):
+        fut: Future = Future()
+        with self._cond:
+            self._queue.append((item, fut, time.perf_counter()))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name=f"{self.name}-dispatch", daemon=True)
+                self._thread.start()
+            self._cond.notify_all()
+        return fut.result()
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                if self._running and self.window > 0:
+                    deadline = self._queue[0][2] + self.window
+                    while len(self._queue) < self.max_batch and (left := deadline - time.perf_counter()) > 0:
+                        self._cond.wait(left)
+                batch = self._queue[:self.max_batch]
+                del self._queue[:self.max_batch]
+                self._running += 1
+                started = time.perf_counter()
+                self.batches += 1
+                self.items += len(batch)
+                self._wait_total += sum(started - t for _, _, t in batch)
+            self._pool.submit(self._run, batch)
+
+    def _run(self, batch: List[tuple]) -> None:
+        try:
+            results = list(self.fn([item for item, _, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} calls")
+            for (_, fut, _), res in zip(batch, results):
+                fut.set_result(res)
+        except Exception as e:
+            logger.debug(f"{self.name} batch of {len(batch)} failed: {e}")
+            for _, fut, _ in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+        finally:
+            with self._cond:
+                self._running -= 1
+                self._cond.notify_all()
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {"batches": self.batches, "items": self.items,
+                    "mean_batch": self.items / self.batches if self.batches else 0.0,
+                    "mean_wait_ms": 1000 * self._wait_total / self.items if self.items else 0.0}
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"{self.name}: {s['items']} calls in {s['batches']} batches (mean {s['mean_batch']:.1f}), "
+                f"mean wait {s['mean_wait_ms']:.1f} ms")
@@ -0,0 +1,64 @@
+# core/canned.py
+"""
+Fixed questions behind the buttons in app.py. Each carries a category that sets how
+long its precomputed answer stays fresh (see core.answer_cache.ANSWER_TTL_DAYS) and
+the retrieval shard it searches (core.categories; None searches all of them).
+"""
+from functools import lru_cache
+
+from core.query_cache import normalize_query
+
+# Welcome screen "Most Searched Topics": (label, question, category, shard)
+TOPICS = [
+    ("Admissions", "What are the admission requirements for MSU Texas?", "policy", "admissions"),
+    ("Financial Aid", "How do I apply for financial aid?", "policy", "financial_aid"),
+    ("Campus Events", "What events are happening on campus?", "events", None),
+    ("Registrar", "What is the deadline for dropping classes?", "calendar", "registrar"),
+    ("Housing", "What are the housing requirements?", "policy", "housing"),
+]
+LIBRARY = ("Library", "Tell me about the MSU Texas library.", "general", None)
+
+# Chat sidebar "Quick Topics": (button key, label, question, category, shard)
+NAV_TOPICS = [
+    ("nav_admissions", "📚 Admissions", "Tell me about admissions to MSU Texas.", "policy", "admissions"),
+    ("nav_courses", "📖 Courses", "What courses and programs are available?", "general", "academics"),
+    ("nav_events", "📅 Events", "What events are happening at MSU Texas?", "events", None),
+    ("nav_registrar", "📝 Registrar", "Tell me about registration and academic records.", "calendar", "registrar"),
+    ("nav_finaid", "💰 Financial Aid", "How does financial aid work at MSU Texas?", "policy", "financial_aid"),
+    ("nav_campus", "🏛️ Campus Life", "Tell me about campus life and student organizations.", "general", "student_life"),
+]
+
+# Empty-chat suggestions: (question, category, shard)
+SUGGESTIONS = [
+    ("Tell me about the admission requirements.", "policy", "admissions"),
+    ("What courses are available?", "general", "academics"),
+    ("When do events happen?", "events", None),
+    ("Financial aid information", "policy", "financial_aid"),
+]
+
+
+def _canned():
+    """(question, category, shard) for every canned question."""
+    yield from ((q, cat, shard) for _, q, cat, shard in TOPICS)
+    yield LIBRARY[1:]
+    yield from ((q, cat, shard) for _, _, q, cat, shard in NAV_TOPICS)
+    yield from SUGGESTIONS
+
+
+def canned_questions() -> dict:
+    """question -> category for every canned question."""
+    return {q: cat for q, cat, _ in _canned()}
+
+
+@lru_cache(maxsize=1)
+def _shards() -> dict:
+    return {normalize_query(q): shard for q, _, shard in _canned() if shard}
+
+
+def canned_shard(question: str) -> str | None:
+    """
+    Retrieval shard of a canned question that searches a single shard, else None.
+    Matched like the answer cache (normalize_query), so "what are the housing
+    requirements" searches the same shard as the button's question.
+    """
+    return _shards().get(normalize_query(question))
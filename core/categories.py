@@ -0,0 +1,34 @@
+# core/categories.py
+import urllib.parse
+from typing import List, Tuple
+
+# Retrieval shards. Rules are tried in order, first against a chunk's URL (host + path)
+# and then against the seed-file section its page was listed under; the first keyword
+# hit wins, anything unmatched is "general".
+CATEGORY_RULES: List[Tuple[str, Tuple[str, ...]]] = [
+    ("athletics", ("msumustangs", "athletic", "/sports/")),
+    ("housing", ("housing", "reslife", "residence", "dining")),
+    ("admissions", ("admission", "/visit", "future-students")),
+    ("financial_aid", ("finaid", "financial", "scholarship", "tuition", "business-office", "busoffice", "/cost")),
+    ("registrar", ("registrar", "calendar", "registration", "graduation", "transcript")),
+    ("student_life", ("student-life", "student life", "organization", "/events", "counseling", "wellness",
+                      "career", "student-success", "disability", "international-students", "diversity")),
+    ("academics", ("catalog", "academic", "/distance", "/graduate", "program", "faculty", "people",
+                   "directory", "department", "college", "research")),
+]
+GENERAL = "general"
+CATEGORIES = tuple(name for name, _ in CATEGORY_RULES) + (GENERAL,)
+
+
+def _match(haystack: str) -> str | None:
+    for name, words in CATEGORY_RULES:
+        if any(w in haystack for w in words):
+            return name
+    return None
+
+
+def categorize(url: str, section: str = "") -> str:
+    """Shard for a chunk from `url`, listed under seed-file `section` (if any)."""
+    parts = urllib.parse.urlsplit(url)
+    by_url = _match(f"{parts.netloc}{parts.path}".lower()) if parts.netloc else None
+    return by_url or _match(section.lower()) or GENERAL
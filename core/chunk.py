@@ -1,21 +1,131 @@
 # core/chunk.py
-from typing import List, Dict
+from typing import Callable, Iterator, List, Dict, Tuple
+from itertools import accumulate
+import os
 import re
 import hashlib
 
+from core.tokens import token_counter
+
 # Chunking parameters
+MAX_TOKENS     = int(os.getenv("CHUNK_TOKENS", "240"))          # all-MiniLM-L6-v2 truncates at 256
+OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))   # overlap when wrapping long paragraphs
+EMBED_MODEL    = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Legacy character-based parameters (split_markdown_chars)
 MAX_CHARS = 1200     # max characters per chunk
 OVERLAP   = 200      # overlap between chunks to keep context
 
+_BLOCK_BREAK = re.compile(r"\n\s*\n")
+_HEADING = re.compile(r"#{1,6}\s")
+
 
 def _normalize_ws(text: str) -> str:
     """Collapse whitespace."""
     return re.sub(r"\s+", " ", text).strip()
 
 
-def split_markdown(md: str, max_chars: int = MAX_CHARS, overlap: int = OVERLAP) -> List[str]:
+def _split_word(word: str, n: int, max_tokens: int, count: Callable[[str], int]) -> Iterator[Tuple[str, int]]:
+    """(piece, tokens) for a single word of `n` > max_tokens tokens (a long URL, a run of symbols) cut to fit."""
+    while word:
+        size = max(1, len(word) * max_tokens // max(n, 1))
+        c = count(word[:size])
+        while size > 1 and c > max_tokens:
+            size = max(1, size * 9 // 10)
+            c = count(word[:size])
+        yield word[:size], c
+        word, n = word[size:], n - c
+
+
+def _wrap_words(words: List[str], counts: List[int], max_tokens: int, overlap_tokens: int,
+                count: Callable[[str], int]) -> Iterator[str]:
+    """
+    Hard-wrap one oversized paragraph on word boundaries into pieces of at most `max_tokens`
+    (checked with `count`), consecutive pieces sharing up to `overlap_tokens` of words.
+    """
+    pre = list(accumulate(counts, initial=0))
+    n = len(words)
+    i = j = k = 0
+    while i < n:
+        j = max(j, i + 1)   # always take at least one word
+        while j < n and pre[j + 1] - pre[i] <= max_tokens:
+            j += 1
+        piece = " ".join(words[i:j])
+        while j > i + 1 and (c := count(piece)) > max_tokens:
+            j = i + max(1, min(j - i - 1, (j - i) * max_tokens // c))
+            piece = " ".join(words[i:j])
+        yield piece
+        if j >= n:
+            return
+        k = max(k, i + 1)
+        while pre[j] - pre[k] > overlap_tokens:
+            k += 1
+        i = k
+
+
+def split_markdown(md: str, max_tokens: int = MAX_TOKENS, overlap_tokens: int = OVERLAP_TOKENS,
+                   count: Callable[[str], int] | None = None) -> List[str]:
+    """
+    Split markdown/plaintext into chunks of at most `max_tokens` embedding-model tokens,
+    packing whole paragraphs; headings start a chunk, oversized paragraphs are wrapped.
+    """
+    count = count or token_counter(EMBED_MODEL)
+    chunks: List[str] = []
+    parts: List[str] = []
+    used = 0
+
+    for raw in _BLOCK_BREAK.split(md):
+        b = _normalize_ws(raw)
+        if not b:
+            continue
+        n = count(b)
+
+        # start sections on a fresh chunk unless the current one is still nearly empty
+        if parts and _HEADING.match(b) and used >= max_tokens // 4:
+            chunks.append(" ".join(parts))
+            parts, used = [], 0
+
+        join = 1 if parts else 0   # the space joining two paragraphs can cost a token
+        if used + join + n <= max_tokens:
+            parts.append(b)
+            used += join + n
+            continue
+
+        if n > max_tokens and used < max_tokens // 4:
+            # fold a short lead-in (typically a heading) into the paragraph being wrapped
+            b = " ".join(parts + [b])
+            parts, used = [], 0
+        if parts:
+            chunks.append(" ".join(parts))
+            parts, used = [], 0
+
+        if n <= max_tokens:
+            parts, used = [b], n
+        else:
+            # token counts per distinct word; words longer than a chunk are cut first
+            seen: Dict[str, int] = {}
+            words, counts = [], []
+            for w in b.split(" "):
+                if w not in seen:
+                    seen[w] = count(w)
+                if seen[w] <= max_tokens:
+                    words.append(w)
+                    counts.append(seen[w])
+                    continue
+                for part, c in _split_word(w, seen[w], max_tokens, count):
+                    words.append(part)
+                    counts.append(c)
+            chunks.extend(_wrap_words(words, counts, max_tokens, overlap_tokens, count))
+
+    if parts:
+        chunks.append(" ".join(parts))
+    return chunks
+
+
+def split_markdown_chars(md: str, max_chars: int = MAX_CHARS, overlap: int = OVERLAP) -> List[str]:
     """
     Split markdown/plaintext into overlapping chunks, respecting paragraph breaks when possible.
+    Character-based predecessor of split_markdown, kept for comparison (bench/chunking.py).
     """
     # First split by paragraph-ish breaks
     blocks = re.split(r"\n\s*\n", md)
@@ -69,10 +179,15 @@ def build_docs(doc: Dict, source: str = "msutexas") -> List[Dict]:
     chunks = split_markdown(md)
     base = f"{source}:{hashlib.md5((url + title).encode('utf-8', errors='ignore')).hexdigest()}"
 
+    # ids follow the text, not its position, so an edit re-indexes only the chunks it touched
     out: List[Dict] = []
-    for i, ch in enumerate(chunks):
+    seen: Dict[str, int] = {}
+    for ch in chunks:
+        key = hashlib.md5(ch.encode("utf-8", errors="ignore")).hexdigest()[:16]
+        n = seen.get(key, 0)
+        seen[key] = n + 1
         out.append({
-            "id": f"{base}:{i}",
+            "id": f"{base}:{key}:{n}",
             "text": ch,
             "meta": {"url": url, "title": title},
         })
@@ -0,0 +1,294 @@
+# core/clients.py
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Sequence
+
+import requests
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from core.embed_stage import EMBED_DIMS, OPENAI_BASE_URL, RETRY_STATUS, dims_param
+
+# Shared upstream clients (chat, query embeddings, Gemini)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta")
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+CLIENT_CONNECT_TIMEOUT = float(os.getenv("CLIENT_CONNECT_TIMEOUT", "5"))   # seconds to open a connection
+CLIENT_READ_TIMEOUT = float(os.getenv("CLIENT_READ_TIMEOUT", "60"))        # seconds without a byte from upstream
+CLIENT_RETRIES = int(os.getenv("CLIENT_RETRIES", "3"))                     # after the first attempt
+CLIENT_CONCURRENCY = int(os.getenv("CLIENT_CONCURRENCY", "8"))             # requests in flight per upstream
+CLIENT_POOL_SIZE = int(os.getenv("CLIENT_POOL_SIZE", "16"))                # keep-alive connections per upstream
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+LATENCY_WINDOW = 1000    # recent calls kept for the latency percentiles
+
+
+def _pct(values: Sequence[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+class ApiClient:
+    """
+    Process-wide HTTP client for one upstream API: pooled keep-alive connections, timeouts,
+    jittered retries on errors/429/5xx, and at most `concurrency` requests in flight.
+    """
+
+    def __init__(self, name: str, base_url: str, headers: Dict[str, str] | None = None,
+                 params: Dict[str, str] | None = None, connect_timeout: float = CLIENT_CONNECT_TIMEOUT,
+                 read_timeout: float = CLIENT_READ_TIMEOUT, retries: int = CLIENT_RETRIES,
+                 concurrency: int = CLIENT_CONCURRENCY, pool_size: int = CLIENT_POOL_SIZE):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.params = params or {}
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = max(0, retries)
+        self.session = requests.Session()
+        self.session.headers.update(headers or {})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._slots = threading.BoundedSemaphore(max(1, concurrency))
+        self._lock = threading.Lock()
+        self._ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self._first_ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self._wait_ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+        self.in_flight = 0
+
+    def _acquire(self) -> None:
+        t = time.perf_counter()
+        self._slots.acquire()
+        with self._lock:
+            self.in_flight += 1
+            self._wait_ms.append((time.perf_counter() - t) * 1000)
+
+    def _release(self, started: float, ok: bool) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.calls += 1
+            self.errors += not ok
+            if ok:
+                self._ms.append((time.perf_counter() - started) * 1000)
+        self._slots.release()
+
+    def _send(self, path: str, payload: Dict, stream: bool = False,
+              params: Dict[str, str] | None = None) -> requests.Response:
+        url = self.base_url + path
+        params = {**self.params, **(params or {})}
+        for attempt in range(self.retries + 1):
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt) * random.random()
+            try:
+                r = self.session.post(url, json=payload, params=params, timeout=self.timeout, stream=stream)
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    return r
+                retry_after = r.headers.get("Retry-After")
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    delay = max(delay, min(float(retry_after), BACKOFF_MAX))
+                err = f"HTTP {r.status_code}"
+                r.close()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = type(e).__name__
+            if attempt == self.retries:
+                raise RuntimeError(f"{self.name} request failed after {attempt + 1} attempts: {err}")
+            with self._lock:
+                self.retried += 1
+            logger.warning(f"{self.name} request failed ({err}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+    def post(self, path: str, payload: Dict, params: Dict[str, str] | None = None) -> Dict:
+        """POST `payload` as JSON to base_url + path and return the decoded response."""
+        self._acquire()
+        t, ok = time.perf_counter(), False
+        try:
+            data = self._send(path, payload, params=params).json()
+            ok = True
+            return data
+        finally:
+            self._release(t, ok)
+
+    def stream(self, path: str, payload: Dict, params: Dict[str, str] | None = None) -> Iterator[Dict]:
+        """
+        POST and iterate over the server-sent events of the response, decoded. Only the
+        request is retried; once events have started, a broken stream raises.
+        """
+        self._acquire()
+        t, ok = time.perf_counter(), False
+        try:
+            with self._send(path, payload, stream=True, params=params) as r:
+                first = True
+                for line in r.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    if first:
+                        first = False
+                        with self._lock:
+                            self._first_ms.append((time.perf_counter() - t) * 1000)
+                    yield json.loads(data)
+            ok = True
+        except GeneratorExit:
+            ok = True   # the caller stopped reading (e.g. a Streamlit rerun); not an upstream failure
+            raise
+        finally:
+            self._release(t, ok)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            ms, first, wait = list(self._ms), list(self._first_ms), list(self._wait_ms)
+            return {"calls": self.calls, "errors": self.errors, "retries": self.retried,
+                    "in_flight": self.in_flight, "p50_ms": _pct(ms, 0.5), "p95_ms": _pct(ms, 0.95),
+                    "first_event_p50_ms": _pct(first, 0.5),
+                    "mean_wait_ms": sum(wait) / len(wait) if wait else 0.0}
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"{self.name}: {s['calls']} calls, {s['errors']} failed, {s['retries']} retries, "
+                f"p50 {s['p50_ms']:.0f} ms, p95 {s['p95_ms']:.0f} ms, first event p50 "
+                f"{s['first_event_p50_ms']:.0f} ms, mean wait for a slot {s['mean_wait_ms']:.1f} ms")
+
+
+def _role(message) -> str:
+    if isinstance(message, dict):
+        return message["role"]
+    return {"human": "user", "ai": "assistant"}.get(message.type, message.type)
+
+
+def _openai_messages(messages) -> List[Dict[str, str]]:
+    """OpenAI chat messages from LangChain messages (e.g. PROMPT_TMPL.format_messages) or dicts."""
+    return [{"role": _role(m), "content": m["content"] if isinstance(m, dict) else m.content} for m in messages]
+
+
+class ChatClient:
+    """OpenAI chat completions for one model over the shared "openai" ApiClient."""
+
+    def __init__(self, model: str, api: ApiClient, temperature: float = 0):
+        self.model = model
+        self.api = api
+        self.temperature = temperature
+
+    def complete(self, messages) -> str:
+        data = self.api.post("/chat/completions", {"model": self.model, "temperature": self.temperature,
+                                                   "messages": _openai_messages(messages)})
+        return data["choices"][0]["message"]["content"] or ""
+
+    def stream(self, messages) -> Iterator[str]:
+        """The completion as text chunks, as the model generates them."""
+        payload = {"model": self.model, "temperature": self.temperature, "stream": True,
+                   "messages": _openai_messages(messages)}
+        for event in self.api.stream("/chat/completions", payload):
+            for choice in event.get("choices") or []:
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    yield text
+
+
+class PooledEmbeddings(Embeddings):
+    """OpenAI embeddings over the shared "openai" ApiClient (used as the vector store's embedding_function)."""
+
+    def __init__(self, model: str, api: ApiClient, dims: int | None = EMBED_DIMS):
+        self.model = model
+        self.api = api
+        self.dims = dims
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        data = self.api.post("/embeddings", {"model": self.model, "input": list(texts),
+                                             **dims_param(self.model, self.dims)})["data"]
+        return [d["embedding"] for d in sorted(data, key=lambda d: d["index"])]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class GeminiClient:
+    """Google Gemini generateContent / streamGenerateContent over the shared "gemini" ApiClient."""
+
+    def __init__(self, model: str, api: ApiClient):
+        self.model = model
+        self.api = api
+
+    @staticmethod
+    def _text(event: Dict) -> str:
+        cands = event.get("candidates") or [{}]
+        return "".join(p.get("text", "") for p in cands[0].get("content", {}).get("parts", []))
+
+    def complete(self, prompt: str) -> str:
+        return self._text(self.api.post(f"/models/{self.model}:generateContent",
+                                        {"contents": [{"parts": [{"text": prompt}]}]}))
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        # alt=sse: one JSON event per chunk instead of a single JSON array at the end
+        for event in self.api.stream(f"/models/{self.model}:streamGenerateContent",
+                                     {"contents": [{"parts": [{"text": prompt}]}]}, params={"alt": "sse"}):
+            text = self._text(event)
+            if text:
+                yield text
+
+
+_apis: Dict[str, ApiClient] = {}
+_clients: Dict[tuple, object] = {}
+_clients_lock = threading.Lock()
+
+
+def _new_api(name: str) -> ApiClient:
+    if name == "openai":
+        key = os.getenv("OPENAI_API_KEY", "")
+        return ApiClient("openai", OPENAI_BASE_URL, headers={"Authorization": f"Bearer {key}"} if key else {})
+    if name == "gemini":
+        # the key goes in a header: a query string ends up in proxy and access logs
+        key = os.getenv("GEMINI_API_KEY", "")
+        return ApiClient("gemini", GEMINI_BASE_URL, headers={"x-goog-api-key": key} if key else {})
+    raise ValueError(f"Unknown upstream {name!r}")
+
+
+def get_api(name: str) -> ApiClient:
+    """The process-wide ApiClient for upstream `name` ("openai" or "gemini")."""
+    with _clients_lock:
+        api = _apis.get(name)
+        if api is None:
+            api = _apis[name] = _new_api(name)
+        return api
+
+
+def _client(kind, model: str, api: str):
+    key = (kind, model)
+    with _clients_lock:
+        client = _clients.get(key)
+    if client is None:
+        client = kind(model, get_api(api))
+        with _clients_lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def get_chat_client(model: str) -> ChatClient:
+    """Process-wide chat client for `model` (shared across Streamlit sessions and reruns)."""
+    return _client(ChatClient, model, "openai")
+
+
+def get_embeddings(model: str) -> PooledEmbeddings:
+    """Process-wide OpenAI embeddings for `model`."""
+    return _client(PooledEmbeddings, model, "openai")
+
+
+def get_gemini_client(model: str = GEMINI_MODEL) -> GeminiClient:
+    """Process-wide Gemini client for `model`."""
+    return _client(GeminiClient, model, "gemini")
+
+
+def summary() -> str:
+    """One line of stats per upstream used so far."""
+    with _clients_lock:
+        apis = list(_apis.values())
+    return "\n".join(api.summary() for api in apis) or "No upstream calls yet"
@@ -0,0 +1,111 @@
+# core/context.py
+import os
+from typing import Callable, Dict, List, Sequence
+
+from langchain.schema import Document
+
+from utils import basic_clean
+
+CONTEXT_TOKENS = int(os.getenv("CONTEXT_TOKENS", "1800"))   # prompt context budget, chat-model tokens
+MIN_OVERLAP = 20          # shortest suffix/prefix match taken as splitter overlap (chars)
+MAX_OVERLAP = 600         # longest one looked for; ingest overlaps by 200
+MIN_TAIL_TOKENS = 80      # don't bother packing a truncated passage smaller than this
+
+
+def overlap(a: str, b: str, lo: int = MIN_OVERLAP, hi: int = MAX_OVERLAP) -> int:
+    """Length of the longest suffix of `a` that is also a prefix of `b` (0 if < lo)."""
+    for n in range(min(len(a), len(b), hi), lo - 1, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def _source(doc: Document) -> str:
+    meta = doc.metadata or {}
+    return meta.get("source") or meta.get("file_path") or "Unknown source"
+
+
+def _chains(docs: List[Document]) -> List[List[int]]:
+    """Indices of same-source docs grouped into runs of adjacent chunks, in reading order."""
+    n = len(docs)
+    nxt: Dict[int, int] = {}
+    has_prev = set()
+    for i in range(n):
+        for j in range(n):
+            if i != j and j not in has_prev and i not in nxt and overlap(docs[i].page_content, docs[j].page_content):
+                nxt[i] = j
+                has_prev.add(j)
+                break
+    chains, seen = [], set()
+    for start in [i for i in range(n) if i not in has_prev] + list(range(n)):
+        if start in seen:
+            continue
+        chain, i = [], start
+        while i is not None and i not in seen:
+            seen.add(i)
+            chain.append(i)
+            i = nxt.get(i)
+        chains.append(chain)
+    return chains
+
+
+def merge_passages(docs: Sequence[Document]) -> List[Dict]:
+    """
+    Collapse ranked chunks into passages, best first: adjacent chunks of one source are joined
+    without their overlap, and chunks another passage already contains are dropped.
+    """
+    by_source: Dict[str, List[int]] = {}
+    for rank, d in enumerate(docs):
+        by_source.setdefault(_source(d), []).append(rank)
+    passages = []
+    for source, ranks in by_source.items():
+        group = [docs[r] for r in ranks]
+        for chain in _chains(group):
+            text = group[chain[0]].page_content
+            for a, b in zip(chain, chain[1:]):
+                text += group[b].page_content[overlap(group[a].page_content, group[b].page_content):]
+            passages.append({"source": source, "text": text, "rank": min(ranks[i] for i in chain),
+                             "docs": [group[i] for i in chain]})
+    passages.sort(key=lambda p: p["rank"])
+    kept: List[Dict] = []
+    for p in passages:
+        norm = basic_clean(p["text"])
+        if any(norm in basic_clean(k["text"]) for k in kept if k["source"] == p["source"]):
+            continue
+        kept.append(p)
+    return kept
+
+
+def _truncate(text: str, budget: int, count: Callable[[str], int]) -> str:
+    """Longest whole-word prefix of `text` within `budget` tokens."""
+    lo, hi = 0, len(text)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if count(text[:mid]) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    cut = text[:lo]
+    return cut[:cut.rfind(" ")] if " " in cut and lo < len(text) else cut
+
+
+def build_context(docs: Sequence[Document], count: Callable[[str], int],
+                  budget: int = CONTEXT_TOKENS) -> List[Dict]:
+    """
+    Passages (merge_passages) packed best first into `budget` tokens as measured by
+    `count`. A passage that doesn't fit is cut to the remaining budget when that is
+    still worth sending, and everything after it is left out.
+    """
+    packed, used = [], 0
+    sep = count("\n\n")
+    for p in merge_passages(docs):
+        cost = count(p["text"]) + (sep if packed else 0)
+        if used + cost <= budget:
+            packed.append(p)
+            used += cost
+            continue
+        room = budget - used - (sep if packed else 0)
+        if room >= MIN_TAIL_TOKENS or not packed:
+            packed.append(dict(p, text=_truncate(p["text"], max(room, 0), count)))
+        break
+    return packed
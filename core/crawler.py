@@ -0,0 +1,155 @@
+# core/crawler.py
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, Iterable, List, Tuple
+
+import requests
+from loguru import logger
+
+from core.http_cache import HttpCache, CachedResponse, get_http_cache
+from core.ingest import (
+    HTML_TIMEOUT,
+    PDF_TIMEOUT,
+    make_session,
+    cached_get,
+    page_doc,
+    page_pdf_links,
+    page_links,
+    pdf_text,
+    pdf_doc,
+)
+
+# Concurrency limits
+MAX_WORKERS = int(os.getenv("CRAWL_WORKERS", "16"))   # total in-flight requests
+PER_HOST    = int(os.getenv("CRAWL_PER_HOST", "4"))   # in-flight requests per host
+
+GONE_STATUS = {404, 410}
+
+
+class Crawler:
+    """
+    Fetches each URL once over one keep-alive session, at most `per_host` in flight per host.
+    After run(): `failed` and `gone` (404/410) list URLs, `links` and `pdfs` map each page.
+    """
+
+    def __init__(self, max_workers: int = MAX_WORKERS, per_host: int = PER_HOST,
+                 session: requests.Session | None = None, cache: HttpCache | None = None):
+        self.max_workers = max(1, max_workers)
+        self.per_host = max(1, per_host)
+        self.session = session or make_session(pool_size=self.max_workers)
+        self.cache = cache or get_http_cache()
+        self.failed: set = set()
+        self.gone: set = set()
+        self.links: Dict[str, List[str]] = {}
+        self.pdfs: Dict[str, List[str]] = {}
+        self._limits: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _host_limit(self, url: str) -> threading.BoundedSemaphore:
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            sem = self._limits.get(host)
+            if sem is None:
+                sem = self._limits[host] = threading.BoundedSemaphore(self.per_host)
+        return sem
+
+    def _get(self, url: str, timeout: int) -> CachedResponse:
+        with self._host_limit(url):
+            return cached_get(url, timeout, session=self.session, cache=self.cache)
+
+    def _record_error(self, url: str, e: Exception) -> None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        with self._lock:
+            (self.gone if status in GONE_STATUS else self.failed).add(url)
+
+    def _fetch_page(self, url: str) -> Tuple[dict | None, List[Tuple[str, str]]]:
+        try:
+            r = self._get(url, HTML_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Fetch failed for {url}: {e}")
+            self._record_error(url, e)
+            return None, []
+        try:
+            doc = page_doc(r, self.cache)
+        except Exception as e:
+            logger.warning(f"Parse failed for {url}: {e}")
+            self._record_error(url, e)
+            return None, []
+        logger.info(f"Fetched {url} ({len(doc['markdown'])} chars{', not modified' if r.not_modified else ''})")
+        try:
+            links = page_pdf_links(r, self.cache)
+            pages = page_links(r, self.cache)
+        except Exception as e:
+            logger.warning(f"While scanning links on {url}: {e}")
+            links, pages = [], []
+        with self._lock:
+            self.links[url] = pages
+        return doc, links
+
+    def _fetch_pdf(self, pdf_url: str) -> str:
+        try:
+            text = pdf_text(self._get(pdf_url, PDF_TIMEOUT), self.cache)
+        except Exception as e:
+            logger.warning(f"PDF fetch failed for {pdf_url}: {e}")
+            self._record_error(pdf_url, e)
+            return ""
+        logger.info(f"Fetched PDF {pdf_url} ({len(text)} chars)")
+        return text
+
+    def run(self, urls: Iterable[str]) -> List[Dict]:
+        """
+        Crawl seed URLs and return docs in the same order fetch_all would:
+        each page followed by the PDFs it links to. A PDF shared by several pages
+        is attributed (and titled) by the first seed that links to it.
+        """
+        seeds = list(dict.fromkeys(urls))
+        pages: Dict[int, dict] = {}
+        pdf_texts: Dict[str, str] = {}
+        # pdf url -> (seed index, link position, link text) of its earliest referrer
+        pdf_owner: Dict[str, Tuple[int, int, str]] = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            pending = {pool.submit(self._fetch_page, u): ("page", i) for i, u in enumerate(seeds)}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    kind, key = pending.pop(fut)
+                    if kind == "pdf":
+                        pdf_texts[key] = fut.result()
+                        continue
+                    doc, links = fut.result()
+                    if doc is None:
+                        continue
+                    pages[key] = doc
+                    for pos, (href, text) in enumerate(links):
+                        ref = (key, pos, text)
+                        if href not in pdf_owner:
+                            pending[pool.submit(self._fetch_pdf, href)] = ("pdf", href)
+                            pdf_owner[href] = ref
+                        elif ref < pdf_owner[href]:
+                            pdf_owner[href] = ref
+
+        by_seed: Dict[int, List[Tuple[int, dict]]] = {}
+        for href, (idx, pos, text) in pdf_owner.items():
+            self.pdfs.setdefault(seeds[idx], []).append(href)
+            doc = pdf_doc(href, pdf_texts.get(href, ""), text)
+            if doc:
+                by_seed.setdefault(idx, []).append((pos, doc))
+
+        out: List[Dict] = []
+        for i in range(len(seeds)):
+            if i in pages:
+                out.append(pages[i])
+            out.extend(doc for _, doc in sorted(by_seed.get(i, []), key=lambda t: t[0]))
+
+        logger.info(f"Crawled {len(seeds)} seed URLs into {len(out)} docs "
+                    f"({len(self.failed)} failed, {len(self.gone)} gone)")
+        return out
+
+
+def crawl(urls: Iterable[str], max_workers: int = MAX_WORKERS, per_host: int = PER_HOST,
+          session: requests.Session | None = None, cache: HttpCache | None = None) -> List[Dict]:
+    """Fetch seed URLs and their same-host PDFs concurrently. See Crawler."""
+    return Crawler(max_workers=max_workers, per_host=per_host, session=session, cache=cache).run(urls)
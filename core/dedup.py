@@ -0,0 +1,83 @@
+# core/dedup.py
+import hashlib
+import os
+import re
+from typing import Dict, Hashable, List, Optional
+
+import numpy as np
+
+# Near-duplicate detection parameters
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))  # estimated Jaccard; 0 disables
+NUM_PERM = 128      # MinHash permutations
+BANDS    = 16       # LSH bands (8 rows each): pairs above ~0.7 similarity become candidates
+SHINGLE  = 5        # words per shingle
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD = re.compile(r"\w+")
+
+
+class NearDupIndex:
+    """
+    MinHash + LSH index over word shingles. check() returns the key of an already-added
+    text whose estimated Jaccard similarity is >= threshold, or registers the new text
+    as canonical and returns None. Exact duplicates short-circuit on a hash of the words.
+    """
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD, num_perm: int = NUM_PERM,
+                 bands: int = BANDS, shingle: int = SHINGLE, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._b = rng.randint(0, np.iinfo(np.int64).max, size=num_perm, dtype=np.int64).astype(np.uint64)
+        self._exact: Dict[bytes, Hashable] = {}
+        self._buckets: Dict[tuple, List[Hashable]] = {}
+        self._sigs: Dict[Hashable, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    def _shingle_hashes(self, words: List[str]) -> np.ndarray:
+        k = min(self.shingle, len(words))
+        grams = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+        return np.fromiter(
+            (int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams),
+            dtype=np.uint64, count=len(grams),
+        )
+
+    def signature(self, words: List[str]) -> np.ndarray:
+        hv = self._shingle_hashes(words)
+        # (a*h + b) mod p per permutation; uint64 wraparound is fine for hashing purposes
+        with np.errstate(over="ignore"):
+            ph = ((np.outer(hv, self._a) + self._b) % _MERSENNE) & _MAX_HASH
+        return ph.min(axis=0).astype(np.uint32)
+
+    def check(self, key: Hashable, text: str) -> Optional[Hashable]:
+        words = _WORD.findall(text.lower())
+        if not words:
+            return None
+        exact = hashlib.blake2b(" ".join(words).encode("utf-8"), digest_size=16).digest()
+        if exact in self._exact:
+            return self._exact[exact]
+
+        sig = self.signature(words)
+        bands = [(i, sig[i * self.rows:(i + 1) * self.rows].tobytes()) for i in range(self.bands)]
+        seen = set()
+        for band in bands:
+            for other in self._buckets.get(band, ()):
+                if other in seen:
+                    continue
+                seen.add(other)
+                if float(np.mean(self._sigs[other] == sig)) >= self.threshold:
+                    return other
+
+        self._exact[exact] = key
+        self._sigs[key] = sig
+        for band in bands:
+            self._buckets.setdefault(band, []).append(key)
+        return None
@@ -0,0 +1,352 @@
+# core/docstore.py
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import faiss
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+from langchain_community.vectorstores import FAISS
+from loguru import logger
+
+from core.faiss_index import write_meta
+
+DOCSTORE_FILE = "docstore.sqlite"
+INDEX_FILE = "index.faiss"
+CURRENT_FILE = "CURRENT"      # names the live generation directory
+STAGING_DIR = "staging"       # where the next generation is built
+KEEP_GENERATIONS = 2          # the live one plus the one processes started earlier may still hold open
+SQL_BATCH = 500               # ids per IN (...) query, well under SQLite's bound-variable limit
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS strings (sid INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS chunks (
+    id     TEXT PRIMARY KEY,
+    text   TEXT NOT NULL,
+    source INTEGER REFERENCES strings(sid),
+    title  INTEGER REFERENCES strings(sid),
+    meta   TEXT
+);
+CREATE INDEX IF NOT EXISTS chunks_source ON chunks(source);
+CREATE TABLE IF NOT EXISTS faiss_ids (pos INTEGER PRIMARY KEY, id TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS shard_ids (shard TEXT NOT NULL, pos INTEGER NOT NULL, id TEXT NOT NULL,
+                                      PRIMARY KEY (shard, pos));
+CREATE INDEX IF NOT EXISTS shard_ids_id ON shard_ids(id);
+"""
+_SELECT = """
+SELECT c.id, c.text, s.value, t.value, c.meta FROM chunks c
+LEFT JOIN strings s ON s.sid = c.source LEFT JOIN strings t ON t.sid = c.title
+"""
+
+
+class SqliteDocstore(Docstore, AddableMixin):
+    """
+    LangChain docstore in a single SQLite file, replacing the pickled InMemoryDocstore;
+    rows are read by id on demand, and the FAISS position -> chunk id map is in faiss_ids.
+    """
+
+    def __init__(self, path: Path, readonly: bool = False):
+        self.path = Path(path)
+        self.readonly = readonly
+        if readonly:
+            self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    @staticmethod
+    def _doc(row: Tuple) -> Document:
+        doc_id, text, source, title, meta = row
+        metadata = json.loads(meta) if meta else {}
+        if source is not None:
+            metadata["source"] = source
+        if title is not None:
+            metadata["title"] = title
+        return Document(id=doc_id, page_content=text, metadata=metadata)
+
+    def search(self, search: str) -> Union[str, Document]:
+        with self._lock:
+            row = self._db.execute(_SELECT + "WHERE c.id = ?", (search,)).fetchone()
+        return self._doc(row) if row else f"ID {search} not found."
+
+    def mget(self, ids: Iterable[str]) -> List[Optional[Document]]:
+        """Documents for `ids`, SQL_BATCH per query (None where missing)."""
+        ids = list(ids)
+        rows = []
+        with self._lock:
+            for i in range(0, len(ids), SQL_BATCH):
+                part = ids[i:i + SQL_BATCH]
+                rows += self._db.execute(_SELECT + f"WHERE c.id IN ({','.join('?' * len(part))})", part).fetchall()
+        found = {r[0]: self._doc(r) for r in rows}
+        return [found.get(i) for i in ids]
+
+    def items(self, sources: Iterable[str] | None = None) -> Iterator[Tuple[str, Document]]:
+        """(id, Document) for every chunk, or only those from `sources`."""
+        with self._lock:
+            if sources is None:
+                rows = self._db.execute(_SELECT).fetchall()
+            else:
+                rows = []
+                src = list(sources)
+                for i in range(0, len(src), SQL_BATCH):
+                    part = src[i:i + SQL_BATCH]
+                    rows += self._db.execute(_SELECT + f"WHERE s.value IN ({','.join('?' * len(part))})", part).fetchall()
+        for row in rows:
+            yield row[0], self._doc(row)
+
+    def _intern(self, value) -> Optional[int]:
+        if value is None:
+            return None
+        self._db.execute("INSERT OR IGNORE INTO strings(value) VALUES (?)", (str(value),))
+        return self._db.execute("SELECT sid FROM strings WHERE value = ?", (str(value),)).fetchone()[0]
+
+    def _row(self, doc_id: str, doc: Document) -> Tuple:
+        meta = dict(doc.metadata or {})
+        source, title = meta.pop("source", None), meta.pop("title", None)
+        return (doc_id, doc.page_content, self._intern(source), self._intern(title),
+                json.dumps(meta, default=str) if meta else None)
+
+    def add(self, texts: Dict[str, Document]) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks(id, text, source, title, meta) VALUES (?, ?, ?, ?, ?)",
+                [self._row(i, d) for i, d in texts.items()],
+            )
+
+    def apply(self, delete: Iterable[str], add: Dict[str, Document]) -> None:
+        """delete() then add() in one transaction: after a crash either both happened or neither."""
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in delete])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks(id, text, source, title, meta) VALUES (?, ?, ?, ?, ?)",
+                [self._row(i, d) for i, d in add.items()],
+            )
+
+    def ids(self) -> set:
+        """Ids of every stored chunk."""
+        with self._lock:
+            return {r[0] for r in self._db.execute("SELECT id FROM chunks")}
+
+    def update_metadata(self, doc_id: str, metadata: Dict) -> None:
+        with self._lock, self._db:
+            row = self._db.execute("SELECT text FROM chunks WHERE id = ?", (doc_id,)).fetchone()
+            if row:
+                _, text, source, title, meta = self._row(doc_id, Document(page_content=row[0], metadata=metadata))
+                self._db.execute("UPDATE chunks SET source = ?, title = ?, meta = ? WHERE id = ?",
+                                 (source, title, meta, doc_id))
+
+    def delete(self, ids: List) -> None:
+        with self._lock, self._db:
+            self._db.executemany("DELETE FROM chunks WHERE id = ?", [(i,) for i in ids])
+
+    def clear(self) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM chunks")
+            self._db.execute("DELETE FROM strings")
+            self._db.execute("DELETE FROM faiss_ids")
+            self._db.execute("DELETE FROM shard_ids")
+
+    def index_ids(self) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._db.execute("SELECT pos, id FROM faiss_ids"))
+
+    def set_index_ids(self, mapping: Dict[int, str]) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM faiss_ids")
+            self._db.executemany("INSERT INTO faiss_ids(pos, id) VALUES (?, ?)", sorted(mapping.items()))
+            # drop strings no chunk refers to any more
+            self._db.execute("DELETE FROM strings WHERE sid NOT IN (SELECT source FROM chunks WHERE source IS NOT NULL)"
+                             " AND sid NOT IN (SELECT title FROM chunks WHERE title IS NOT NULL)")
+
+    def set_shard_ids(self, shards: Dict[str, List[str]]) -> None:
+        """Replace the per-category sub-index maps (see core.shards): shard -> ids in row order."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM shard_ids")
+            self._db.executemany("INSERT INTO shard_ids(shard, pos, id) VALUES (?, ?, ?)",
+                                 [(shard, pos, i) for shard, ids in shards.items() for pos, i in enumerate(ids)])
+
+    def shard_counts(self) -> Dict[str, int]:
+        """Rows mapped per shard."""
+        with self._lock:
+            return dict(self._db.execute("SELECT shard, COUNT(*) FROM shard_ids GROUP BY shard"))
+
+    def shard_id(self, shard: str, pos: int) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT id FROM shard_ids WHERE shard = ? AND pos = ?", (shard, int(pos))).fetchone()
+        return row[0] if row else None
+
+    def shard_members(self, shard: str, ids: Iterable[str]) -> set:
+        """The subset of `ids` that belongs to `shard`."""
+        ids = list(ids)
+        rows = []
+        with self._lock:
+            for i in range(0, len(ids), SQL_BATCH):
+                part = ids[i:i + SQL_BATCH]
+                rows += self._db.execute(f"SELECT id FROM shard_ids WHERE shard = ? AND id IN ({','.join('?' * len(part))})",
+                                         [shard] + part).fetchall()
+        return {r[0] for r in rows}
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class _IndexIds(Mapping):
+    """Read-only FAISS position -> chunk id map, looked up in SQLite on demand."""
+
+    def __init__(self, store: SqliteDocstore):
+        self._store = store
+
+    def __getitem__(self, pos: int) -> str:
+        with self._store._lock:
+            row = self._store._db.execute("SELECT id FROM faiss_ids WHERE pos = ?", (int(pos),)).fetchone()
+        if row is None:
+            raise KeyError(pos)
+        return row[0]
+
+    def __iter__(self):
+        with self._store._lock:
+            rows = self._store._db.execute("SELECT pos FROM faiss_ids ORDER BY pos").fetchall()
+        return (r[0] for r in rows)
+
+    def __len__(self) -> int:
+        with self._store._lock:
+            return self._store._db.execute("SELECT COUNT(*) FROM faiss_ids").fetchone()[0]
+
+
+def index_dir(path: Path) -> Path:
+    """
+    The directory holding the live index under `path`: the generation named in
+    <path>/CURRENT (see publish_dir), or `path` itself for an index written before
+    generations existed.
+    """
+    path = Path(path)
+    try:
+        name = (path / CURRENT_FILE).read_text().strip()
+    except OSError:
+        return path
+    return path / name if name else path
+
+
+def load_faiss(path: Path, embeddings, writable: bool = False) -> FAISS:
+    """
+    Open the index at `path` (its live generation, see index_dir) without unpickling
+    anything. Read-only opens memory-map index.faiss (whatever its type, see
+    core.faiss_index) and resolve ids lazily; writable opens load both into memory.
+    """
+    path = index_dir(path)
+    if not (path / DOCSTORE_FILE).exists():
+        raise RuntimeError(f"No {DOCSTORE_FILE} in {path}. Run `python ingest.py` "
+                           f"(or `python -m core.docstore {path}` to convert an index.pkl).")
+    store = SqliteDocstore(path / DOCSTORE_FILE, readonly=not writable)
+    if writable:
+        return FAISS(embeddings, faiss.read_index(str(path / INDEX_FILE)), store, store.index_ids())
+    try:
+        index = faiss.read_index(str(path / INDEX_FILE), faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        index = faiss.read_index(str(path / INDEX_FILE))
+    return FAISS(embeddings, index, store, _IndexIds(store))
+
+
+def new_faiss(path: Path, embeddings, dims: int) -> FAISS:
+    """Empty index whose docstore is a fresh SqliteDocstore at `path`, a staging directory (see publish_dir)."""
+    store = SqliteDocstore(Path(path) / DOCSTORE_FILE)
+    store.clear()
+    return FAISS(embeddings, faiss.IndexFlatL2(dims), store, {})
+
+
+def copy_docstore(src: Path, dest: Path) -> None:
+    """Consistent copy of the docstore `src` into `dest` (SQLite backup; safe while the app reads it)."""
+    Path(dest).parent.mkdir(parents=True, exist_ok=True)
+    source = sqlite3.connect(f"file:{src}?mode=ro", uri=True)
+    target = sqlite3.connect(str(dest))
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def publish_dir(path: Path, staging: Path | None = None, keep: int = KEEP_GENERATIONS) -> Path:
+    """
+    Atomically make the index written in `staging` (default <path>/staging) the live generation
+    by switching CURRENT; keeps the newest `keep` generations and returns the new directory.
+    """
+    path = Path(path)
+    staging = Path(staging or path / STAGING_DIR)
+    gen = path / f"gen-{time.time_ns()}"
+    os.replace(staging, gen)
+    tmp = path / f"{CURRENT_FILE}.tmp"
+    with open(tmp, "w") as f:
+        f.write(gen.name + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path / CURRENT_FILE)
+
+    gens = sorted((d for d in path.glob("gen-*") if d.is_dir()), key=lambda d: int(d.name[4:]))
+    for old in gens[:-keep]:
+        shutil.rmtree(old, ignore_errors=True)
+    if len(gens) >= keep:
+        for name in (INDEX_FILE, "index.json", DOCSTORE_FILE, "manifest.json"):
+            (path / name).unlink(missing_ok=True)
+        for name in ("shards", "bm25"):
+            shutil.rmtree(path / name, ignore_errors=True)
+    return gen
+
+
+def save_faiss(vs: FAISS, path: Path, index: faiss.Index | None = None, spec: str = "flat",
+               requested: str | None = None) -> None:
+    """
+    Persist the FAISS index and its position -> id map in `path`, a staging directory
+    (the docstore commits as it goes). `index` replaces vs.index on disk, e.g. an
+    IVF/HNSW index trained from it with the same row order; `spec` describes what is
+    written (see core.faiss_index).
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    index = index if index is not None else vs.index
+    tmp = path / f"{INDEX_FILE}.tmp"
+    faiss.write_index(index, str(tmp))
+    vs.docstore.set_index_ids(dict(vs.index_to_docstore_id))
+    os.replace(tmp, path / INDEX_FILE)
+    write_meta(path, index, spec, requested)
+
+
+def migrate_pickle(path: Path) -> bool:
+    """
+    One-time conversion of a LangChain index.pkl (written by FAISS.save_local) into
+    docstore.sqlite; the pickle is removed afterwards. Only run on an index you built.
+    """
+    path = Path(path)
+    pkl = path / "index.pkl"
+    if not pkl.exists() or (path / DOCSTORE_FILE).exists():
+        return False
+    with open(pkl, "rb") as f:
+        docstore, index_to_id = pickle.load(f)
+    store = SqliteDocstore(path / DOCSTORE_FILE)
+    store.add(dict(docstore._dict))
+    store.set_index_ids(index_to_id)
+    store._db.execute("VACUUM")
+    store.close()
+    pkl.unlink()
+    logger.info(f"Converted {pkl} ({len(index_to_id)} chunks) to {path / DOCSTORE_FILE}")
+    return True
+
+
+if __name__ == "__main__":
+    target = Path(sys.argv[1] if len(sys.argv) > 1 else "vectorstore/faiss_index")
+    if not migrate_pickle(target):
+        print(f"Nothing to convert in {target}")
@@ -0,0 +1,202 @@
+# core/embed_cache.py
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:   # Windows: no cross-process locking, one writer at a time
+    fcntl = None
+
+CACHE_DIR = Path(os.getenv("EMBED_CACHE_DIR", "./data/embed_cache"))
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different copies share a key."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding store for one (model, dims) pair.
+
+    Layout under <root>/<model>-<dims>/:
+      vectors.f32  row-major float32 matrix, memory-mapped for reads
+      keys.txt     sha256 of the normalized text, one per line; line i is row i
+    """
+
+    def __init__(self, model: str, dims: int, root: Path = CACHE_DIR):
+        self.model = model
+        self.dims = int(dims)
+        self.dir = Path(root) / f"{re.sub(r'[^A-Za-z0-9_.-]+', '_', model)}-{self.dims}"
+        self._vec_path = self.dir / "vectors.f32"
+        self._key_path = self.dir / "keys.txt"
+        self._commit_path = self.dir / "compact.commit"
+        self._lock = threading.Lock()
+        self._mm: Optional[np.memmap] = None
+        self._rows: Dict[str, int] = {}
+        self._key_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        if self._key_path.exists():
+            with self._file_lock():
+                self._load()
+
+    @contextmanager
+    def _file_lock(self):
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / "lock", "a") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _finish_compaction(self) -> None:
+        """Complete a committed compaction, or discard an uncommitted one; call with the file lock held."""
+        pending = [(p.with_name(p.name + ".compact"), p) for p in (self._vec_path, self._key_path)]
+        if self._commit_path.exists():
+            for tmp, path in pending:
+                if tmp.exists():
+                    os.replace(tmp, path)
+            self._commit_path.unlink()
+        else:
+            for tmp, _ in pending:
+                tmp.unlink(missing_ok=True)
+
+    def _load(self) -> None:
+        """(Re)read keys.txt, trimming a torn tail; call with the file lock held."""
+        self._finish_compaction()
+        if not self._key_path.exists():
+            return
+        keys = self._key_path.read_text().split()
+        row_bytes = 4 * self.dims
+        vec_size = self._vec_path.stat().st_size if self._vec_path.exists() else 0
+        n = min(len(keys), vec_size // row_bytes)
+        if n != len(keys) or vec_size != n * row_bytes:
+            logger.warning(f"Embedding cache {self.dir} was partially written; trimming to {n} rows")
+            self._key_path.write_text("".join(k + "\n" for k in keys[:n]))
+            if self._vec_path.exists():
+                with open(self._vec_path, "r+b") as f:
+                    f.truncate(n * row_bytes)
+        self._rows = {k: i for i, k in enumerate(keys[:n])}
+        self._key_bytes = self._key_path.stat().st_size
+        self._mm = self._map()
+
+    def _sync(self) -> int:
+        """
+        Catch up with rows appended by other processes (or trim a writer's torn tail);
+        call with the file lock held. Returns the row number the next append gets.
+        """
+        size = self._key_path.stat().st_size if self._key_path.exists() else 0
+        vec_size = self._vec_path.stat().st_size if self._vec_path.exists() else 0
+        if size != self._key_bytes or vec_size != len(self._rows) * 4 * self.dims:
+            self._load()
+            vec_size = self._vec_path.stat().st_size if self._vec_path.exists() else 0
+        return vec_size // (4 * self.dims)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _map(self) -> Optional[np.memmap]:
+        # mapped while the file lock is held, so it matches _rows even if another
+        # process later compacts (the old file stays readable through the mapping)
+        if not self._rows:
+            return None
+        return np.memmap(self._vec_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dims))
+
+    def get_many(self, texts: Sequence[str]) -> List[Optional[np.ndarray]]:
+        """Cached vector for each text, or None where it has not been embedded yet."""
+        with self._lock:
+            mm = self._mm
+            out = []
+            for t in texts:
+                row = self._rows.get(text_key(t))
+                out.append(np.array(mm[row]) if row is not None else None)
+            return out
+
+    def put_many(self, texts: Sequence[str], vectors: Sequence[Sequence[float]]) -> None:
+        arr = np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1)
+        if arr.shape[1] != self.dims:
+            raise ValueError(f"{self.model} returned {arr.shape[1]}-dim vectors, cache expects {self.dims}")
+        with self._lock, self._file_lock():
+            base = self._sync()
+            keys, rows, seen = [], [], set()
+            for t, v in zip(texts, arr):
+                k = text_key(t)
+                if k not in self._rows and k not in seen:
+                    seen.add(k)
+                    keys.append(k)
+                    rows.append(v)
+            if not keys:
+                return
+            # vectors first: keys.txt is the commit record
+            with open(self._vec_path, "ab") as f:
+                np.asarray(rows, dtype=np.float32).tofile(f)
+            with open(self._key_path, "a") as f:
+                f.write("".join(k + "\n" for k in keys))
+            for i, k in enumerate(keys):
+                self._rows[k] = base + i
+            self._key_bytes = self._key_path.stat().st_size
+            self._mm = self._map()
+
+    def compact(self, max_rows: int, keep: Sequence[str] = ()) -> int:
+        """
+        Shrink the cache to at most `max_rows` rows: the vectors of `keep` (texts, most
+        important first), then the most recently added ones. Other processes switch to
+        the rewritten files on their next append. Returns the number of rows kept.
+        """
+        with self._lock, self._file_lock():
+            self._sync()
+            if len(self._rows) <= max_rows:
+                return len(self._rows)
+            wanted = (self._rows.get(k) for k in dict.fromkeys(text_key(t) for t in keep))
+            chosen = set([r for r in wanted if r is not None][:max_rows])
+            for row in range(len(self._rows) - 1, -1, -1):
+                if len(chosen) >= max_rows:
+                    break
+                chosen.add(row)
+            rows = sorted(chosen)
+            keys = list(self._rows)   # row order
+            np.asarray(self._mm[rows], dtype=np.float32).tofile(self._vec_path.with_name("vectors.f32.compact"))
+            self._key_path.with_name("keys.txt.compact").write_text("".join(keys[r] + "\n" for r in rows))
+            self._commit_path.touch()
+            self._load()
+            logger.info(f"Compacted embedding cache {self.dir} from {len(keys)} to {len(rows)} rows")
+            return len(rows)
+
+    def embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], Sequence[Sequence[float]]]) -> List[List[float]]:
+        """Return vectors for `texts`, calling embed_fn only for text not seen before."""
+        cached = self.get_many(texts)
+        missing: Dict[str, str] = {}
+        for t, v in zip(texts, cached):
+            if v is None:
+                missing.setdefault(text_key(t), t)
+        self.hits += len(texts) - sum(v is None for v in cached)
+        self.misses += len(missing)
+
+        if missing:
+            todo = list(missing.values())
+            self.put_many(todo, embed_fn(todo))
+            cached = self.get_many(texts)
+        return [v.tolist() for v in cached]
+
+    def summary(self) -> str:
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return (f"Embedding cache ({self.model}): {self.hits} reused, {self.misses} embedded "
+                f"({rate:.1f}% hit rate), {len(self)} vectors on disk")
@@ -0,0 +1,159 @@
+# core/embed_stage.py
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Sequence
+
+import requests
+from loguru import logger
+
+from core.embed_cache import EmbeddingCache, text_key
+from core.tokens import token_counter
+
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+EMBED_DIMS   = int(os.getenv("OPENAI_EMBED_DIMS", "1536"))      # vector size asked of the API
+BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "100000"))  # API cap is 300k tokens per request
+BATCH_SIZE   = int(os.getenv("EMBED_BATCH_SIZE", "512"))        # API cap is 2048 inputs per request
+PARALLEL     = int(os.getenv("EMBED_PARALLEL", "4"))            # requests in flight
+TPM_LIMIT    = int(os.getenv("EMBED_TPM", "0"))                 # tokens/minute budget, 0 = unlimited
+MAX_RETRIES  = 6
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+def pack_batches(token_counts: Sequence[int], max_tokens: int, max_items: int) -> List[List[int]]:
+    """Greedily pack item indices into batches under both the token and item caps."""
+    batches: List[List[int]] = []
+    cur: List[int] = []
+    cur_tokens = 0
+    for i, n in enumerate(token_counts):
+        if cur and (cur_tokens + n > max_tokens or len(cur) >= max_items):
+            batches.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(i)
+        cur_tokens += n
+    if cur:
+        batches.append(cur)
+    return batches
+
+
+def dims_param(model: str, dims: int | None) -> Dict[str, int]:
+    """`dimensions` for the embeddings request: text-embedding-3 models shorten vectors
+    on request, while older models (ada-002) reject the parameter."""
+    return {"dimensions": int(dims)} if dims and not model.endswith("ada-002") else {}
+
+
+class _TokenBucket:
+    """Blocking tokens-per-minute limiter shared by the worker threads."""
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.stamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: int) -> None:
+        n = min(n, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.level >= n:
+                    self.level -= n
+                    return
+                wait = (n - self.level) / self.rate
+            time.sleep(wait)
+
+
+class EmbeddingStage:
+    """
+    Embed texts through the OpenAI-compatible /embeddings endpoint in token-budgeted
+    batches, `parallel` requests at a time, retrying 429/5xx with jittered backoff.
+    """
+
+    def __init__(self, model: str, cache: EmbeddingCache, base_url: str = OPENAI_BASE_URL,
+                 api_key: str | None = None, batch_tokens: int = BATCH_TOKENS,
+                 batch_size: int = BATCH_SIZE, parallel: int = PARALLEL,
+                 tpm_limit: int = TPM_LIMIT, max_retries: int = MAX_RETRIES,
+                 timeout: float = 60, session: requests.Session | None = None, dims: int | None = None):
+        self.model = model
+        self.dims = cache.dims if dims is None else dims
+        self.cache = cache
+        self.url = base_url.rstrip("/") + "/embeddings"
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.batch_tokens = batch_tokens
+        self.batch_size = batch_size
+        self.parallel = max(1, parallel)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self._bucket = _TokenBucket(tpm_limit) if tpm_limit > 0 else None
+        self._count = token_counter(model)
+
+    def _post(self, texts: List[str], tokens: int) -> List[List[float]]:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        for attempt in range(self.max_retries + 1):
+            if self._bucket:
+                self._bucket.acquire(tokens)
+            delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+            try:
+                r = self.session.post(self.url, headers=headers, timeout=self.timeout,
+                                      json={"model": self.model, "input": texts,
+                                            **dims_param(self.model, self.dims)})
+                if r.status_code not in RETRY_STATUS:
+                    r.raise_for_status()
+                    data = sorted(r.json()["data"], key=lambda d: d["index"])
+                    return [d["embedding"] for d in data]
+                retry_after = r.headers.get("Retry-After")
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    delay = max(delay, float(retry_after))
+                err = f"HTTP {r.status_code}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                err = str(e)
+            if attempt == self.max_retries:
+                raise RuntimeError(f"Embedding batch failed after {attempt + 1} attempts: {err}")
+            logger.warning(f"Embedding batch of {len(texts)} failed ({err}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    def run(self, texts: Sequence[str]) -> List[List[float]]:
+        """Vectors for `texts`, embedding only what the cache does not hold yet."""
+        cached = self.cache.get_many(texts)
+        todo: Dict[str, str] = {}
+        for t, v in zip(texts, cached):
+            if v is None:
+                todo.setdefault(text_key(t), t)
+        self.cache.hits += len(texts) - sum(v is None for v in cached)
+        self.cache.misses += len(todo)
+
+        if todo:
+            items = list(todo.values())
+            counts = [self._count(t) for t in items]
+            batches = pack_batches(counts, self.batch_tokens, self.batch_size)
+            logger.info(f"Embedding {len(items)} texts (~{sum(counts)} tokens) in {len(batches)} batches")
+            done_items, errors = 0, []
+            started = time.monotonic()
+            with ThreadPoolExecutor(max_workers=self.parallel) as pool:
+                futs = {
+                    pool.submit(self._post, [items[i] for i in b], sum(counts[i] for i in b)): b
+                    for b in batches
+                }
+                for n, fut in enumerate(as_completed(futs), 1):
+                    b = futs[fut]
+                    try:
+                        vectors = fut.result()
+                    except Exception as e:
+                        errors.append(e)
+                        continue
+                    self.cache.put_many([items[i] for i in b], vectors)   # checkpoint
+                    done_items += len(b)
+                    logger.info(f"Embedded batch {n}/{len(batches)} "
+                                f"({done_items}/{len(items)} texts, {time.monotonic() - started:.1f}s)")
+            if errors:
+                raise RuntimeError(f"{len(errors)}/{len(batches)} embedding batches failed "
+                                   f"(finished batches are saved; rerun to resume): {errors[0]}")
+            cached = self.cache.get_many(texts)
+        return [v.tolist() for v in cached]
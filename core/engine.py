@@ -0,0 +1,311 @@
+# core/engine.py
+import asyncio
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Tuple
+
+from langchain.schema import Document
+from loguru import logger
+
+from core import clients
+from core.answer_cache import AnswerCache
+from core.canned import canned_shard
+from core.clients import ApiClient
+from core.query_cache import normalize_query
+from core.rag import stream_with_citations
+from core.rerank import RERANK, RERANK_TOP_K, get_reranker
+from core.retrievers import RETRIEVER, Retriever, load_retriever
+from core.semantic_cache import SemanticAnswerCache
+from core.singleflight import SingleFlight
+from rate_limiter import QueryLimitError, consume_query, get_usage_display
+
+# Headless engine: `python -m core.engine` serves it over HTTP; app.py talks to it when
+# ENGINE_URL is set and runs it in-process otherwise.
+ENGINE_URL = os.getenv("ENGINE_URL", "")
+ENGINE_HOST = os.getenv("ENGINE_HOST", "127.0.0.1")
+ENGINE_PORT = int(os.getenv("ENGINE_PORT", "8600"))
+ENGINE_WORKERS = int(os.getenv("ENGINE_WORKERS", "32"))   # threads for retrieval and upstream calls
+
+
+class RagEngine:
+    """The question -> answer pipeline without any UI; thread-safe, one instance serves every session."""
+
+    def __init__(self, retriever: Retriever | None = None):
+        self.retriever = retriever or load_retriever(RETRIEVER or "faiss", get_reranker() if RERANK else None)
+        self.answers = AnswerCache(self.retriever.path)
+        self.semantic = SemanticAnswerCache()
+        self.flights = SingleFlight()
+        self._reload_lock = threading.Lock()
+
+    def current_retriever(self) -> Retriever:
+        """The retriever, reloaded first if ingest has published a newer index generation."""
+        retriever = self.retriever
+        if not retriever.outdated():
+            return retriever
+        with self._reload_lock:
+            if self.retriever is retriever:
+                logger.info(f"Loading the newly published {retriever.name} index from {retriever.path}")
+                try:
+                    self.retriever = type(retriever).load(retriever.path, retriever.reranker)
+                except Exception as e:
+                    logger.warning(f"Could not load the new index, still serving the old one: {e}")
+            return self.retriever
+
+    def retrieve(self, query: str, k: int = 6, category: str | None = None) -> List[Document]:
+        """Hybrid search; `category` (core.categories) limits it to that shard, else all shards are searched."""
+        retriever = self.current_retriever()
+        return retriever.search(query, k=RERANK_TOP_K if retriever.reranker else k, category=category)
+
+    def answer(self, q: str, k: int = 6) -> Tuple[str | Iterator[str], List[dict]]:
+        """(answer, citations): cached, or shared with an identical in-flight question, else streamed from the model."""
+        retriever = self.current_retriever()
+        version = retriever.version()
+        hit = self.answers.get(q, version)
+        if hit:
+            return hit
+        return self.flights.do((normalize_query(q), k, version), lambda: self._generate(retriever, q, k, version))
+
+    def _generate(self, retriever: Retriever, q: str, k: int,
+                  version: str) -> Tuple[str | Iterator[str], List[dict]]:
+        vec = None
+        category = canned_shard(q)
+        # exact-identifier questions go straight to the lexical index without an embedding
+        if not retriever.lexical_only(q):
+            vec = retriever.embed(q)
+            hit = self.semantic.get(vec, version, k, category)
+            if hit:
+                return hit
+        allowed, error_msg = consume_query()
+        if not allowed:
+            raise QueryLimitError(error_msg)
+        docs = retriever.search(q, k=RERANK_TOP_K if retriever.reranker else k, category=category, vec=vec)
+        stream, cites = stream_with_citations(q, docs)
+
+        def finish():
+            parts = []
+            for part in stream:
+                parts.append(part)
+                yield part
+            ans = "".join(parts).strip()
+            self.answers.put(q, ans, cites, version)
+            if vec is not None:
+                self.semantic.put(q, vec, ans, cites, version, k, category)
+
+        return finish(), cites
+
+    def usage(self) -> Dict:
+        """Queries counted against the global limit: {"total_queries": int, "remaining": int}."""
+        return get_usage_display()
+
+    def stats(self) -> Dict:
+        return {"usage": self.usage(), "retriever": self.retriever.stats(), "answer_cache": self.answers.summary(),
+                "semantic_cache": self.semantic.stats(), "coalesced": self.flights.stats(),
+                "upstream": clients.summary()}
+
+
+_engine: RagEngine | None = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> RagEngine:
+    """Process-wide engine (the index is loaded once, on first use)."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RagEngine()
+        return _engine
+
+
+class EngineClient:
+    """
+    RagEngine's interface over the HTTP API, for a UI process that doesn't hold the
+    index. Requests go through a pooled core.clients.ApiClient (timeouts, retries).
+    """
+
+    def __init__(self, base_url: str = ENGINE_URL):
+        self.api = ApiClient("engine", base_url)
+
+    def retrieve(self, query: str, k: int = 6, category: str | None = None) -> List[Document]:
+        data = self.api.post("/v1/retrieve", {"question": query, "k": k, "category": category})
+        return [Document(page_content=d["text"], metadata=d["metadata"], id=d["id"]) for d in data["docs"]]
+
+    def answer(self, q: str, k: int = 6) -> Tuple[Iterator[str], List[dict]]:
+        events = self.api.stream("/v1/answer", {"question": q, "k": k})
+        first = next(events, None)
+        if first is None or "cites" not in first:
+            events.close()
+            if (first or {}).get("limit"):
+                raise QueryLimitError(first["error"])
+            raise RuntimeError(f"Engine error: {(first or {}).get('error', 'empty response')}")
+
+        def deltas():
+            for event in events:
+                if "error" in event:
+                    raise RuntimeError(f"Engine error: {event['error']}")
+                yield event["delta"]
+
+        return deltas(), first["cites"]
+
+    def usage(self) -> Dict:
+        """The engine's count against the global limit (it keeps the usage file, not this process)."""
+        return self.stats()["usage"]
+
+    def stats(self) -> Dict:
+        return self.api.post("/v1/stats", {})
+
+
+def _event(obj) -> bytes:
+    return f"data: {json.dumps(obj)}\n\n".encode()
+
+
+def make_app(engine: RagEngine, workers: int = ENGINE_WORKERS):
+    """
+    aiohttp application serving `engine` (blocking calls run on a thread pool). Answers are
+    server-sent events: {"cites": [...]}, {"delta": "..."} per chunk, then [DONE] or {"error": ...}.
+
+      POST /v1/answer    {"question": str, "k": int}
+      POST /v1/retrieve  {"question": str, "k": int, "category": str | null}
+      POST /v1/stats     {}
+      GET  /healthz
+    """
+    from aiohttp import web
+
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="engine")
+
+    async def run(fn, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def read(request) -> Tuple[str, int, Dict]:
+        try:
+            body = await request.json()
+            question = str(body.get("question") or "").strip()
+            k = int(body.get("k") or 6)
+        except (ValueError, TypeError, AttributeError):
+            raise web.HTTPBadRequest(text=json.dumps({"error": "expected a JSON object"}),
+                                     content_type="application/json")
+        if not question:
+            raise web.HTTPBadRequest(text=json.dumps({"error": "question is required"}),
+                                     content_type="application/json")
+        return question, max(1, min(k, 50)), body
+
+    async def answer(request):
+        question, k, _ = await read(request)
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        try:
+            ans, cites = await run(engine.answer, question, k)
+        except QueryLimitError as e:
+            await resp.prepare(request)
+            await resp.write(_event({"error": str(e), "limit": True}))
+            await resp.write(b"data: [DONE]\n\n")
+            await resp.write_eof()
+            return resp
+        await resp.prepare(request)
+        await resp.write(_event({"cites": cites}))
+        parts = iter([ans]) if isinstance(ans, str) else ans
+        try:
+            while True:
+                part = await run(next, parts, None)
+                if part is None:
+                    break
+                await resp.write(_event({"delta": part}))
+        except (ConnectionResetError, asyncio.CancelledError):
+            raise   # client went away; the finally below stops generation
+        except Exception as e:
+            logger.warning(f"Answer for {question!r} failed: {e}")
+            await resp.write(_event({"error": str(e)}))
+        finally:
+            if not isinstance(ans, str):
+                try:
+                    ans.close()   # stops reading; generation finishes for the cache and other readers
+                except ValueError:
+                    pass   # still running on a worker after a disconnect; closed when collected
+        await resp.write(b"data: [DONE]\n\n")
+        await resp.write_eof()
+        return resp
+
+    async def retrieve(request):
+        question, k, body = await read(request)
+        docs = await run(engine.retrieve, question, k, body.get("category"))
+        return web.json_response({"docs": [{"id": d.id, "text": d.page_content, "metadata": d.metadata}
+                                           for d in docs]})
+
+    async def stats(request):
+        return web.json_response(await run(engine.stats))
+
+    async def health(request):
+        return web.json_response({"ok": True})
+
+    async def close_pool(app):
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    app = web.Application()
+    app.router.add_post("/v1/answer", answer)
+    app.router.add_post("/v1/retrieve", retrieve)
+    app.router.add_post("/v1/stats", stats)
+    app.router.add_get("/healthz", health)
+    app.on_cleanup.append(close_pool)
+    return app
+
+
+async def _load_test(url: str, questions: List[str], requests: int, concurrency: int) -> None:
+    """Fire `requests` answer requests, `concurrency` at a time; report latency and throughput."""
+    import aiohttp
+
+    first_ms, total_ms, failed = [], [], 0
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(session, q):
+        nonlocal failed
+        async with sem:
+            t = time.perf_counter()
+            try:
+                async with session.post(url.rstrip("/") + "/v1/answer", json={"question": q}) as resp:
+                    resp.raise_for_status()
+                    seen = False
+                    async for line in resp.content:
+                        if not seen and line.startswith(b"data: {\"delta\""):
+                            seen = True
+                            first_ms.append((time.perf_counter() - t) * 1000)
+                        if line.startswith(b"data: {\"error\""):
+                            failed += 1
+                total_ms.append((time.perf_counter() - t) * 1000)
+            except aiohttp.ClientError:
+                failed += 1
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(one(session, questions[i % len(questions)]) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    pct = lambda xs, p: sorted(xs)[min(len(xs) - 1, int(p * len(xs)))] if xs else 0.0
+    print(f"{requests} requests, {concurrency} concurrent: {requests / elapsed:.1f} req/s, {failed} failed; "
+          f"first chunk p50 {pct(first_ms, 0.5):.0f} ms p95 {pct(first_ms, 0.95):.0f} ms; "
+          f"complete p50 {pct(total_ms, 0.5):.0f} ms p95 {pct(total_ms, 0.95):.0f} ms")
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve the RAG engine over HTTP, or load-test a running one.")
+    parser.add_argument("--host", default=ENGINE_HOST)
+    parser.add_argument("--port", type=int, default=ENGINE_PORT)
+    parser.add_argument("--load-test", metavar="URL", help="send answer requests to the engine at URL instead")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.load_test:
+        from core.canned import canned_questions
+        asyncio.run(_load_test(args.load_test, list(canned_questions()), args.requests, args.concurrency))
+        return
+    from aiohttp import web
+    engine = get_engine()
+    logger.info(f"Engine ready ({engine.retriever.name} retriever); listening on {args.host}:{args.port}")
+    web.run_app(make_app(engine), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# core/faiss_index.py
+import argparse
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+from loguru import logger
+
+# Index served by the app: flat | ivf | hnsw | ivfpq, optionally with parameters,
+# e.g. "ivf:nlist=512,nprobe=16", "hnsw:m=32,ef_search=64", "ivfpq:nlist=1024,m=64,nprobe=32"
+FAISS_INDEX = os.getenv("FAISS_INDEX", "flat")
+INDEX_META = "index.json"
+
+KINDS = ("flat", "ivf", "hnsw", "ivfpq")
+_MIN_POINTS_PER_CENTROID = 39   # below this k-means training is unreliable (faiss warns)
+
+
+def parse_spec(spec: str) -> Tuple[str, Dict[str, int]]:
+    """"ivf:nlist=512,nprobe=16" -> ("ivf", {"nlist": 512, "nprobe": 16})."""
+    kind, _, rest = spec.strip().lower().partition(":")
+    kind = kind.replace("-", "").replace("_", "")
+    if kind not in KINDS:
+        raise ValueError(f"Unknown FAISS index type {kind!r}; expected one of {', '.join(KINDS)}")
+    params = {}
+    for part in filter(None, (p.strip() for p in rest.split(","))):
+        key, _, value = part.partition("=")
+        params[key.strip()] = int(value)
+    return kind, params
+
+
+def resolve(spec: str, n: int, dims: int) -> Tuple[str, Dict[str, int]]:
+    """Fill in parameters the spec leaves out from the corpus size and dimensionality."""
+    kind, params = parse_spec(spec)
+    if kind in ("ivf", "ivfpq"):
+        params.setdefault("nlist", max(1, min(int(4 * math.sqrt(n)), n // _MIN_POINTS_PER_CENTROID)))
+        params.setdefault("nprobe", min(params["nlist"], max(4, int(math.sqrt(params["nlist"])))))
+    if kind == "ivfpq":
+        params.setdefault("m", max(m for m in range(1, 65) if dims % m == 0))
+        params.setdefault("nbits", 8)
+    if kind == "hnsw":
+        params.setdefault("m", 32)
+        params.setdefault("ef_construction", 80)
+        params.setdefault("ef_search", 64)
+    return kind, params
+
+
+def spec_string(kind: str, params: Dict[str, int]) -> str:
+    return kind + (":" + ",".join(f"{k}={v}" for k, v in sorted(params.items())) if params else "")
+
+
+def _trainable(kind: str, params: Dict[str, int], n: int) -> Optional[str]:
+    """Why the spec can't be trained on n vectors, or None if it can."""
+    if kind in ("ivf", "ivfpq") and n < params["nlist"]:
+        return f"{n} vectors < nlist={params['nlist']}"
+    if kind == "ivfpq" and n < 2 ** params["nbits"]:
+        return f"{n} vectors < 2**nbits={2 ** params['nbits']} PQ centroids"
+    return None
+
+
+def build_index(spec: str, vectors: np.ndarray) -> Tuple[faiss.Index, str]:
+    """
+    Train and fill an L2 index of type `spec` with `vectors` (docstore position order); returns
+    it with its resolved spec, falling back to flat when the corpus is too small to train.
+    """
+    x = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dims = x.shape
+    kind, params = resolve(spec, n, dims)
+    problem = _trainable(kind, params, n)
+    if problem:
+        logger.warning(f"Can't train a {spec_string(kind, params)} index ({problem}); building flat instead")
+        kind, params = "flat", {}
+    if kind == "flat":
+        index = faiss.IndexFlatL2(dims)
+    elif kind == "hnsw":
+        index = faiss.IndexHNSWFlat(dims, params["m"])
+        index.hnsw.efConstruction = params["ef_construction"]
+    elif kind == "ivf":
+        index = faiss.index_factory(dims, f"IVF{params['nlist']},Flat")
+    else:
+        index = faiss.index_factory(dims, f"IVF{params['nlist']},PQ{params['m']}x{params['nbits']}")
+        # polysemous codes only help Hamming pre-filtering, which search doesn't use; training them is slow
+        faiss.downcast_index(index).do_polysemous_training = False
+    if not index.is_trained:
+        index.train(x)
+    index.add(x)
+    set_search_params(index, kind, params)
+    return index, spec_string(kind, params)
+
+
+def set_search_params(index: faiss.Index, kind: str, params: Dict[str, int]) -> None:
+    """nprobe / efSearch; both are stored in the index file, so loads keep them."""
+    if kind in ("ivf", "ivfpq"):
+        faiss.extract_index_ivf(index).nprobe = params["nprobe"]
+    elif kind == "hnsw":
+        faiss.downcast_index(index).hnsw.efSearch = params["ef_search"]
+
+
+def is_flat(index: faiss.Index) -> bool:
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def read_meta(path: Path) -> Dict:
+    try:
+        return json.loads((Path(path) / INDEX_META).read_text())
+    except (OSError, ValueError):
+        return {"spec": "flat"}
+
+
+def write_meta(path: Path, index: faiss.Index, spec: str = "flat", requested: str | None = None) -> None:
+    """index.json: the resolved spec of index.faiss and the spec ingest was asked for."""
+    meta = {"spec": spec, "requested": requested or spec, "ntotal": int(index.ntotal), "dims": int(index.d),
+            "built": time.time()}
+    tmp = Path(path) / f"{INDEX_META}.tmp"
+    tmp.write_text(json.dumps(meta, indent=1))
+    os.replace(tmp, Path(path) / INDEX_META)
+
+
+def index_vectors(path: Path) -> np.ndarray:
+    """
+    Exact vectors of the (live) index at `path` in position order: reconstructed from
+    a flat index, otherwise looked up in the embedding cache by chunk text.
+    """
+    from core.docstore import DOCSTORE_FILE, INDEX_FILE, SqliteDocstore, index_dir
+    from core.embed_cache import EmbeddingCache
+
+    path = index_dir(path)
+    index = faiss.read_index(str(Path(path) / INDEX_FILE))
+    if is_flat(index):
+        return index.reconstruct_n(0, index.ntotal)
+    store = SqliteDocstore(Path(path) / DOCSTORE_FILE, readonly=True)
+    ids = store.index_ids()
+    docs = store.mget(ids[i] for i in range(len(ids)))
+    cache = EmbeddingCache(os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small"), index.d)
+    vecs = cache.get_many([d.page_content for d in docs])
+    missing = sum(v is None for v in vecs)
+    if missing:
+        raise RuntimeError(f"{missing} of {len(vecs)} vectors are not in the embedding cache; rebuild with a flat index")
+    return np.vstack(vecs).astype(np.float32)
+
+
+def benchmark(vectors: np.ndarray, specs: List[str], k: int = 10, queries: int = 200,
+              noise: float = 0.05, seed: int = 0) -> List[Dict]:
+    """recall@k against exact (flat) search, per-query latency and serialized size for each spec."""
+    rng = np.random.default_rng(seed)
+    x = np.ascontiguousarray(vectors, dtype=np.float32)
+    q = x[rng.choice(len(x), size=min(queries, len(x)), replace=False)]
+    q = q + rng.normal(scale=noise * float(np.linalg.norm(x, axis=1).mean()) / math.sqrt(x.shape[1]),
+                       size=q.shape).astype(np.float32)
+    exact = faiss.IndexFlatL2(x.shape[1])
+    exact.add(x)
+    kth = exact.search(q, k)[0][:, -1]
+
+    rows = []
+    for spec in specs:
+        t = time.perf_counter()
+        index, resolved = build_index(spec, x)
+        build_s = time.perf_counter() - t
+        found, lat = [], []
+        for row in q:
+            t = time.perf_counter()
+            _, idx = index.search(row[None, :], k)
+            lat.append(time.perf_counter() - t)
+            found.append(idx[0])
+        hits = [((x[f[f >= 0]] - row) ** 2).sum(axis=1) <= d * (1 + 1e-5) + 1e-6 for f, row, d in zip(found, q, kth)]
+        recall = float(np.mean([h.sum() / k for h in hits]))
+        lat_ms = np.asarray(lat) * 1e3
+        rows.append({
+            "spec": resolved, "recall": recall, "p50_ms": float(np.percentile(lat_ms, 50)),
+            "p95_ms": float(np.percentile(lat_ms, 95)), "size_mb": faiss.serialize_index(index).nbytes / 2 ** 20,
+            "build_s": build_s,
+        })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on the current corpus.")
+    parser.add_argument("path", nargs="?", default="vectorstore/faiss_index", help="index directory")
+    parser.add_argument("--specs", nargs="+", default=["flat", "ivf", "hnsw", "ivfpq"],
+                        help='index specs, e.g. flat "ivf:nlist=256,nprobe=8" hnsw:m=16')
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.05, help="query perturbation, relative to vector norm")
+    args = parser.parse_args()
+
+    vectors = index_vectors(Path(args.path))
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries, k={args.k}")
+    print(f"{'spec':<40} {'recall@k':>8} {'p50 ms':>8} {'p95 ms':>8} {'size MB':>8} {'build s':>8}")
+    for r in benchmark(vectors, args.specs, args.k, args.queries, args.noise):
+        print(f"{r['spec']:<40} {r['recall']:>8.3f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+              f"{r['size_mb']:>8.2f} {r['build_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
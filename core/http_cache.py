@@ -0,0 +1,150 @@
+# core/http_cache.py
+import hashlib
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+import requests
+
+CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", "./data/http_cache"))
+
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    content: bytes
+    encoding: Optional[str] = None
+    not_modified: bool = False   # server said 304; body came from disk
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+class HttpCache:
+    """
+    On-disk revalidation cache for ingestion fetches: last body plus ETag / Last-Modified per URL.
+    A 304 is served from disk with not_modified=True (see load_parsed / save_parsed).
+    """
+
+    def __init__(self, root: Path = CACHE_DIR):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def reset_stats(self) -> None:
+        self.requests = 0
+        self.hits = 0
+        self.bytes_saved = 0
+        self.bytes_downloaded = 0
+
+    def _path(self, url: str, suffix: str) -> Path:
+        key = hashlib.sha1(url.encode("utf-8", errors="ignore")).hexdigest()
+        return self.root / key[:2] / f"{key}.{suffix}"
+
+    def _load_meta(self, url: str) -> Optional[Dict]:
+        meta_path = self._path(url, "meta.json")
+        if not (meta_path.exists() and self._path(url, "body").exists()):
+            return None
+        try:
+            return json.loads(meta_path.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def get(self, url: str, session: requests.Session | None = None,
+            headers: Dict | None = None, timeout: float = 25) -> CachedResponse:
+        """GET `url`, revalidating against the cached copy. Raises like raise_for_status()."""
+        meta = self._load_meta(url)
+        hdrs = dict(headers or {})
+        if meta:
+            if meta.get("etag"):
+                hdrs["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                hdrs["If-Modified-Since"] = meta["last_modified"]
+
+        r = (session or requests).get(url, headers=hdrs, timeout=timeout)
+
+        if r.status_code == 304 and meta:
+            body = self._path(url, "body").read_bytes()
+            with self._lock:
+                self.requests += 1
+                self.hits += 1
+                self.bytes_saved += len(body)
+            return CachedResponse(url, 200, body, meta.get("encoding"), not_modified=True)
+
+        r.raise_for_status()
+        content = r.content
+        with self._lock:
+            self.requests += 1
+            self.bytes_downloaded += len(content)
+
+        etag, last_modified = r.headers.get("ETag"), r.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._store(url, content, {
+                "url": url,
+                "etag": etag,
+                "last_modified": last_modified,
+                "encoding": r.encoding,
+                "size": len(content),
+                "fetched_at": time.time(),
+            })
+        else:
+            # no validators to revalidate with: an older copy must not answer a later 304
+            self._forget(url)
+        return CachedResponse(url, r.status_code, content, r.encoding)
+
+    def _store(self, url: str, content: bytes, meta: Dict) -> None:
+        body_path = self._path(url, "body")
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        # anything derived from the previous body is stale now
+        for p in body_path.parent.glob(body_path.name.replace(".body", ".parsed.*.json")):
+            p.unlink(missing_ok=True)
+        _atomic_write(body_path, content)
+        _atomic_write(self._path(url, "meta.json"), json.dumps(meta).encode("utf-8"))
+
+    def _forget(self, url: str) -> None:
+        body_path = self._path(url, "body")
+        for p in body_path.parent.glob(body_path.name.replace(".body", ".*")):
+            p.unlink(missing_ok=True)
+
+    def load_parsed(self, url: str, kind: str) -> Optional[Dict]:
+        """Return what save_parsed stored for the current cached body, if any."""
+        p = self._path(url, f"parsed.{kind}.json")
+        try:
+            return json.loads(p.read_text())
+        except (OSError, ValueError):
+            return None
+
+    def save_parsed(self, url: str, kind: str, data: Dict) -> None:
+        if self._load_meta(url) is None:
+            return   # no validators, so the page can never come back as 304
+        _atomic_write(self._path(url, f"parsed.{kind}.json"), json.dumps(data).encode("utf-8"))
+
+    def summary(self) -> str:
+        rate = (100.0 * self.hits / self.requests) if self.requests else 0.0
+        return (f"HTTP cache: {self.hits}/{self.requests} not modified ({rate:.1f}% hit rate), "
+                f"{self.bytes_saved / 1e6:.2f} MB saved, {self.bytes_downloaded / 1e6:.2f} MB downloaded")
+
+
+_default: HttpCache | None = None
+_default_lock = threading.Lock()
+
+
+def get_http_cache() -> HttpCache:
+    """Process-wide cache shared by both ingestion pipelines."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpCache()
+        return _default
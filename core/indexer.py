@@ -1,43 +1,185 @@
 # core/indexer.py
 import os
+import argparse
+from pathlib import Path
 from loguru import logger
 import chromadb
 from chromadb.utils import embedding_functions
 from dotenv import load_dotenv
 
-from core.ingest import fetch_all
+from core.crawler import Crawler
+from core.categories import categorize
 from core.chunk import build_docs
+from core.dedup import NearDupIndex, DEDUP_THRESHOLD
+from core.embed_cache import EmbeddingCache
+from core.http_cache import get_http_cache
+from core.lexical import LexicalIndex
+from core.manifest import ChunkManifest, content_hash
+from core.scheduler import CrawlScheduler, read_seed_sections
 
 load_dotenv()
 CHROMA_DIR = os.getenv("CHROMA_DIR", "./data/chroma")
 EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_DIMS = int(os.getenv("EMBED_DIMS", "384"))
+COLLECTION = "msu_docs"
+UPSERT_BATCH = 1000
+SEED_FILE = "data/seeds/msu_urls.txt"
 
-def load_urls(path="data/seeds/msu_urls.txt"):
-    with open(path, "r") as f:
-        return [ln.strip() for ln in f if ln.strip() and not ln.startswith("#")]
+def load_urls(path=SEED_FILE):
+    return [url for url, _ in read_seed_sections(path)]
 
-def build_index():
-    urls = load_urls()
+def _bootstrap_manifest(manifest: ChunkManifest, collection) -> None:
+    """Seed an empty manifest from what the collection already holds, so the first
+    incremental run does not re-embed an index built before manifests existed."""
+    if len(manifest) or not collection.count():
+        return
+    got = collection.get(include=["documents", "metadatas"])
+    for cid, text, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+        meta = meta or {}
+        manifest.sources.setdefault(meta.get("url", ""), {})[cid] = content_hash(text, meta)
+    logger.info(f"Bootstrapped manifest from {len(got['ids'])} existing chunks")
+
+def _dedupe(chunks, threshold: float, existing=()):
+    """Drop near-duplicate chunks (shared boilerplate); the kept copy lists every page
+    that carried it in meta["urls"] (Chroma metadata must be scalar, so " | "-joined).
+    `existing` chunks (of pages not fetched this run) stay in the index but count as
+    seen first. Returns the kept chunks and the existing ones whose urls grew."""
+    if threshold <= 0:
+        return chunks, {}
+    index = NearDupIndex(threshold)
+    stored = {}
+    for c in existing:
+        stored[c["id"]] = c
+        index.check(c["id"], c["text"])
+    kept, merged = {}, {}
+    for cid, c in chunks.items():
+        canon = index.check(cid, c["text"])
+        if canon is None:
+            kept[cid] = c
+            continue
+        target = kept.get(canon) or stored[canon]
+        meta = target["meta"]
+        urls = (meta.get("urls") or meta["url"]).split(" | ")
+        if c["meta"]["url"] not in urls:
+            meta["urls"] = " | ".join(urls + [c["meta"]["url"]])
+            if canon in stored:
+                merged[canon] = target
+    logger.info(f"Near-duplicate filter dropped {len(chunks) - len(kept)} of {len(chunks)} chunks")
+    return kept, merged
+
+def save_lexical(collection, path: Path) -> None:
+    """Rebuild the BM25 index (same ids as the collection) for hybrid retrieval in app/main.py."""
+    got = collection.get(include=["documents", "metadatas"])
+    lexical = LexicalIndex.build(
+        (cid, f"{(meta or {}).get('title', '')}\n{text}")
+        for cid, text, meta in zip(got["ids"], got["documents"], got["metadatas"])
+    )
+    lexical.save(path)
+    logger.info(f"Saved BM25 index over {len(lexical)} chunks to {path}")
+
+def build_index(full: bool = False, dedup_threshold: float = DEDUP_THRESHOLD):
+    """
+    Refresh the Chroma collection from the crawl schedule: only pages whose recrawl
+    interval has elapsed are fetched (all of them with full=True); the rest keep their
+    chunks. Links and sitemap entries found along the way are scheduled for later runs.
+    """
+    scheduler = CrawlScheduler(Path(CHROMA_DIR) / "crawl_state.json")
+    scheduler.sync_seeds(read_seed_sections(SEED_FILE))
     client = chromadb.PersistentClient(path=CHROMA_DIR)
+    manifest = ChunkManifest(Path(CHROMA_DIR) / "manifest.json")
+    if full:
+        try:
+            client.delete_collection(COLLECTION)
+        except Exception:
+            pass   # nothing to drop yet
+        manifest.sources = {}
+    embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=EMBED_MODEL)
     collection = client.get_or_create_collection(
-        name="msu_docs",
+        name=COLLECTION,
         metadata={"hnsw:space": "cosine"},
-        embedding_function=embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name=EMBED_MODEL
-        ),
+        embedding_function=embed_fn,
     )
+    cache = EmbeddingCache(EMBED_MODEL, EMBED_DIMS)
+    _bootstrap_manifest(manifest, collection)
+
+    crawler = Crawler()
+    scheduler.discover_sitemaps(crawler.session)
+    urls = scheduler.urls() if full else scheduler.due()
+    logger.info(scheduler.summary(due=len(urls)))
+    docs = crawler.run(urls)
+
+    # pages not due (or that failed) keep their chunks, including their PDFs'
+    fetched = set(urls)
+    held = [u for u in scheduler.urls() if u not in fetched] + sorted(crawler.failed)
+    keep = set(held) | set(scheduler.pdfs(held))
+
+    chunks = {}
+    for d in docs:
+        category = categorize(d.get("url", ""), scheduler.section(d.get("url", "")))
+        for doc in build_docs(d, source="msutexas"):
+            doc["meta"]["category"] = category
+            chunks[doc["id"]] = doc
+    existing = ()
+    if dedup_threshold > 0 and keep and collection.count():
+        got = collection.get(where={"url": {"$in": sorted(keep)}}, include=["documents", "metadatas"])
+        existing = [{"id": cid, "text": text, "meta": dict(meta or {})}
+                    for cid, text, meta in zip(got["ids"], got["documents"], got["metadatas"])]
+    chunks, merged = _dedupe(chunks, dedup_threshold, existing)
+
+    plan = manifest.plan(
+        ((cid, c["meta"]["url"], content_hash(c["text"], c["meta"])) for cid, c in chunks.items()),
+        refreshed={d["url"] for d in docs},
+        keep=keep,
+    )
+
+    if plan.delete:
+        collection.delete(ids=plan.delete)
+    # only new/changed chunks are embedded, and only if the cache has never seen their text
+    for i in range(0, len(plan.upsert), UPSERT_BATCH):
+        batch = [chunks[cid] for cid in plan.upsert[i:i + UPSERT_BATCH]]
+        texts = [c["text"] for c in batch]
+        collection.upsert(
+            ids=[c["id"] for c in batch],
+            documents=texts,
+            metadatas=[c["meta"] for c in batch],
+            embeddings=cache.embed(texts, lambda t: [list(map(float, v)) for v in embed_fn(t)]),
+        )
+    if merged:
+        # kept pages' chunks are not re-embedded; only their list of pages changes
+        collection.update(ids=list(merged), metadatas=[c["meta"] for c in merged.values()])
+        for cid, c in merged.items():
+            source = plan.sources.get(c["meta"].get("url", ""), {})
+            if cid in source:
+                source[cid] = content_hash(c["text"], c["meta"])
+    manifest.apply(plan)
+    lexical_dir = Path(CHROMA_DIR) / "bm25"
+    if plan or not lexical_dir.exists():
+        save_lexical(collection, lexical_dir)
 
-    ids, texts, metas = [], [], []
     for url in urls:
-        docs = fetch_all(url)
-        for d in docs:
-            for doc in build_docs(d, source="msutexas"):
-                ids.append(doc["id"])
-                texts.append(doc["text"])
-                metas.append(doc["meta"])
+        if url in crawler.gone:
+            scheduler.record(url, ok=False, gone=True)
+        elif url in crawler.failed:
+            scheduler.record(url, ok=False)
+        else:
+            scheduler.record(url, pdfs=crawler.pdfs.get(url, []))
+    discovered = sum(scheduler.add_links(url, hrefs) for url, hrefs in crawler.links.items())
+    scheduler.save()
+    if discovered:
+        logger.info(f"Scheduled {discovered} newly discovered pages for the next run")
 
-    collection.upsert(documents=texts, metadatas=metas, ids=ids)
-    logger.info(f"Indexed {len(ids)} chunks from {len(urls)} seed URLs into {CHROMA_DIR}")
+    logger.info(
+        f"Indexed {len(chunks)} chunks from {len(urls)} due URLs into {CHROMA_DIR}: "
+        f"{len(plan.upsert)} new/changed, {plan.unchanged} unchanged, "
+        f"{len(set(plan.delete) - set(plan.upsert))} deleted"
+    )
+    logger.info(cache.summary())
+    logger.info(get_http_cache().summary())
 
 if __name__ == "__main__":
-    build_index()
+    parser = argparse.ArgumentParser(description="Build or refresh the Chroma index.")
+    parser.add_argument("--full", action="store_true", help="drop the collection and re-embed everything")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="similarity above which chunks count as near-duplicates (0 disables)")
+    args = parser.parse_args()
+    build_index(full=args.full, dedup_threshold=args.dedup_threshold)
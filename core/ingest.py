@@ -1,15 +1,30 @@
 # core/ingest.py
 import re
 import urllib.parse
+from typing import Callable, List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from readability import Document
 from markdownify import markdownify as md
 from loguru import logger
-from pdfminer.high_level import extract_text as pdf_extract_text
-from io import BytesIO
+
+from core.http_cache import HttpCache, CachedResponse, get_http_cache
+from core.pdf_extract import get_pdf_extractor
 
 HEADERS = {"User-Agent": "Mozilla/5.0 (MustangsAI bot)"}
+HTML_TIMEOUT = 25
+PDF_TIMEOUT = 30
+
+
+def make_session(pool_size: int = 10) -> requests.Session:
+    """Keep-alive session whose connection pool can serve `pool_size` concurrent requests."""
+    s = requests.Session()
+    s.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
 
 
 def _table_to_text(table):
@@ -49,63 +64,138 @@ def _is_pdf(href: str) -> bool:
     return href.lower().endswith(".pdf")
 
 
-def fetch_html_doc(url: str) -> dict:
-    """Return one doc dict: title, markdown, url (HTML only)."""
-    r = requests.get(url, headers=HEADERS, timeout=25)
-    r.raise_for_status()
-
-    doc = Document(r.text)
+def parse_html_doc(url: str, html: str) -> dict:
+    """Turn an already-downloaded HTML page into a doc dict: title, markdown, url."""
+    doc = Document(html)
     title = (doc.short_title() or "").strip()
     main_html = _clean_html_keep_tables(doc.summary(html_partial=True))
     markdown = md(main_html, heading_style="ATX", strip=["img", "a"])
     markdown = re.sub(r"[ \t]+", " ", markdown).strip()
-
-    logger.info(f"Fetched {url} ({len(markdown)} chars)")
     return {"title": title, "markdown": markdown, "url": url}
 
 
-def fetch_pdf_doc(pdf_url: str, link_text: str = "") -> dict | None:
+def find_pdf_links(url: str, html: str) -> List[Tuple[str, str]]:
+    """Return (absolute_url, link_text) for each distinct same-host PDF linked from the page."""
+    soup = BeautifulSoup(html, "lxml")
+    seen = set()
+    out: List[Tuple[str, str]] = []
+    for a in soup.find_all("a", href=True):
+        href = _absolutize(a["href"], url)
+        if _is_pdf(href) and _same_host(href, url) and href not in seen:
+            seen.add(href)
+            out.append((href, a.get_text(" ", strip=True)))
+    return out
+
+
+_SKIP_EXT = (".jpg", ".jpeg", ".png", ".gif", ".svg", ".webp", ".ico", ".css", ".js", ".zip",
+             ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".mp3", ".mp4", ".mov", ".ics")
+
+
+def find_page_links(url: str, html: str) -> List[str]:
+    """Return each distinct same-host page (not PDF/media) linked from the page, fragment stripped."""
+    soup = BeautifulSoup(html, "lxml")
+    seen = set()
+    out: List[str] = []
+    for a in soup.find_all("a", href=True):
+        href = urllib.parse.urldefrag(_absolutize(a["href"], url))[0]
+        path = urllib.parse.urlparse(href).path.lower()
+        if (href.startswith(("http://", "https://")) and _same_host(href, url)
+                and not _is_pdf(path) and not path.endswith(_SKIP_EXT) and href not in seen):
+            seen.add(href)
+            out.append(href)
+    return out
+
+
+def extract_pdf_text(content: bytes, name: str = "") -> str:
+    """Page-by-page extraction on the shared process pool (size/time capped, cached by content hash)."""
+    pages = get_pdf_extractor().extract(content, name)
+    return "\n\n".join(p for p in pages if p)
+
+
+def pdf_doc(pdf_url: str, text: str, link_text: str = "") -> dict | None:
+    """Wrap extracted PDF text as a doc dict (title, markdown, url)."""
+    if not text:
+        return None
+    title = link_text.strip() or pdf_url.rsplit("/", 1)[-1]
+    return {"title": title, "markdown": text, "url": pdf_url}
+
+
+def cached_get(url: str, timeout: float, session: requests.Session | None = None,
+               cache: HttpCache | None = None) -> CachedResponse:
+    """GET through the shared revalidation cache (sends If-None-Match / If-Modified-Since)."""
+    return (cache or get_http_cache()).get(url, session=session, headers=HEADERS, timeout=timeout)
+
+
+def cached_parse(resp: CachedResponse, kind: str, parse: Callable, cache: HttpCache | None = None):
+    """Reuse what `parse` produced last run when the body came back 304; else parse and remember."""
+    cache = cache or get_http_cache()
+    if resp.not_modified:
+        hit = cache.load_parsed(resp.url, kind)
+        if hit is not None:
+            return hit["value"]
+    value = parse()
+    cache.save_parsed(resp.url, kind, {"value": value})
+    return value
+
+
+def page_doc(resp: CachedResponse, cache: HttpCache | None = None) -> dict:
+    return cached_parse(resp, "html", lambda: parse_html_doc(resp.url, resp.text), cache)
+
+
+def page_pdf_links(resp: CachedResponse, cache: HttpCache | None = None) -> List[Tuple[str, str]]:
+    links = cached_parse(resp, "pdf_links", lambda: find_pdf_links(resp.url, resp.text), cache)
+    return [tuple(l) for l in links]
+
+
+def page_links(resp: CachedResponse, cache: HttpCache | None = None) -> List[str]:
+    return cached_parse(resp, "page_links", lambda: find_page_links(resp.url, resp.text), cache)
+
+
+def pdf_text(resp: CachedResponse, cache: HttpCache | None = None) -> str:
+    return cached_parse(resp, "pdf_text", lambda: extract_pdf_text(resp.content, resp.url), cache)
+
+
+def fetch_html_doc(url: str, session: requests.Session | None = None) -> dict:
+    """Return one doc dict: title, markdown, url (HTML only)."""
+    r = cached_get(url, HTML_TIMEOUT, session=session)
+
+    out = page_doc(r)
+    logger.info(f"Fetched {url} ({len(out['markdown'])} chars{', not modified' if r.not_modified else ''})")
+    return out
+
+
+def fetch_pdf_doc(pdf_url: str, link_text: str = "", session: requests.Session | None = None) -> dict | None:
     """Download a PDF and return as a doc dict (title, markdown, url)."""
     try:
-        pr = requests.get(pdf_url, headers=HEADERS, timeout=30)
-        pr.raise_for_status()
-        text = pdf_extract_text(BytesIO(pr.content)) or ""
-        text = re.sub(r"[ \t]+", " ", text).strip()
-        if not text:
-            return None
-        title = link_text.strip() or pdf_url.rsplit("/", 1)[-1]
-        logger.info(f"Fetched PDF {pdf_url} ({len(text)} chars)")
-        return {"title": title, "markdown": text, "url": pdf_url}
+        pr = cached_get(pdf_url, PDF_TIMEOUT, session=session)
+        out = pdf_doc(pdf_url, pdf_text(pr), link_text)
+        if out:
+            logger.info(f"Fetched PDF {pdf_url} ({len(out['markdown'])} chars)")
+        return out
     except Exception as e:
         logger.warning(f"PDF fetch failed for {pdf_url}: {e}")
         return None
 
 
-def fetch_all(url: str) -> list[dict]:
+def fetch_all(url: str, session: requests.Session | None = None) -> list[dict]:
     """
     Return a list of docs:
       - The cleaned HTML doc
       - Plus any same-domain PDF docs linked from the page
+    For many URLs at once, use core.crawler.crawl instead.
     """
-    out = []
-    html_doc = fetch_html_doc(url)
-    out.append(html_doc)
+    r = cached_get(url, HTML_TIMEOUT, session=session)
+
+    html_doc = page_doc(r)
+    logger.info(f"Fetched {url} ({len(html_doc['markdown'])} chars)")
+    out = [html_doc]
 
     # scan for PDFs on the same host
     try:
-        r = requests.get(url, headers=HEADERS, timeout=25)
-        r.raise_for_status()
-        soup = BeautifulSoup(r.text, "lxml")
-        seen = set()
-        for a in soup.find_all("a", href=True):
-            href = _absolutize(a["href"], url)
-            if _is_pdf(href) and _same_host(href, url):
-                if href in seen:
-                    continue
-                seen.add(href)
-                pdf_doc = fetch_pdf_doc(href, link_text=a.get_text(" ", strip=True))
-                if pdf_doc:
-                    out.append(pdf_doc)
+        for href, link_text in page_pdf_links(r):
+            doc = fetch_pdf_doc(href, link_text=link_text, session=session)
+            if doc:
+                out.append(doc)
     except Exception as e:
         logger.warning(f"While scanning PDFs on {url}: {e}")
 
@@ -0,0 +1,183 @@
+# core/lexical.py
+import json
+import math
+import os
+import re
+import shutil
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60          # reciprocal rank fusion constant
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "24"))   # candidates taken from each retriever
+
+# words, plus joined identifiers kept whole: emails, CPT/OPT, I-20, 2024-2025, v1.2
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.@/&'_-][a-z0-9]+)*")
+_SPLIT = re.compile(r"[.@/&'_-]")
+_IDENT = re.compile(r"[0-9@/._-]")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from has have how i if in is it its me my "
+    "of on or our so that the their there this to was we what when where which who will with "
+    "you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased terms; a joined identifier also yields its parts ("cpt/opt" -> cpt/opt, cpt, opt)."""
+    out: List[str] = []
+    for m in _TOKEN.finditer(text.lower()):
+        t = m.group()
+        if t in STOPWORDS:
+            continue
+        out.append(t)
+        if not t.isalnum():
+            out.extend(p for p in _SPLIT.split(t) if p and p not in STOPWORDS)
+    return out
+
+
+def rrf(rankings: Sequence[Sequence[str]], k: int = RRF_K) -> List[str]:
+    """Reciprocal rank fusion: ids ordered by sum of 1 / (k + rank) over the rankings."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores, key=lambda d: -scores[d])
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk texts, keyed by the same chunk ids as the vector store.
+    On disk (one directory, memory-mapped):
+      ids.txt / terms.txt    chunk id per row / term per row
+      offsets.npy            int64 [n_terms + 1]; postings of term t are [offsets[t], offsets[t+1])
+      postings.npy, tfs.npy  int32 doc rows (ascending) / uint16 term frequencies
+      doc_len.npy            int32 terms per chunk
+    """
+
+    def __init__(self, ids: List[str], terms: Dict[str, int], offsets: np.ndarray, postings: np.ndarray,
+                 tfs: np.ndarray, doc_len: np.ndarray, k1: float = BM25_K1, b: float = BM25_B):
+        self.ids = ids
+        self.terms = terms
+        self.offsets = offsets
+        self.postings = postings
+        self.tfs = tfs
+        self.doc_len = doc_len.astype(np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(self.doc_len.mean()) if len(self.doc_len) else 1.0
+        self._rows: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, items: Iterable[Tuple[str, str]], k1: float = BM25_K1, b: float = BM25_B) -> "LexicalIndex":
+        """Index (chunk id, text) pairs."""
+        ids: List[str] = []
+        lengths: List[int] = []
+        plists: Dict[str, List[Tuple[int, int]]] = {}
+        for row, (doc_id, text) in enumerate(items):
+            toks = tokenize(text)
+            ids.append(doc_id)
+            lengths.append(len(toks))
+            for term, tf in Counter(toks).items():
+                plists.setdefault(term, []).append((row, min(tf, 65535)))
+        vocab = sorted(plists)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(plists[t]) for t in vocab])
+        postings = np.empty(int(offsets[-1]), dtype=np.int32)
+        tfs = np.empty(int(offsets[-1]), dtype=np.uint16)
+        for i, t in enumerate(vocab):
+            rows, counts = zip(*plists[t])
+            postings[offsets[i]:offsets[i + 1]] = rows
+            tfs[offsets[i]:offsets[i + 1]] = counts
+        return cls(ids, {t: i for i, t in enumerate(vocab)}, offsets, postings, tfs,
+                   np.asarray(lengths, dtype=np.int32), k1, b)
+
+    def save(self, path: Path) -> None:
+        """Write to `path` atomically (a new directory swapped in for the old one)."""
+        path = Path(path)
+        tmp = path.with_name(path.name + ".tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+        (tmp / "ids.txt").write_text("".join(i + "\n" for i in self.ids))
+        (tmp / "terms.txt").write_text("".join(t + "\n" for t in sorted(self.terms, key=self.terms.get)))
+        np.save(tmp / "offsets.npy", self.offsets)
+        np.save(tmp / "postings.npy", self.postings)
+        np.save(tmp / "tfs.npy", self.tfs)
+        np.save(tmp / "doc_len.npy", self.doc_len.astype(np.int32))
+        (tmp / "meta.json").write_text(json.dumps({"k1": self.k1, "b": self.b, "docs": len(self.ids)}))
+        old = path.with_name(path.name + ".old")
+        shutil.rmtree(old, ignore_errors=True)
+        if path.exists():
+            os.replace(path, old)
+        os.replace(tmp, path)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["LexicalIndex"]:
+        """The index saved at `path`, or None if there is none (retrieval falls back to dense)."""
+        path = Path(path)
+        try:
+            meta = json.loads((path / "meta.json").read_text())
+            ids = (path / "ids.txt").read_text().splitlines()
+            terms = {t: i for i, t in enumerate((path / "terms.txt").read_text().splitlines())}
+            arrays = {n: np.load(path / f"{n}.npy", mmap_mode="r") for n in ("offsets", "postings", "tfs")}
+            doc_len = np.load(path / "doc_len.npy")
+        except (OSError, ValueError) as e:
+            logger.info(f"No lexical index at {path} ({e}); using dense retrieval only")
+            return None
+        return cls(ids, terms, arrays["offsets"], arrays["postings"], arrays["tfs"], doc_len,
+                   meta.get("k1", BM25_K1), meta.get("b", BM25_B))
+
+    def _postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        row = self.terms.get(term)
+        if row is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint16)
+        s, e = int(self.offsets[row]), int(self.offsets[row + 1])
+        return self.postings[s:e], self.tfs[s:e]
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (chunk id, BM25 score)."""
+        terms = set(tokenize(query))
+        if not terms or not self.ids:
+            return []
+        n = len(self.ids)
+        scores = np.zeros(n, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / self.avgdl)
+        for term in terms:
+            rows, tf = self._postings(term)
+            if not len(rows):
+                continue
+            idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+            tf = tf.astype(np.float32)
+            scores[rows] += idf * tf * (self.k1 + 1) / (tf + norm[rows])
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        top = hits[np.argsort(-scores[hits], kind="stable")[:k]]
+        return [(self.ids[i], float(scores[i])) for i in top]
+
+    def decisive(self, query: str, hits: Sequence[Tuple[str, float]]) -> bool:
+        """
+        True for short identifier queries ("CMPS 1044", an email, "I-20 form") whose top
+        hit contains every query term: lexical results alone answer them, so the
+        embedding call can be skipped.
+        """
+        terms = list(dict.fromkeys(m.group() for m in _TOKEN.finditer(query.lower()) if m.group() not in STOPWORDS))
+        if not hits or len(terms) > 4 or not any(_IDENT.search(t) for t in terms):
+            return False
+        if self._rows is None:
+            self._rows = {d: i for i, d in enumerate(self.ids)}
+        top = self._rows[hits[0][0]]
+        for t in terms:
+            rows, _ = self._postings(t)
+            i = int(np.searchsorted(rows, top))
+            if i >= len(rows) or rows[i] != top:
+                return False
+        return True
@@ -0,0 +1,85 @@
+# core/manifest.py
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+def content_hash(text: str, meta: Dict | None = None) -> str:
+    """Hash of a chunk's text plus metadata; any change means the stored copy is stale."""
+    h = hashlib.sha1(text.encode("utf-8", errors="ignore"))
+    if meta:
+        h.update(json.dumps(meta, sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass
+class IndexPlan:
+    upsert: List[str] = field(default_factory=list)   # new or changed chunk ids
+    delete: List[str] = field(default_factory=list)   # ids to remove (stale or changed)
+    unchanged: int = 0
+    sources: Dict[str, Dict[str, str]] = field(default_factory=dict)  # manifest after apply
+
+    def __bool__(self) -> bool:
+        return bool(self.upsert or self.delete)
+
+
+class ChunkManifest:
+    """Which chunk ids (and content hashes) each source currently has in an index."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.sources: Dict[str, Dict[str, str]] = {}
+        if self.path.exists():
+            self.sources = json.loads(self.path.read_text()).get("sources", {})
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self.sources.values())
+
+    def plan(self, chunks: Iterable[Tuple[str, str, str]], refreshed: Iterable[str] = (),
+             keep: Iterable[str] = (), partial: bool = False) -> IndexPlan:
+        """
+        chunks: (chunk_id, source, hash) for everything produced this run.
+        refreshed: sources fetched this run; their chunk set is replaced by the new one
+                   (a page that now yields no chunks loses all of them).
+        keep: sources not refreshed this run whose chunks must survive (e.g. fetch failed).
+        Any other source in the manifest is considered gone and deleted, unless `partial`
+        is set, in which case only the refreshed sources are touched (for batched writes).
+        """
+        new: Dict[str, Dict[str, str]] = {}
+        for cid, source, h in chunks:
+            new.setdefault(source, {})[cid] = h
+        refreshed_set: Set[str] = set(refreshed) | set(new)
+        keep_set = set(keep)
+
+        plan = IndexPlan()
+        for source, old in self.sources.items():
+            if source in refreshed_set:
+                fresh = new.get(source, {})
+                plan.delete.extend(cid for cid, h in old.items() if fresh.get(cid) != h)
+            elif partial or source in keep_set:
+                plan.sources[source] = old
+            else:
+                plan.delete.extend(old)
+
+        for source, fresh in new.items():
+            old = self.sources.get(source, {})
+            for cid, h in fresh.items():
+                if old.get(cid) == h:
+                    plan.unchanged += 1
+                else:
+                    plan.upsert.append(cid)
+            plan.sources[source] = fresh
+        return plan
+
+    def apply(self, plan: IndexPlan) -> None:
+        self.sources = plan.sources
+        self.save()
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"sources": self.sources}))
+        os.replace(tmp, self.path)
@@ -0,0 +1,222 @@
+# core/pdf_extract.py
+import atexit
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from io import BytesIO
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Hashable, Iterable, Iterator, List, Tuple
+
+from loguru import logger
+
+# Resource caps
+PDF_WORKERS     = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+PDF_MAX_BYTES   = int(float(os.getenv("PDF_MAX_MB", "50")) * 1024 * 1024)
+PDF_MAX_SECONDS = float(os.getenv("PDF_MAX_SECONDS", "120"))   # per document
+PDF_MAX_PAGES   = int(os.getenv("PDF_MAX_PAGES", "1500"))
+KILL_GRACE      = 10.0   # seconds past PDF_MAX_SECONDS before a stuck worker is killed
+CACHE_DIR       = Path(os.getenv("PDF_TEXT_CACHE_DIR", "./data/pdf_text_cache"))
+
+
+def _clean(text: str) -> str:
+    return re.sub(r"[ \t]+", " ", text).strip()
+
+
+def _extract_pages(data: bytes, max_seconds: float, max_pages: int, conn) -> None:
+    """Child-process body: send each page's text down `conn`, then ("end", truncated) or ("error", message)."""
+    try:
+        from pdfminer.high_level import extract_pages
+        from pdfminer.layout import LTTextContainer
+
+        deadline = time.monotonic() + max_seconds
+        n = 0
+        for layout in extract_pages(BytesIO(data), maxpages=max_pages):
+            conn.send(_clean("".join(el.get_text() for el in layout if isinstance(el, LTTextContainer))))
+            n += 1
+            if time.monotonic() > deadline:
+                conn.send(("end", True))
+                return
+        conn.send(("end", n >= max_pages))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _done(value) -> Future:
+    fut: Future = Future()
+    fut.set_result(value)
+    return fut
+
+
+def _context():
+    # fork where available: a child starts in milliseconds with pdfminer already imported,
+    # instead of re-importing the caller's __main__ (ingest.py, the app) per document
+    if "fork" in multiprocessing.get_all_start_methods():
+        import pdfminer.high_level  # noqa: F401  (warm for the forked children)
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context("spawn")
+
+
+class PdfExtractor:
+    """
+    Extract PDF text in worker processes (at most `workers`), capped per document on input
+    size, pages and wall time; results are cached by the sha256 of the PDF bytes.
+    """
+
+    def __init__(self, workers: int = PDF_WORKERS, max_bytes: int = PDF_MAX_BYTES,
+                 max_seconds: float = PDF_MAX_SECONDS, max_pages: int = PDF_MAX_PAGES,
+                 cache_dir: Path = CACHE_DIR):
+        self.workers = max(1, workers)
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.max_pages = max_pages
+        self.cache_dir = Path(cache_dir)
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._procs: set = set()
+        self._lock = threading.Lock()
+        self._ctx = _context()
+
+    def _cache_path(self, digest: str, truncated: bool = False) -> Path:
+        name = f"{digest}-{self.max_pages}p-{self.max_seconds:g}s" if truncated else digest
+        return self.cache_dir / digest[:2] / f"{name}.json"
+
+    def _load(self, digest: str) -> Tuple[List[str], bool] | None:
+        for truncated in (False, True):
+            try:
+                hit = json.loads(self._cache_path(digest, truncated).read_text())
+                return hit["pages"], hit["truncated"]
+            except (OSError, ValueError, KeyError):
+                pass
+        return None
+
+    def _save(self, digest: str, pages: List[str], truncated: bool) -> None:
+        path = self._cache_path(digest, truncated)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps({"pages": pages, "truncated": truncated}))
+        os.replace(tmp, path)
+
+    def _run(self, data: bytes, digest: str, name: str, fut: Future) -> None:
+        pages: List[str] = []
+        truncated, error = False, None
+        with self._slots:
+            recv, send = self._ctx.Pipe(duplex=False)
+            proc = self._ctx.Process(target=_extract_pages, args=(data, self.max_seconds, self.max_pages, send),
+                                     name="pdf-extract", daemon=True)
+            try:
+                proc.start()
+                send.close()
+                with self._lock:
+                    self._procs.add(proc)
+                deadline = time.monotonic() + self.max_seconds + KILL_GRACE
+                while True:
+                    left = deadline - time.monotonic()
+                    if left <= 0 or not recv.poll(left):
+                        logger.warning(f"PDF {name} still parsing {self.max_seconds + KILL_GRACE:.0f}s in; killed")
+                        truncated = True
+                        break
+                    msg = recv.recv()
+                    if isinstance(msg, str):
+                        pages.append(msg)
+                        continue
+                    kind, value = msg
+                    if kind == "error":
+                        error = RuntimeError(value)
+                    else:
+                        truncated = value
+                    break
+            except EOFError:
+                error = RuntimeError(f"worker exited with code {proc.exitcode}")
+            except Exception as e:
+                error = e
+            finally:
+                if proc.is_alive():
+                    proc.kill()
+                if proc.pid is not None:
+                    proc.join()
+                recv.close()
+                with self._lock:
+                    self._procs.discard(proc)
+        if error is not None:
+            fut.set_exception(error)
+            return
+        try:
+            self._save(digest, pages, truncated)
+        except OSError as e:
+            logger.warning(f"Could not cache text of PDF {name}: {e}")
+        fut.set_result((pages, truncated))
+
+    def submit(self, data: bytes, name: str = "") -> Future:
+        """Schedule extraction; the future resolves to (page_texts, truncated)."""
+        if len(data) > self.max_bytes:
+            logger.warning(f"Skipping PDF {name} ({len(data) / 1e6:.1f} MB > {self.max_bytes / 1e6:.0f} MB cap)")
+            return _done(([], True))
+        digest = hashlib.sha256(data).hexdigest()
+        hit = self._load(digest)
+        if hit is not None:
+            return _done(hit)
+        fut: Future = Future()
+        threading.Thread(target=self._run, args=(data, digest, name, fut), name="pdf-extract", daemon=True).start()
+        return fut
+
+    def _wait(self, fut: Future, name: str) -> List[str]:
+        # bounded: the worker is killed KILL_GRACE seconds after the time cap
+        try:
+            pages, truncated = fut.result()
+        except Exception as e:
+            logger.warning(f"PDF extraction failed for {name}: {e}")
+            return []
+        if truncated:
+            logger.warning(f"PDF {name} hit the page/time cap; kept first {len(pages)} pages")
+        return pages
+
+    def extract(self, data: bytes, name: str = "") -> List[str]:
+        """Blocking: page texts for one PDF ([] if it failed or was skipped)."""
+        return self._wait(self.submit(data, name), name)
+
+    def extract_many(self, items: Iterable[Tuple[Hashable, bytes]]) -> Iterator[Tuple[Hashable, List[str]]]:
+        """
+        Yield (key, page_texts) as each PDF finishes, in completion order. Items are
+        pulled from `items` only as slots free up, so at most 2 x workers PDFs are held
+        in memory at once.
+        """
+        items = iter(items)
+        pending: Dict[Future, Hashable] = {}
+        while True:
+            for key, data in islice(items, 2 * self.workers - len(pending)):
+                pending[self.submit(data, str(key))] = key
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                key = pending.pop(fut)
+                yield key, self._wait(fut, str(key))
+
+    def close(self) -> None:
+        """Kill any extraction still running."""
+        with self._lock:
+            procs = list(self._procs)
+        for proc in procs:
+            if proc.is_alive():
+                proc.kill()
+
+
+_default: PdfExtractor | None = None
+_default_lock = threading.Lock()
+
+
+def get_pdf_extractor() -> PdfExtractor:
+    """Process-wide extractor; worker processes are started per document."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = PdfExtractor()
+            atexit.register(_default.close)
+        return _default
@@ -0,0 +1,76 @@
+# core/pipeline.py
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, exc: BaseException):
+        self.exc = exc
+
+
+def run_stage(fn: Callable[[T], R], items: Iterable[T], workers: int = 1, maxsize: int = 16) -> Iterator[R]:
+    """Lazily map `fn` over `items` on up to `workers` threads, yielding non-None results in order."""
+    out: "queue.Queue" = queue.Queue(maxsize=max(1, maxsize))
+    stop = threading.Event()
+
+    def put(value) -> bool:
+        while not stop.is_set():
+            try:
+                out.put(value, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                window: deque = deque()
+                for item in items:
+                    if stop.is_set():
+                        return
+                    window.append(pool.submit(fn, item))
+                    if len(window) >= workers and not put(window.popleft().result()):
+                        return
+                while window:
+                    if not put(window.popleft().result()):
+                        return
+            put(_END)
+        except BaseException as e:
+            put(_Failure(e))
+
+    t = threading.Thread(target=produce, daemon=True)
+    t.start()
+    try:
+        while True:
+            value = out.get()
+            if value is _END:
+                return
+            if isinstance(value, _Failure):
+                raise value.exc
+            if value is not None:
+                yield value
+    finally:
+        stop.set()
+
+
+def batched(items: Iterable[T], size: int, weight: Callable[[T], int] = lambda _: 1) -> Iterator[List[T]]:
+    """Group items into lists whose total `weight` reaches `size` (the last may be smaller)."""
+    batch: List[T] = []
+    total = 0
+    for item in items:
+        batch.append(item)
+        total += weight(item)
+        if total >= size:
+            yield batch
+            batch, total = [], 0
+    if batch:
+        yield batch
@@ -0,0 +1,170 @@
+# core/query_cache.py
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from core.embed_cache import EmbeddingCache
+
+# Query-embedding cache knobs
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "4096"))     # in-memory entries per model
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "86400"))    # seconds in memory; 0 = no expiry
+QUERY_CACHE_DIR = os.getenv("QUERY_CACHE_DIR", "./data/query_cache")  # "" disables the disk tier
+QUERY_CACHE_DISK_ROWS = int(os.getenv("QUERY_CACHE_DISK_ROWS", "100000"))  # disk tier cap; compacts to half
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a user query."""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    return re.sub(r"\s+", " ", text).strip().rstrip("?!. ")
+
+
+class QueryEmbeddingCache:
+    """
+    Query embeddings for one model, keyed by normalize_query(): an in-memory LRU with a
+    TTL in front of an optional EmbeddingCache on disk (compacted past `disk_rows`).
+    """
+
+    def __init__(self, model: str, max_entries: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL,
+                 disk_dir: str | Path | None = QUERY_CACHE_DIR, disk_rows: int = QUERY_CACHE_DISK_ROWS):
+        self.model = model
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.disk_rows = max(2, disk_rows)
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self._disk: Optional[EmbeddingCache] = None
+        self._mem: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._open_existing()
+
+    def __len__(self) -> int:
+        return len(self._mem)
+
+    def _open_existing(self) -> None:
+        """Reattach to vectors persisted by an earlier process (dims is in the dir name)."""
+        if self.disk_dir is None or not self.disk_dir.exists():
+            return
+        prefix = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model) + "-"
+        dirs = sorted((d for d in self.disk_dir.glob(prefix + "*") if d.name[len(prefix):].isdigit()),
+                      key=lambda d: d.stat().st_mtime)
+        if dirs:
+            self._disk_tier(int(dirs[-1].name[len(prefix):]))
+
+    def _disk_tier(self, dims: int) -> Optional[EmbeddingCache]:
+        if self.disk_dir is None:
+            return None
+        if self._disk is None or self._disk.dims != dims:
+            try:
+                self._disk = EmbeddingCache(self.model, dims, root=self.disk_dir)
+            except OSError as e:
+                logger.warning(f"Query cache disk tier unavailable ({e}); memory only")
+                self.disk_dir = None
+                return None
+        return self._disk
+
+    def get(self, query: str) -> Optional[List[float]]:
+        key = normalize_query(query)
+        with self._lock:
+            hit = self._mem.get(key)
+            if hit is not None:
+                vec, stamp = hit
+                if not self.ttl or time.time() - stamp < self.ttl:
+                    self._mem.move_to_end(key)
+                    self.hits += 1
+                    return vec
+                del self._mem[key]
+            disk = self._disk
+        if disk is not None:
+            vec = disk.get_many([key])[0]
+            if vec is not None:
+                vec = vec.tolist()
+                self._remember(key, vec)
+                with self._lock:
+                    self.disk_hits += 1
+                return vec
+        return None
+
+    def _remember(self, key: str, vec: List[float]) -> None:
+        with self._lock:
+            self._mem[key] = (vec, time.time())
+            self._mem.move_to_end(key)
+            while len(self._mem) > self.max_entries:
+                self._mem.popitem(last=False)
+
+    def put(self, query: str, vec: Sequence[float]) -> None:
+        key = normalize_query(query)
+        vec = [float(x) for x in vec]
+        self._remember(key, vec)
+        disk = self._disk_tier(len(vec))
+        if disk is not None:
+            try:
+                disk.put_many([key], [vec])
+                if len(disk) > self.disk_rows:
+                    # keep half: the queries recently used in memory first, then the newest
+                    with self._lock:
+                        recent = list(reversed(self._mem))
+                    disk.compact(self.disk_rows // 2, keep=recent)
+            except OSError as e:
+                logger.warning(f"Could not persist query embedding: {e}")
+
+    def embed(self, query: str, embed_fn: Callable[[str], Sequence[float]]) -> List[float]:
+        """Vector for `query`, calling embed_fn (e.g. Embeddings.embed_query) only on a miss."""
+        vec = self.get(query)
+        if vec is not None:
+            return vec
+        with self._lock:
+            self.misses += 1
+        vec = [float(x) for x in embed_fn(query)]
+        self.put(query, vec)
+        return vec
+
+    def embed_many(self, queries: Sequence[str],
+                   embed_fn: Callable[[List[str]], Sequence[Sequence[float]]]) -> List[List[float]]:
+        """Vectors for `queries`; the misses go to embed_fn (e.g. Embeddings.embed_documents) in one call."""
+        vecs = [self.get(q) for q in queries]
+        todo: Dict[str, str] = {}
+        for q, vec in zip(queries, vecs):
+            if vec is None:
+                todo.setdefault(normalize_query(q), q)
+        if not todo:
+            return vecs
+        with self._lock:
+            self.misses += len(todo)
+        fresh = {key: [float(x) for x in vec] for key, vec in zip(todo, embed_fn(list(todo.values())))}
+        for key, q in todo.items():
+            self.put(q, fresh[key])
+        return [vec if vec is not None else fresh[normalize_query(q)] for q, vec in zip(queries, vecs)]
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0, "entries": len(self),
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"Query embedding cache ({self.model}): {s['hits']} memory hits, {s['disk_hits']} disk hits, "
+                f"{s['misses']} misses ({100 * s['hit_rate']:.1f}% hit rate), {s['entries']} in memory")
+
+
+_caches: Dict[str, QueryEmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_query_cache(model: str) -> QueryEmbeddingCache:
+    """The process-wide cache for `model` (shared across Streamlit sessions and reruns)."""
+    with _caches_lock:
+        cache = _caches.get(model)
+        if cache is None:
+            cache = _caches[model] = QueryEmbeddingCache(model)
+        return cache
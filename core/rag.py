@@ -0,0 +1,164 @@
+# core/rag.py
+import os
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+from langchain.schema import Document
+from langchain.prompts import ChatPromptTemplate
+
+from utils import truncate
+from core.clients import get_chat_client, get_embeddings
+from core.context import CONTEXT_TOKENS, build_context
+from core.docstore import index_dir, load_faiss
+from core.lexical import HYBRID_FETCH_K, LexicalIndex, rrf
+from core.query_cache import get_query_cache
+from core.rerank import RERANK_CANDIDATES, Reranker
+from core.shards import ShardedIndex
+from core.tokens import token_counter
+
+load_dotenv()
+
+VSTORE_DIR = Path("vectorstore/faiss_index")
+EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
+CHAT_MODEL = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+
+SYSTEM_PROMPT = (
+    "You are MustangsAI, the official AI assistant for MSU Texas (Midwestern State University)."
+    " You are helpful, friendly, professional, and enthusiastic about MSU Texas."
+    " Answer questions using ONLY the provided context from official MSU sources."
+    " If you see names, titles, emails, or phone numbers in the context, share them clearly."
+    " Be specific with dates and deadlines. Keep responses clear and student-friendly."
+)
+
+PROMPT_TMPL = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_PROMPT),
+    ("human", "Question: {question}\n\nContext:\n{context}\n\nAnswer:"),
+])
+
+
+def load_vectorstore(vstore_dir: Path = VSTORE_DIR) -> FAISS:
+    if not vstore_dir.exists():
+        raise RuntimeError("Vector store not found. Run `python ingest.py` first.")
+    # memory-mapped index + SQLite docstore: no pickle, and chunks are read per hit
+    return load_faiss(vstore_dir, get_embeddings(EMBED_MODEL))
+
+
+def load_lexical(vstore_dir: Path = VSTORE_DIR) -> LexicalIndex | None:
+    """BM25 index written next to the vector store by ingest.py (None if missing)."""
+    return LexicalIndex.load(index_dir(vstore_dir) / "bm25")
+
+
+def load_shards(vs: FAISS, vstore_dir: Path = VSTORE_DIR) -> ShardedIndex | None:
+    """Per-category sub-indexes written by ingest.py (None if missing)."""
+    return ShardedIndex.load(index_dir(vstore_dir), vs.docstore)
+
+
+def _embed_model(vs: FAISS) -> str:
+    # query vectors are cached per model; a local-embedding index (core.retrievers) has its own
+    return getattr(vs.embedding_function, "model", None) or EMBED_MODEL
+
+
+def embed_query(vs: FAISS, query: str) -> list[float]:
+    # repeated questions (topic buttons, suggestions) skip the embeddings round trip
+    return get_query_cache(_embed_model(vs)).embed(query, vs.embedding_function.embed_query)
+
+
+def embed_queries(vs: FAISS, queries: list[str]) -> list[list[float]]:
+    """embed_query() for several queries; the cache misses are embedded in one request."""
+    return get_query_cache(_embed_model(vs)).embed_many(queries, vs.embedding_function.embed_documents)
+
+
+def lexical_answerable(lexical: LexicalIndex | None, query: str) -> bool:
+    """Short identifier query (course code, email, form number) the BM25 index answers alone."""
+    return lexical is not None and lexical.decisive(query, lexical.search(query, 1))
+
+
+def _dense_ids(vs: FAISS, vecs: list[list[float]], n: int, shards: ShardedIndex | None = None,
+               category: str | None = None) -> list[list[str]]:
+    x = np.asarray(vecs, dtype=np.float32)
+    if vs._normalize_L2:
+        x /= np.linalg.norm(x, axis=1, keepdims=True)
+    if shards is not None:
+        return shards.search_batch(x, n, category)
+    _, idx = vs.index.search(x, n)
+    return [[vs.index_to_docstore_id[i] for i in row if i != -1] for row in idx]
+
+
+def search(vs: FAISS, query: str, k: int = 6, lexical: LexicalIndex | None = None,
+           vec: list[float] | None = None, shards: ShardedIndex | None = None,
+           category: str | None = None, reranker: Reranker | None = None) -> list[Document]:
+    """
+    Hybrid retrieval: BM25 and dense (per-category `shards`, limited to `category` if given)
+    candidates merged with reciprocal rank fusion, then reranked to k with a `reranker`.
+    """
+    return search_batch(vs, [query], k, lexical, None if vec is None else [vec], shards, category, reranker)[0]
+
+
+def search_batch(vs: FAISS, queries: list[str], k: int = 6, lexical: LexicalIndex | None = None,
+                 vecs: list[list[float] | None] | None = None, shards: ShardedIndex | None = None,
+                 category: str | None = None, reranker: Reranker | None = None) -> list[list[Document]]:
+    """
+    search() for several queries at once: the ones that need an embedding share one
+    embeddings request (cache misses only) and one FAISS search over all their vectors.
+    """
+    if shards is None or category not in shards.indexes:
+        category = None   # no shards built yet, or nothing indexed in that category
+    n = max(k, RERANK_CANDIDATES) if reranker is not None else k
+    hybrid = lexical is not None and len(lexical) > 0
+    vecs = list(vecs) if vecs is not None else [None] * len(queries)
+    out: list[list[Document] | None] = [None] * len(queries)
+    lex: list[list[str]] = [[] for _ in queries]
+    if hybrid:
+        for i, query in enumerate(queries):
+            hits = lexical.search(query, HYBRID_FETCH_K)
+            if category is not None:
+                inside = shards.members(category, [doc_id for doc_id, _ in hits])
+                hits = [h for h in hits if h[0] in inside]
+            lex[i] = [doc_id for doc_id, _ in hits]
+            # decisive within the searched shard, not just somewhere in the index
+            if vecs[i] is None and hits and lexical.decisive(query, hits):
+                out[i] = vs.get_by_ids(lex[i][:k])
+    todo = [i for i in range(len(queries)) if out[i] is None]
+    need = [i for i in todo if vecs[i] is None]
+    if need:
+        for i, vec in zip(need, embed_queries(vs, [queries[i] for i in need])):
+            vecs[i] = vec
+    if todo:
+        dense = _dense_ids(vs, [vecs[i] for i in todo], max(n, HYBRID_FETCH_K) if hybrid else n, shards, category)
+        for i, ids in zip(todo, dense):
+            docs = vs.get_by_ids(rrf([ids, lex[i]])[:n] if hybrid else ids)
+            out[i] = reranker.rerank(queries[i], docs, k)[0] if reranker is not None else docs
+    return out
+
+
+def _prompt(question: str, docs: list[Document], budget: int) -> tuple[list, list[dict]]:
+    # adjacent chunks merged without their overlap, packed best first into the token budget
+    passages = build_context(docs, token_counter(CHAT_MODEL), budget)
+    context = "\n\n".join(p["text"] for p in passages)
+    cites = []
+    for p in passages:
+        cites.append({
+            "source": p["source"],
+            "preview": truncate(p["text"], 220),
+        })
+    return PROMPT_TMPL.format_messages(question=question, context=context), cites
+
+
+def answer_with_citations(question: str, docs: list[Document],
+                          budget: int = CONTEXT_TOKENS) -> tuple[str, list[dict]]:
+    prompt, cites = _prompt(question, docs, budget)
+    return get_chat_client(CHAT_MODEL).complete(prompt).strip(), cites
+
+
+def stream_with_citations(question: str, docs: list[Document],
+                          budget: int = CONTEXT_TOKENS) -> tuple[Iterator[str], list[dict]]:
+    """
+    answer_with_citations() with the answer as an iterator of text chunks, yielded as
+    the model generates them. The citations are known before the request is made;
+    the request itself starts on the first next().
+    """
+    prompt, cites = _prompt(question, docs, budget)
+    return get_chat_client(CHAT_MODEL).stream(prompt), cites
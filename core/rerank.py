@@ -0,0 +1,147 @@
+# core/rerank.py
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from loguru import logger
+
+# Cross-encoder rerank stage (off unless RERANK=1)
+RERANK = os.getenv("RERANK", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))   # retrieved before reranking
+RERANK_TOP_K = int(os.getenv("RERANK_TOP_K", "4"))              # passed to the LLM after
+RERANK_BATCH = int(os.getenv("RERANK_BATCH", "8"))              # (query, passage) pairs per forward pass
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "400"))  # hard limit; vector order past it
+RERANK_MAX_CHARS = 2000                                         # passage prefix scored (model sees ~512 tokens)
+
+
+class Reranker:
+    """
+    Reorders retrieved passages with a small CPU cross-encoder, falling back to vector order
+    when scoring overruns `budget_ms` or the model can't be loaded.
+    """
+
+    def __init__(self, model: str = RERANK_MODEL, batch_size: int = RERANK_BATCH,
+                 budget_ms: float = RERANK_BUDGET_MS):
+        self.model_name = model
+        self.batch_size = max(1, batch_size)
+        self.budget_ms = budget_ms
+        self._model = None
+        self._failed = False
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        self._loader: threading.Thread | None = None
+        self.calls = 0
+        self.timeouts = 0
+        self._total_ms = 0.0
+
+    def _load(self):
+        with self._load_lock:
+            if self._model is None and not self._failed:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name, max_length=512, device="cpu")
+                except Exception as e:
+                    self._failed = True
+                    logger.warning(f"Reranker {self.model_name} unavailable ({e}); keeping vector order")
+        return self._model
+
+    def _load_in_background(self) -> None:
+        with self._pool_lock:
+            if self._loader is None:
+                self._loader = threading.Thread(target=self._load, name="rerank-load", daemon=True)
+                self._loader.start()
+
+    def _submit(self, *args):
+        with self._pool_lock:
+            return self._pool.submit(self._score, *args)
+
+    def _replace_pool(self, stuck) -> None:
+        """Give up on the worker running `stuck`: new jobs get a fresh one, queued jobs are dropped."""
+        with self._pool_lock:
+            if stuck.done():
+                return
+            old, self._pool = self._pool, ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+        old.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self) -> bool:
+        """Load the model ahead of the first query; False if it can't be loaded."""
+        return self._load() is not None
+
+    def _score(self, query: str, texts: Sequence[str], cancel: threading.Event) -> List[float]:
+        model = self._load()
+        if model is None:
+            raise RuntimeError("no reranker model")
+        scores: List[float] = []
+        for i in range(0, len(texts), self.batch_size):
+            if cancel.is_set():
+                raise FutureTimeout()
+            batch = [(query, t[:RERANK_MAX_CHARS]) for t in texts[i:i + self.batch_size]]
+            scores.extend(float(s) for s in model.predict(batch, batch_size=len(batch), show_progress_bar=False))
+        return scores
+
+    def rerank(self, query: str, items: Sequence, top_k: int = RERANK_TOP_K,
+               text: Callable = lambda d: d.page_content) -> Tuple[List, Dict]:
+        """
+        The top_k of `items` (in vector/fusion order) by cross-encoder score, and
+        {"reranked": bool, "ms": float}. `text` extracts the passage from an item.
+        """
+        items = list(items)
+        if len(items) <= 1 or self._failed:
+            return items[:top_k], {"reranked": False, "ms": 0.0}
+        if self._model is None:
+            # load off the request path; this query keeps vector order
+            self._load_in_background()
+            return items[:top_k], {"reranked": False, "ms": 0.0}
+        t = time.perf_counter()
+        cancel = threading.Event()
+        fut = self._submit(query, [text(d) for d in items], cancel)
+        try:
+            scores = fut.result(timeout=self.budget_ms / 1000 if self.budget_ms > 0 else None)
+        except FutureTimeout:
+            cancel.set()
+            if not fut.cancel():
+                self._replace_pool(fut)
+            ms = (time.perf_counter() - t) * 1000
+            self._record(ms, timed_out=True)
+            logger.info(f"Rerank over budget ({ms:.0f} ms); using vector order")
+            return items[:top_k], {"reranked": False, "ms": ms}
+        except Exception:
+            return items[:top_k], {"reranked": False, "ms": 0.0}
+        ms = (time.perf_counter() - t) * 1000
+        self._record(ms)
+        order = sorted(range(len(items)), key=lambda i: -scores[i])   # stable: ties keep vector order
+        return [items[i] for i in order[:top_k]], {"reranked": True, "ms": ms}
+
+    def _record(self, ms: float, timed_out: bool = False) -> None:
+        with self._stats_lock:
+            self.calls += 1
+            self.timeouts += timed_out
+            self._total_ms += ms
+
+    def stats(self) -> Dict[str, float]:
+        return {"calls": self.calls, "timeouts": self.timeouts,
+                "mean_ms": self._total_ms / self.calls if self.calls else 0.0}
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"Reranker {self.model_name}: {s['calls']} calls, {s['timeouts']} over the "
+                f"{self.budget_ms:.0f} ms budget, mean {s['mean_ms']:.1f} ms")
+
+
+_reranker: Reranker | None = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker() -> Reranker:
+    """Process-wide reranker (the model is loaded once, on first use)."""
+    global _reranker
+    with _reranker_lock:
+        if _reranker is None:
+            _reranker = Reranker()
+        return _reranker
+
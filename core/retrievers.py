@@ -0,0 +1,441 @@
+# core/retrievers.py
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+from langchain_core.embeddings import Embeddings
+from loguru import logger
+
+from core.answer_cache import index_version
+from core.batching import BATCH_WINDOW_MS, MicroBatcher
+from core.docstore import STAGING_DIR, index_dir, load_faiss, new_faiss, publish_dir, save_faiss
+from core.embed_cache import EmbeddingCache
+from core.lexical import HYBRID_FETCH_K, LexicalIndex, rrf
+from core.query_cache import get_query_cache
+from core.rag import (VSTORE_DIR, embed_queries, lexical_answerable, load_lexical, load_shards, load_vectorstore,
+                      search_batch)
+from core.rerank import RERANK_CANDIDATES, Reranker
+from core.shards import ShardedIndex, build_shards
+
+# Retrieval backend, chosen per process: faiss (OpenAI embeddings, app.py's default),
+# chroma (local MiniLM, app/main.py's default) or local (FAISS over local embeddings,
+# fully offline). Each app passes its own default when RETRIEVER is unset.
+RETRIEVER = os.getenv("RETRIEVER", "")
+BACKENDS = ("faiss", "chroma", "local")
+CHROMA_DIR = Path(os.getenv("CHROMA_DIR", "./data/chroma"))
+CHROMA_COLLECTION = "msu_docs"
+LOCAL_EMBED_MODEL = os.getenv("EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_VSTORE_DIR = Path(os.getenv("LOCAL_VSTORE_DIR", "vectorstore/local_index"))
+LATENCY_WINDOW = 1000    # recent calls kept for the latency percentiles
+
+
+@lru_cache(maxsize=None)
+def _sentence_model(name: str):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name, device="cpu")
+
+
+class LocalEmbeddings(Embeddings):
+    """sentence-transformers model as a LangChain embeddings object (unit vectors, CPU, no API)."""
+
+    def __init__(self, model: str = LOCAL_EMBED_MODEL):
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vecs = _sentence_model(self.model).encode(list(texts), batch_size=64, normalize_embeddings=True,
+                                                  show_progress_bar=False)
+        return np.asarray(vecs, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _dir_bytes(path: Path) -> int:
+    path = Path(path)
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file()) if path.exists() else 0
+
+
+class Retriever:
+    """One retrieval backend behind both apps: micro-batched, optionally reranked search() returning Documents."""
+
+    name = ""
+
+    def __init__(self, reranker: Reranker | None = None, batch_window_ms: float = BATCH_WINDOW_MS):
+        self.reranker = reranker
+        self._ms: deque = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.queries = 0
+        self._searches = self._embeds = None
+        if batch_window_ms > 0:
+            self._searches = MicroBatcher(self._run_searches, batch_window_ms, name=f"{self.name}-search")
+            self._embeds = MicroBatcher(self._embed_batch, batch_window_ms, name=f"{self.name}-embed")
+
+    # --- backend hooks ---
+    def _batch_search(self, queries: List[str], k: int, category: str | None,
+                      vecs: List[Optional[List[float]]]) -> List[List[Document]]:
+        raise NotImplementedError
+
+    def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        """Query vectors in this backend's embedding space (cached; misses in one request)."""
+        raise NotImplementedError
+
+    def lexical_only(self, query: str) -> bool:
+        """True when the lexical index answers `query` outright and no embedding is needed."""
+        return False
+
+    def version(self) -> str:
+        """Changes whenever the indexed content does (keys the answer caches)."""
+        raise NotImplementedError
+
+    def outdated(self) -> bool:
+        """True when a newer index generation has been published than the one loaded."""
+        return False
+
+    def describe(self) -> Dict[str, float]:
+        """Size of what is indexed: chunks, dims, bytes on disk."""
+        return {}
+
+    # --- interface ---
+    def embed(self, query: str) -> List[float]:
+        """Query vector in this backend's embedding space (cached)."""
+        if self._embeds is None:
+            return self._embed_batch([query])[0]
+        return self._embeds.submit(query)
+
+    def search(self, query: str, k: int = 6, category: str | None = None,
+               vec: List[float] | None = None) -> List[Document]:
+        """
+        The k best chunks for `query`. `category` (core.categories) restricts the search
+        to that part of the index where the backend supports it; `vec` is the query's
+        embedding when the caller already has it.
+        """
+        if self._searches is None:
+            return self.batch_search([query], k, category, None if vec is None else [vec])[0]
+        return self._rerank(query, self._searches.submit((query, k, category, vec)), k)
+
+    def _run_searches(self, calls: List[tuple]) -> List[List[Document]]:
+        """One candidate search per (k, category) among the coalesced search() calls."""
+        groups: Dict[tuple, List[int]] = {}
+        for i, (_, k, category, _) in enumerate(calls):
+            groups.setdefault((k, category), []).append(i)
+        out: List[List[Document]] = [[] for _ in calls]
+        for (k, category), rows in groups.items():
+            found = self._candidates([calls[i][0] for i in rows], k, category, [calls[i][3] for i in rows])
+            for i, docs in zip(rows, found):
+                out[i] = docs
+        return out
+
+    def batch_search(self, queries: Sequence[str], k: int = 6, category: str | None = None,
+                     vecs: Sequence[Optional[List[float]]] | None = None) -> List[List[Document]]:
+        """search() for each of `queries` (`vecs`, if given, lines up with them; None = embed)."""
+        queries = list(queries)
+        if not queries:
+            return []
+        vecs = list(vecs) if vecs is not None else [None] * len(queries)
+        return [self._rerank(q, docs, k) for q, docs in zip(queries, self._candidates(queries, k, category, vecs))]
+
+    def _candidates(self, queries: List[str], k: int, category: str | None,
+                    vecs: List[Optional[List[float]]]) -> List[List[Document]]:
+        """Search results before reranking: k per query, or RERANK_CANDIDATES with a reranker."""
+        t = time.perf_counter()
+        n = max(k, RERANK_CANDIDATES) if self.reranker is not None else k
+        out = self._batch_search(queries, n, category, vecs)
+        self._record(len(queries), (time.perf_counter() - t) * 1000)
+        return out
+
+    def _rerank(self, query: str, docs: List[Document], k: int) -> List[Document]:
+        return self.reranker.rerank(query, docs, k)[0] if self.reranker is not None else docs
+
+    def _record(self, queries: int, ms: float) -> None:
+        with self._lock:
+            self.calls += 1
+            self.queries += queries
+            self._ms.append(ms)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            ms = sorted(self._ms)
+        pct = lambda p: ms[min(len(ms) - 1, int(p * len(ms)))] if ms else 0.0
+        batching = {}
+        for kind, batcher in (("search", self._searches), ("embed", self._embeds)):
+            if batcher is not None:
+                b = batcher.stats()
+                batching.update({f"{kind}_mean_batch": b["mean_batch"], f"{kind}_wait_ms": b["mean_wait_ms"]})
+        return {"backend": self.name, "calls": self.calls, "queries": self.queries,
+                "mean_ms": sum(ms) / len(ms) if ms else 0.0, "p50_ms": pct(0.5), "p95_ms": pct(0.95),
+                **batching, **self.describe()}
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"Retriever {self.name}: {s['calls']} calls ({s['queries']} queries), "
+                f"p50 {s['p50_ms']:.1f} ms, p95 {s['p95_ms']:.1f} ms"
+                + (f", {s['search_mean_batch']:.1f} searches per batch" if "search_mean_batch" in s else ""))
+
+
+class FaissRetriever(Retriever):
+    """Hybrid FAISS + BM25 search (core.rag.search) over the index ingest.py writes."""
+
+    name = "faiss"
+
+    def __init__(self, vs, path: Path, lexical: LexicalIndex | None = None, shards=None,
+                 reranker: Reranker | None = None, index_path: Path | None = None):
+        super().__init__(reranker)
+        self.vs = vs
+        self.path = Path(path)
+        # the generation actually opened; ingest may publish a newer one under `path`
+        self.index_path = Path(index_path or index_dir(path))
+        self.lexical = lexical
+        self.shards = shards
+
+    @classmethod
+    def load(cls, path: Path | None = None, reranker: Reranker | None = None) -> "FaissRetriever":
+        path = Path(path or VSTORE_DIR)
+        live = index_dir(path)
+        vs = load_vectorstore(live)
+        return cls(vs, path, load_lexical(live), load_shards(vs, live), reranker, live)
+
+    def _batch_search(self, queries, k, category, vecs):
+        return search_batch(self.vs, queries, k, self.lexical, vecs, self.shards, category)
+
+    def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        return embed_queries(self.vs, queries)
+
+    def lexical_only(self, query: str) -> bool:
+        return lexical_answerable(self.lexical, query)
+
+    def version(self) -> str:
+        return index_version(self.index_path)
+
+    def outdated(self) -> bool:
+        return index_dir(self.path) != self.index_path
+
+    def describe(self) -> Dict[str, float]:
+        return {"chunks": self.vs.index.ntotal, "dims": self.vs.index.d, "disk_bytes": _dir_bytes(self.index_path)}
+
+
+class LocalRetriever(FaissRetriever):
+    """The FAISS stack over local sentence-transformers embeddings, under LOCAL_VSTORE_DIR (no network)."""
+
+    name = "local"
+
+    @classmethod
+    def load(cls, path: Path | None = None, reranker: Reranker | None = None,
+             model: str = LOCAL_EMBED_MODEL) -> "LocalRetriever":
+        path = Path(path or LOCAL_VSTORE_DIR)
+        if not path.exists():
+            raise RuntimeError("Local index not found. Run `python -m core.retrievers --build-local` first.")
+        live = index_dir(path)
+        vs = load_faiss(live, LocalEmbeddings(model))
+        return cls(vs, path, LexicalIndex.load(live / "bm25"), ShardedIndex.load(live, vs.docstore), reranker, live)
+
+    @staticmethod
+    def build(source: Path | None = None, dest: Path = LOCAL_VSTORE_DIR, model: str = LOCAL_EMBED_MODEL) -> int:
+        """Re-embed the chunks of the FAISS index at `source` with `model` and publish them under `dest`."""
+        emb = LocalEmbeddings(model)
+        src = load_faiss(Path(source or VSTORE_DIR), emb)
+        ids = [src.index_to_docstore_id[i] for i in range(src.index.ntotal)]
+        docs = src.docstore.mget(ids)
+        texts = [d.page_content for d in docs]
+        dims = _sentence_model(model).get_sentence_embedding_dimension()
+        vectors = EmbeddingCache(model, dims).embed(texts, emb.embed_documents)
+        staging = Path(dest) / STAGING_DIR
+        shutil.rmtree(staging, ignore_errors=True)
+        vs = new_faiss(staging, emb, dims)
+        vs.add_embeddings(list(zip(texts, vectors)), metadatas=[d.metadata for d in docs], ids=ids)
+        save_faiss(vs, staging)
+        build_shards(vs, staging)
+        LexicalIndex.build(
+            (cid, f"{d.metadata.get('title', '')}\n{d.page_content}") for cid, d in zip(ids, docs)
+        ).save(staging / "bm25")
+        vs.docstore.close()
+        publish_dir(dest, staging)
+        logger.info(f"Built local index of {len(ids)} chunks ({model}, {dims} dims) in {dest}")
+        return len(ids)
+
+
+class ChromaRetriever(Retriever):
+    """
+    Hybrid Chroma + BM25 search over the collection core/indexer.py builds (local
+    MiniLM embeddings). Documents carry the chunk metadata with "source" set to its
+    URL and "score" the cosine similarity (0 for chunks only BM25 found).
+    """
+
+    name = "chroma"
+
+    def __init__(self, collection, embed_fn, path: Path, lexical: LexicalIndex | None = None,
+                 model: str = LOCAL_EMBED_MODEL, reranker: Reranker | None = None):
+        super().__init__(reranker)
+        self.collection = collection
+        self.embed_fn = embed_fn
+        self.path = Path(path)
+        self.lexical = lexical
+        self.model = model
+
+    @classmethod
+    def load(cls, path: Path | None = None, reranker: Reranker | None = None,
+             model: str = LOCAL_EMBED_MODEL) -> "ChromaRetriever":
+        import chromadb
+        from chromadb.utils import embedding_functions
+        path = Path(path or CHROMA_DIR)
+        client = chromadb.PersistentClient(path=str(path))
+        embed_fn = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model)
+        collection = client.get_or_create_collection(
+            name=CHROMA_COLLECTION,
+            metadata={"hnsw:space": "cosine"},
+            embedding_function=embed_fn,
+        )
+        return cls(collection, embed_fn, path, LexicalIndex.load(path / "bm25"), model, reranker)
+
+    def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        return get_query_cache(self.model).embed_many(queries, lambda qs: [list(v) for v in self.embed_fn(qs)])
+
+    def lexical_only(self, query: str) -> bool:
+        return self.lexical is not None and self.lexical.decisive(query, self.lexical.search(query, 1))
+
+    def _batch_search(self, queries, k, category, vecs):
+        lex = [[doc_id for doc_id, _ in self.lexical.search(q, HYBRID_FETCH_K)] if self.lexical else []
+               for q in queries]
+        # identifier queries (course codes, emails) the lexical index answers need no embedding
+        dense_rows = [i for i, q in enumerate(queries)
+                      if not (vecs[i] is None and self.lexical
+                              and self.lexical.decisive(q, [(d, 0.0) for d in lex[i]]))]
+        need = [i for i in dense_rows if vecs[i] is None]
+        for i, vec in zip(need, self._embed_batch([queries[i] for i in need])):
+            vecs[i] = vec
+        found: Dict[str, Dict] = {}
+        dense: List[List[str]] = [[] for _ in queries]
+        if dense_rows:
+            res = self.collection.query(
+                query_embeddings=[vecs[i] for i in dense_rows],
+                n_results=max(k, HYBRID_FETCH_K) if self.lexical else k,
+                where={"category": category} if category else None,
+                include=["metadatas", "documents", "distances"],
+            )
+            for row, i in enumerate(dense_rows):
+                for cid, doc, meta, dist in zip(res["ids"][row], res["documents"][row],
+                                                res["metadatas"][row], res["distances"][row]):
+                    found.setdefault(cid, {"text": doc, "meta": meta or {}, "score": {}})["score"][i] = 1 - float(dist)
+                    dense[i].append(cid)
+        fused = [rrf([dense[i], lex[i]]) for i in range(len(queries))]
+        # lexical-only hits: fetch them (all candidates when filtering by category, else just the top k)
+        missing = sorted({cid for ids in fused for cid in (ids if category else ids[:k]) if cid not in found})
+        if missing:
+            got = self.collection.get(ids=missing, include=["metadatas", "documents"])
+            for cid, doc, meta in zip(got["ids"], got["documents"], got["metadatas"]):
+                found[cid] = {"text": doc, "meta": meta or {}, "score": {}}
+        out = []
+        for i, ids in enumerate(fused):
+            docs = []
+            for cid in ids:
+                c = found.get(cid)
+                if c is None or (category and c["meta"].get("category", category) != category):
+                    continue   # lexical index ahead of / behind the collection, or another category
+                meta = dict(c["meta"], source=c["meta"].get("url", ""), score=c["score"].get(i, 0.0))
+                docs.append(Document(page_content=c["text"], metadata=meta, id=cid))
+                if len(docs) == k:
+                    break
+            out.append(docs)
+        return out
+
+    def version(self) -> str:
+        return index_version(self.path)
+
+    def describe(self) -> Dict[str, float]:
+        return {"chunks": self.collection.count(), "disk_bytes": _dir_bytes(self.path)}
+
+
+def load_retriever(name: str, reranker: Reranker | None = None) -> Retriever:
+    """Backend `name` (one of BACKENDS) with its default index location."""
+    if name == "faiss":
+        return FaissRetriever.load(reranker=reranker)
+    if name == "local":
+        return LocalRetriever.load(reranker=reranker)
+    if name == "chroma":
+        return ChromaRetriever.load(reranker=reranker)
+    raise ValueError(f"Unknown retriever backend {name!r}; expected one of {', '.join(BACKENDS)}")
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # peak, not current
+
+
+def benchmark(backends: Sequence[str], queries: Sequence[str], k: int = 6, batch: int = 8,
+              repeat: int = 3) -> List[Dict]:
+    """Cold, warm and batched latency per backend, with recall@k by source URL against the first one."""
+    rows, reference = [], None
+    for name in backends:
+        rss = _rss_mb()
+        t = time.perf_counter()
+        try:
+            r = load_retriever(name)
+        except Exception as e:
+            logger.warning(f"Skipping {name}: {e}")
+            continue
+        row = {"backend": name, "load_ms": (time.perf_counter() - t) * 1000}
+        t = time.perf_counter()
+        results = [r.search(q, k) for q in queries]
+        row["cold_ms"] = (time.perf_counter() - t) * 1000 / len(queries)
+        row["rss_mb"] = _rss_mb() - rss
+        r._ms.clear()
+        for _ in range(repeat):
+            for q in queries:
+                r.search(q, k)
+        s = r.stats()
+        row.update(p50_ms=s["p50_ms"], p95_ms=s["p95_ms"], chunks=s.get("chunks", 0),
+                   disk_mb=s.get("disk_bytes", 0) / 2**20)
+        t = time.perf_counter()
+        for i in range(0, len(queries), batch):
+            r.batch_search(queries[i:i + batch], k)
+        row["batch_qps"] = len(queries) / (time.perf_counter() - t)
+        sources = [{d.metadata.get("source") for d in docs} for docs in results]
+        if reference is None:
+            reference = sources
+        row["recall"] = float(np.mean([len(s & ref) / len(ref) for s, ref in zip(sources, reference) if ref]))
+        rows.append(row)
+    return rows
+
+
+def main() -> None:
+    import argparse
+    from core.canned import canned_questions
+
+    parser = argparse.ArgumentParser(description="Compare retrieval backends on latency, memory and recall.")
+    parser.add_argument("backends", nargs="*", default=list(BACKENDS),
+                        help="backends to run; recall is measured against the first")
+    parser.add_argument("--queries", help="file with one question per line (default: the canned questions)")
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--batch", type=int, default=8, help="queries per batch_search call")
+    parser.add_argument("--repeat", type=int, default=3, help="warm passes over the queries")
+    parser.add_argument("--build-local", action="store_true", help="(re)build the local-embedding index first")
+    args = parser.parse_args()
+
+    if args.build_local:
+        LocalRetriever.build()
+    if args.queries:
+        queries = [q.strip() for q in Path(args.queries).read_text(encoding="utf-8").splitlines() if q.strip()]
+    else:
+        queries = list(canned_questions())
+    rows = benchmark(args.backends, queries, args.k, args.batch, args.repeat)
+    print(f"{'backend':<8} {'chunks':>7} {'disk MB':>8} {'RSS MB':>7} {'load ms':>8} {'cold ms':>8} "
+          f"{'p50 ms':>7} {'p95 ms':>7} {'batch q/s':>10} {'recall@' + str(args.k):>9}")
+    for r in rows:
+        print(f"{r['backend']:<8} {r['chunks']:>7} {r['disk_mb']:>8.2f} {r['rss_mb']:>7.1f} {r['load_ms']:>8.0f} "
+              f"{r['cold_ms']:>8.1f} {r['p50_ms']:>7.2f} {r['p95_ms']:>7.2f} {r['batch_qps']:>10.0f} "
+              f"{r['recall']:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
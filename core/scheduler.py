@@ -0,0 +1,310 @@
+# core/scheduler.py
+import json
+import math
+import os
+import re
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from xml.etree import ElementTree
+
+import requests
+from loguru import logger
+
+from core.ingest import HTML_TIMEOUT, cached_get
+
+DAY = 86400.0
+
+# Recrawl intervals: keywords matched against a URL's seed-file section header and its
+# path; the shortest matching interval wins, anything unmatched uses the default.
+RECRAWL_RULES: List[Tuple[Tuple[str, ...], float]] = [
+    (("event", "calendar", "athletic", "news"), 1),                     # daily
+    (("polic", "catalog", "faculty", "staff", "directory", "leadership"), 30),  # monthly
+]
+DEFAULT_RECRAWL_DAYS = float(os.getenv("RECRAWL_DEFAULT_DAYS", "7"))
+
+# Discovery limits
+MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "1"))          # link hops from a seed
+MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "1000"))       # scheduled pages, seeds included
+SITEMAP_INTERVAL = DAY                                      # re-read sitemaps at most daily
+MAX_SITEMAPS = 20                                           # per host, sitemap indexes included
+# Hosts whose root-level seeds may discover pages anywhere on the host (comma-separated);
+# elsewhere a seed at the root is fetched but discovers nothing.
+WHOLE_HOSTS = {h.strip().lower() for h in os.getenv("CRAWL_WHOLE_HOSTS", "").split(",") if h.strip()}
+
+_TRACKING = re.compile(r"^(utm_\w+|fbclid|gclid|mc_cid|mc_eid|_ga)$", re.I)
+_SECTION = re.compile(r"^#\s*=+\s*(.*?)\s*=+\s*$")
+
+
+def canonicalize(url: str) -> str:
+    """
+    Normalize a URL for fetching: lowercase scheme and host, no default port, no
+    fragment, tracking parameters dropped and the rest sorted, duplicate slashes collapsed.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    path = re.sub(r"/{2,}", "/", parts.path) or "/"
+    query = urllib.parse.urlencode(sorted(
+        (k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True) if not _TRACKING.match(k)
+    ))
+    return urllib.parse.urlunsplit((scheme, host, path, query, ""))
+
+
+def url_key(url: str) -> str:
+    """Identity of a page: its canonical URL with http/https and trailing-slash variants folded."""
+    parts = urllib.parse.urlsplit(canonicalize(url))
+    return urllib.parse.urlunsplit(("", parts.netloc, parts.path.rstrip("/") or "/", parts.query, ""))
+
+
+def read_seed_sections(path: Path) -> List[Tuple[str, str]]:
+    """(url, section) for each URL in a seed file; the section is the last `# ===== X =====` header."""
+    out: List[Tuple[str, str]] = []
+    if not Path(path).exists():
+        return out
+    section = ""
+    for line in Path(path).read_text().splitlines():
+        line = line.strip()
+        m = _SECTION.match(line)
+        if m:
+            section = m.group(1)
+        elif line and not line.startswith("#"):
+            out.append((line, section))
+    return out
+
+
+def recrawl_interval(section: str, url: str) -> float:
+    """Seconds between fetches of `url`, from RECRAWL_RULES."""
+    haystack = f"{section} {urllib.parse.urlsplit(url).path}".lower()
+    days = [d for words, d in RECRAWL_RULES if any(w in haystack for w in words)]
+    return min(days, default=DEFAULT_RECRAWL_DAYS) * DAY
+
+
+def _scope(url: str, whole_hosts: Iterable[str] = ()) -> Optional[Tuple[str, str]]:
+    """
+    (host, path prefix) a seed may discover pages under: its top-level directory, or the
+    whole host for a root seed in `whole_hosts` (else None).
+    """
+    parts = urllib.parse.urlsplit(url)
+    segments = [s for s in parts.path.split("/") if s]
+    if segments and "." in segments[-1]:
+        segments.pop()
+    if segments:
+        return parts.netloc, f"/{segments[0]}/"
+    return (parts.netloc, "/") if parts.netloc in whole_hosts else None
+
+
+def _parse_lastmod(value: str) -> float:
+    """Sitemap <lastmod> (W3C datetime) as a timestamp; 0 when missing or unparsable."""
+    try:
+        dt = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return 0.0
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()
+
+
+class CrawlScheduler:
+    """
+    Persistent recrawl schedule for the web sources of one index: seeds plus pages found in
+    sitemaps and links; due() returns the pages whose interval has elapsed, most overdue first.
+    """
+
+    def __init__(self, path: Path, max_depth: int = MAX_DEPTH, max_pages: int = MAX_PAGES,
+                 whole_hosts: Iterable[str] = WHOLE_HOSTS):
+        self.path = Path(path)
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.whole_hosts = {h.lower() for h in whole_hosts}
+        self.pages: Dict[str, Dict] = {}
+        self.sitemaps_checked: Dict[str, float] = {}
+        self._scopes: Dict[str, Tuple[str, str]] = {}
+        if self.path.exists():
+            try:
+                state = json.loads(self.path.read_text())
+                self.pages = state.get("pages", {})
+                self.sitemaps_checked = state.get("sitemaps_checked", {})
+            except (OSError, ValueError):
+                logger.warning(f"Unreadable crawl state {self.path}; starting a new schedule")
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    # --- building the schedule ---
+
+    def sync_seeds(self, seeds: Iterable[Tuple[str, str]]) -> None:
+        """
+        Make the schedule match the seed list: (url, section) pairs. Pages whose seed
+        was removed from the files are dropped along with everything discovered from it,
+        and so are discovered pages that no seed's scope covers any more.
+        """
+        roots = set()
+        for url, section in seeds:
+            key = url_key(url)
+            if key in roots:
+                continue
+            roots.add(key)
+            canon = canonicalize(url)
+            entry = self.pages.setdefault(key, {"url": canon, "last_fetch": 0.0})
+            entry.update(url=canon, seed=key, section=section, depth=0,
+                         interval=recrawl_interval(section, canon))
+            scope = _scope(canon, self.whole_hosts)
+            if scope:
+                self._scopes[key] = scope
+            else:
+                self._scopes.pop(key, None)
+                logger.info(f"Seed {canon} is at its host root; discovering nothing from it "
+                            f"(add the host to CRAWL_WHOLE_HOSTS to crawl the whole host)")
+        dropped = [k for k, e in self.pages.items()
+                   if e.get("seed") not in roots or (e.get("depth", 0) > 0 and self._root_for(e["url"]) is None)]
+        for k in dropped:
+            del self.pages[k]
+        if dropped:
+            logger.info(f"Unscheduled {len(dropped)} pages whose seeds were removed")
+
+    def _root_for(self, url: str) -> Optional[str]:
+        """Seed whose scope covers `url` most specifically, if any."""
+        parts = urllib.parse.urlsplit(url)
+        best, best_len = None, -1
+        for key, (host, prefix) in self._scopes.items():
+            if parts.netloc == host and parts.path.startswith(prefix) and len(prefix) > best_len:
+                best, best_len = key, len(prefix)
+        return best
+
+    def add(self, url: str, depth: int, lastmod: float = 0.0) -> bool:
+        """Schedule a discovered page; False if out of scope, too deep, known, or over the cap."""
+        canon = canonicalize(url)
+        key = url_key(canon)
+        if key in self.pages:
+            if lastmod:
+                self.pages[key]["lastmod"] = lastmod
+            return False
+        root = self._root_for(canon)
+        if root is None or depth > self.max_depth or len(self.pages) >= self.max_pages:
+            return False
+        section = self.pages[root]["section"]
+        self.pages[key] = {
+            "url": canon, "seed": root, "section": section, "depth": depth,
+            "interval": recrawl_interval(section, canon), "last_fetch": 0.0, "lastmod": lastmod,
+        }
+        return True
+
+    def add_links(self, parent: str, links: Iterable[str]) -> int:
+        """Schedule same-scope links found on `parent`, one hop deeper than it."""
+        entry = self.pages.get(url_key(parent))
+        if entry is None or entry["depth"] >= self.max_depth:
+            return 0
+        return sum(self.add(u, entry["depth"] + 1) for u in links)
+
+    def discover_sitemaps(self, session: requests.Session | None = None, force: bool = False) -> int:
+        """Schedule in-scope pages from each seed host's sitemaps (robots.txt Sitemap: lines,
+        else /sitemap.xml). Hosts are re-read at most once per SITEMAP_INTERVAL."""
+        added = 0
+        now = time.time()
+        for host in sorted({h for h, _ in self._scopes.values()}):
+            if not force and now - self.sitemaps_checked.get(host, 0.0) < SITEMAP_INTERVAL:
+                continue
+            self.sitemaps_checked[host] = now
+            scheme = next(urllib.parse.urlsplit(self.pages[k]["url"]).scheme
+                          for k, (h, _) in self._scopes.items() if h == host)
+            base = f"{scheme}://{host}"
+            try:
+                robots = cached_get(f"{base}/robots.txt", HTML_TIMEOUT, session=session).text
+                queue = [ln.split(":", 1)[1].strip() for ln in robots.splitlines()
+                         if ln.lower().startswith("sitemap:")]
+            except Exception:
+                queue = []
+            queue = queue or [f"{base}/sitemap.xml"]
+            seen = set()
+            while queue and len(seen) < MAX_SITEMAPS:
+                sm = queue.pop(0)
+                if sm in seen:
+                    continue
+                seen.add(sm)
+                try:
+                    root = ElementTree.fromstring(cached_get(sm, HTML_TIMEOUT, session=session).content)
+                except Exception as e:
+                    logger.debug(f"No sitemap at {sm}: {e}")
+                    continue
+                for node in root:
+                    tag = node.tag.rsplit("}", 1)[-1]
+                    fields = {c.tag.rsplit("}", 1)[-1]: (c.text or "").strip() for c in node}
+                    loc = fields.get("loc")
+                    if not loc:
+                        continue
+                    if tag == "sitemap":
+                        queue.append(loc)
+                    elif tag == "url" and urllib.parse.urlsplit(loc).netloc.lower() == host:
+                        added += self.add(loc, depth=1, lastmod=_parse_lastmod(fields.get("lastmod", "")))
+        if added:
+            logger.info(f"Sitemaps added {added} pages to the crawl schedule")
+        return added
+
+    # --- running it ---
+
+    def _overdue(self, entry: Dict, now: float) -> float:
+        last = entry.get("last_fetch", 0.0)
+        if not last or entry.get("lastmod", 0.0) > last:
+            return math.inf
+        return (now - last) / max(entry["interval"], 1.0)
+
+    def due(self, now: float | None = None, limit: int | None = None) -> List[str]:
+        """URLs to fetch this run, most overdue first (never fetched / changed per sitemap first)."""
+        now = time.time() if now is None else now
+        ranked = sorted(
+            ((self._overdue(e, now), e["depth"], i, e["url"]) for i, e in enumerate(self.pages.values())),
+            key=lambda t: (-t[0], t[1], t[2]),
+        )
+        urls = [url for overdue, _, _, url in ranked if overdue >= 1.0]
+        return urls[:limit] if limit else urls
+
+    def not_due(self, now: float | None = None) -> List[str]:
+        due = set(self.due(now))
+        return [e["url"] for e in self.pages.values() if e["url"] not in due]
+
+    def urls(self) -> List[str]:
+        return [e["url"] for e in self.pages.values()]
+
+    def section(self, url: str) -> str:
+        """Seed-file section `url` (or the seed it was discovered from) is listed under."""
+        return self.pages.get(url_key(url), {}).get("section", "")
+
+    def pdfs(self, urls: Iterable[str]) -> List[str]:
+        """PDFs recorded for these pages on their last successful fetch."""
+        return [p for u in urls for p in self.pages.get(url_key(u), {}).get("pdfs", [])]
+
+    def record(self, url: str, ok: bool = True, gone: bool = False, pdfs: Iterable[str] | None = None,
+               now: float | None = None) -> None:
+        """
+        Note the outcome of fetching `url`. A failed fetch stays due; a 404/410 waits a full
+        interval (seeds) or is unscheduled (discovered pages).
+        """
+        key = url_key(url)
+        entry = self.pages.get(key)
+        if entry is None:
+            return
+        if gone and entry["depth"] > 0:
+            del self.pages[key]
+            return
+        if ok or gone:
+            entry["last_fetch"] = time.time() if now is None else now
+            entry["status"] = "gone" if gone else "ok"
+            if pdfs is not None:
+                entry["pdfs"] = sorted(set(pdfs))
+        else:
+            entry["status"] = "failed"
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"pages": self.pages, "sitemaps_checked": self.sitemaps_checked}))
+        os.replace(tmp, self.path)
+
+    def summary(self, due: int | None = None) -> str:
+        total = len(self.pages)
+        seeds = sum(1 for e in self.pages.values() if e["depth"] == 0)
+        due = len(self.due()) if due is None else due
+        return f"Crawl schedule: {total} pages ({seeds} seeds, {total - seeds} discovered), {due} due"
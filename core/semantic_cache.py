@@ -0,0 +1,107 @@
+# core/semantic_cache.py
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Semantic answer cache knobs
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))  # cosine; >1 disables
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "2000"))              # answers kept
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "86400"))             # seconds; 0 = no expiry
+
+
+class SemanticAnswerCache:
+    """In-memory LRU of answers keyed by query embedding, so paraphrases share one answer."""
+
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, max_entries: int = SEMANTIC_CACHE_SIZE,
+                 ttl: float = SEMANTIC_CACHE_TTL):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._vecs: Optional[np.ndarray] = None      # (max_entries, dims), allocated on first put
+        self._live = np.zeros(self.max_entries, dtype=bool)
+        self._entries: Dict[int, Dict] = {}
+        self._lru: "OrderedDict[int, None]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._hit_sim = 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(vec: Sequence[float]) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32).ravel()
+        n = float(np.linalg.norm(v))
+        return v / n if n else v
+
+    def get(self, vec: Sequence[float], index_version: str, k: int = 6,
+            category: str | None = None) -> Optional[Tuple[str, List[dict]]]:
+        """(answer, citations) of the closest fresh entry within the threshold, else None."""
+        q = self._unit(vec)
+        now = time.time()
+        with self._lock:
+            if self._vecs is None or not self._entries or q.shape[0] != self._vecs.shape[1]:
+                self.misses += 1
+                return None
+            sims = self._vecs @ q
+            sims[~self._live] = -np.inf
+            for slot in np.argsort(-sims)[:8]:
+                sim = float(sims[slot])
+                if sim < self.threshold:
+                    break
+                entry = self._entries[int(slot)]
+                if entry["index_version"] != index_version or (self.ttl and now - entry["created"] >= self.ttl):
+                    self._evict(int(slot))
+                    continue
+                if entry["k"] != k or entry["category"] != category:
+                    continue
+                self._lru.move_to_end(int(slot))
+                self.hits += 1
+                self._hit_sim += sim
+                return entry["answer"], entry["cites"]
+            self.misses += 1
+            return None
+
+    def put(self, query: str, vec: Sequence[float], answer: str, cites: List[dict], index_version: str,
+            k: int = 6, category: str | None = None) -> None:
+        v = self._unit(vec)
+        with self._lock:
+            if self._vecs is None or v.shape[0] != self._vecs.shape[1]:
+                # first entry, or the embedding model changed: start over at the new width
+                self._vecs = np.zeros((self.max_entries, v.shape[0]), dtype=np.float32)
+                self._live[:] = False
+                self._entries.clear()
+                self._lru.clear()
+            if len(self._entries) >= self.max_entries:
+                self._evict(next(iter(self._lru)))
+            slot = int(np.flatnonzero(~self._live)[0])
+            self._vecs[slot] = v
+            self._live[slot] = True
+            self._entries[slot] = {"query": query, "answer": answer, "cites": cites,
+                                   "index_version": index_version, "k": k, "category": category,
+                                   "created": time.time()}
+            self._lru[slot] = None
+
+    def _evict(self, slot: int) -> None:
+        self._live[slot] = False
+        self._entries.pop(slot, None)
+        self._lru.pop(slot, None)
+
+    def stats(self) -> Dict[str, float]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits, "misses": self.misses, "entries": len(self),
+            "hit_rate": self.hits / total if total else 0.0,
+            "mean_hit_similarity": self._hit_sim / self.hits if self.hits else 0.0,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (f"Semantic answer cache: {s['hits']} hits, {s['misses']} misses "
+                f"({100 * s['hit_rate']:.1f}% hit rate, mean similarity {s['mean_hit_similarity']:.3f}), "
+                f"{s['entries']} entries")
@@ -0,0 +1,124 @@
+# core/shards.py
+import heapq
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from loguru import logger
+
+from core.categories import categorize
+from core.docstore import SqliteDocstore
+from core.faiss_index import build_index
+
+SHARD_DIR = "shards"
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "4"))   # threads a fanned-out query searches on
+
+
+def build_shards(vs: FAISS, path: Path, spec: str = "flat", vectors: np.ndarray | None = None) -> Dict[str, int]:
+    """
+    Write one `spec` sub-index per category of `vs` to <path>/shards/<category>.faiss; returns
+    chunks per category. Without `vectors` (position order), vs.index must be flat.
+    """
+    path = Path(path)
+    ids = vs.index_to_docstore_id
+    row_of = {cid: pos for pos, cid in ids.items()}
+    groups: Dict[str, List[int]] = {}
+    for cid, doc in vs.docstore.items():
+        if cid in row_of:
+            cat = doc.metadata.get("category") or categorize(doc.metadata.get("source", ""))
+            groups.setdefault(cat, []).append(row_of[cid])
+    if vectors is None:
+        vectors = vs.index.reconstruct_n(0, vs.index.ntotal)
+
+    tmp = path / f"{SHARD_DIR}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    members: Dict[str, List[str]] = {}
+    for cat, rows in sorted(groups.items()):
+        rows.sort()
+        index, _ = build_index(spec, vectors[rows])
+        faiss.write_index(index, str(tmp / f"{cat}.faiss"))
+        members[cat] = [ids[r] for r in rows]
+    vs.docstore.set_shard_ids(members)
+    old = path / f"{SHARD_DIR}.old"
+    shutil.rmtree(old, ignore_errors=True)
+    if (path / SHARD_DIR).exists():
+        os.replace(path / SHARD_DIR, old)
+    os.replace(tmp, path / SHARD_DIR)
+    shutil.rmtree(old, ignore_errors=True)
+    return {cat: len(m) for cat, m in members.items()}
+
+
+def _read(f: Path) -> faiss.Index:
+    try:
+        return faiss.read_index(str(f), faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        return faiss.read_index(str(f))
+
+
+def _consistent(indexes: Dict[str, faiss.Index], counts: Dict[str, int]) -> bool:
+    return indexes.keys() == counts.keys() and all(ix.ntotal == counts[c] for c, ix in indexes.items())
+
+
+def shards_match(path: Path, store: SqliteDocstore) -> bool:
+    """Whether <path>/shards has exactly the shards mapped in `store`, each with as many rows as its map."""
+    indexes = {f.stem: _read(f) for f in (Path(path) / SHARD_DIR).glob("*.faiss")}
+    return bool(indexes) and _consistent(indexes, store.shard_counts())
+
+
+class ShardedIndex:
+    """Per-category FAISS sub-indexes: search one shard, or fan out over all and merge by distance."""
+
+    def __init__(self, indexes: Dict[str, faiss.Index], store: SqliteDocstore, workers: int = SHARD_WORKERS):
+        self.indexes = indexes
+        self.store = store
+        self._pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(indexes))),
+                                        thread_name_prefix="shard")
+
+    @classmethod
+    def load(cls, path: Path, store: SqliteDocstore) -> Optional["ShardedIndex"]:
+        """Shards written by build_shards under `path`, or None if there are none."""
+        files = sorted((Path(path) / SHARD_DIR).glob("*.faiss"))
+        if not files:
+            logger.info(f"No category shards in {path}; searching the global index")
+            return None
+        indexes = {f.stem: _read(f) for f in files}
+        if not _consistent(indexes, store.shard_counts()):
+            logger.warning(f"Category shards in {path} don't match their id maps; searching the global index "
+                           f"until the next ingest rebuilds them")
+            return None
+        return cls(indexes, store)
+
+    @property
+    def categories(self) -> List[str]:
+        return list(self.indexes)
+
+    def _search(self, category: str, x: np.ndarray, k: int) -> List[List[tuple]]:
+        dist, idx = self.indexes[category].search(x, k)
+        return [[(float(d), category, int(i)) for d, i in zip(drow, irow) if i != -1]
+                for drow, irow in zip(dist, idx)]
+
+    def search(self, x: np.ndarray, k: int, category: str | None = None) -> List[str]:
+        """Chunk ids of the k nearest rows to query vector `x` (shape (1, dims)), nearest first."""
+        return self.search_batch(x, k, category)[0]
+
+    def search_batch(self, x: np.ndarray, k: int, category: str | None = None) -> List[List[str]]:
+        """search() for each row of `x` (shape (m, dims)); every shard is searched once for all m."""
+        if category is not None and category not in self.indexes:
+            logger.debug(f"No shard for category {category!r}; searching all")
+            category = None
+        if category is not None:
+            rows = self._search(category, x, k)
+        else:
+            parts = list(self._pool.map(lambda c: self._search(c, x, k), self.indexes))
+            rows = [heapq.nsmallest(k, (h for part in parts for h in part[r])) for r in range(len(x))]
+        return [[i for i in (self.store.shard_id(c, pos) for _, c, pos in hits) if i is not None]
+                for hits in rows]
+
+    def members(self, category: str, ids: List[str]) -> set:
+        return self.store.shard_members(category, ids)
@@ -0,0 +1,118 @@
+# core/singleflight.py
+import threading
+from typing import Callable, Dict, Hashable, Iterator, List, Tuple
+
+Answer = Tuple[str | Iterator[str], List[dict]]
+
+
+class _Flight:
+    """One in-progress answer: its citations, the chunks generated so far, and how it ended."""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.ready = False          # cites (and a static answer, if any) known
+        self.done = False           # no more chunks coming
+        self.static: str | None = None
+        self.cites: List[dict] = []
+        self.parts: List[str] = []
+        self.error: BaseException | None = None
+
+    def publish(self, cites: List[dict], static: str | None = None) -> None:
+        with self.cond:
+            self.cites, self.static, self.ready = cites, static, True
+            self.done = static is not None
+            self.cond.notify_all()
+
+    def push(self, part: str) -> None:
+        with self.cond:
+            self.parts.append(part)
+            self.cond.notify_all()
+
+    def finish(self, error: BaseException | None = None) -> None:
+        with self.cond:
+            self.error = error
+            self.done = True
+            self.cond.notify_all()
+
+    def wait_ready(self) -> None:
+        """Block until the citations are known; raises the leader's error if it failed before that."""
+        with self.cond:
+            while not self.ready and not self.done:
+                self.cond.wait()
+            if not self.ready:
+                raise self.error or RuntimeError("answer failed")
+
+    def follow(self) -> Iterator[str]:
+        """Every chunk from the first, then live ones as they are generated."""
+        i = 0
+        while True:
+            with self.cond:
+                while i >= len(self.parts) and not self.done:
+                    self.cond.wait()
+                if i < len(self.parts):
+                    part = self.parts[i]
+                    i += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield part
+
+
+class SingleFlight:
+    """
+    Request coalescing for answers: do(key, fn) runs fn once for every caller of a key that
+    arrives while it is in progress; a streamed answer is buffered so each reads at its own pace.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.joined = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Answer]) -> Answer:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self.joined += 1
+        if not leader:
+            flight.wait_ready()
+            return (flight.static if flight.static is not None else flight.follow()), flight.cites
+        try:
+            ans, cites = fn()
+        except BaseException as e:
+            flight.finish(e)
+            self._release(key, flight)
+            raise
+        if isinstance(ans, str):
+            flight.publish(cites, ans)
+            self._release(key, flight)
+            return ans, cites
+        flight.publish(cites)
+        threading.Thread(target=self._drain, args=(key, flight, ans), name="singleflight", daemon=True).start()
+        return flight.follow(), cites
+
+    def _drain(self, key: Hashable, flight: _Flight, parts: Iterator[str]) -> None:
+        error = None
+        try:
+            for part in parts:
+                flight.push(part)
+        except Exception as e:
+            error = e
+        finally:
+            flight.finish(error)
+            self._release(key, flight)
+
+    def _release(self, key: Hashable, flight: _Flight) -> None:
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "joined": self.joined, "in_flight": len(self._flights)}
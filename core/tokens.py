@@ -0,0 +1,41 @@
+# core/tokens.py
+from functools import lru_cache
+from typing import Callable
+
+from loguru import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+def _estimate(text: str) -> int:
+    return max(1, len(text) // 4)   # ~4 chars per token for English prose
+
+
+@lru_cache(maxsize=None)
+def token_counter(model: str) -> Callable[[str], int]:
+    """
+    Return a text -> token count function for `model`: the Hugging Face tokenizer for
+    sentence-transformers style names ("org/name"), tiktoken for OpenAI models, and a
+    length-based estimate when neither tokenizer can be loaded.
+    """
+    if "/" in model:
+        try:
+            from transformers import AutoTokenizer
+            tok = AutoTokenizer.from_pretrained(model)
+            return lambda text: len(tok.encode(text, add_special_tokens=False, verbose=False))
+        except Exception as e:
+            logger.warning(f"No tokenizer for {model} ({e}); estimating tokens from length")
+            return _estimate
+    if tiktoken is not None:
+        try:
+            try:
+                enc = tiktoken.encoding_for_model(model)
+            except KeyError:
+                enc = tiktoken.get_encoding("cl100k_base")
+            return lambda text: len(enc.encode(text, disallowed_special=()))
+        except Exception as e:  # encodings are downloaded on first use
+            logger.warning(f"No tiktoken encoding for {model} ({e}); estimating tokens from length")
+    return _estimate
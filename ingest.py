@@ -1,21 +1,45 @@
 from __future__ import annotations
 import os
+import shutil
+import argparse
+import hashlib
+import json
 from pathlib import Path
 from dotenv import load_dotenv
+from bs4 import BeautifulSoup
+import faiss
+import numpy as np
 
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
+from langchain_community.vectorstores import FAISS
 
 from langchain_community.document_loaders import (
-    WebBaseLoader,
     DirectoryLoader,
-    PyPDFLoader,
     TextLoader,
 )
 
 from utils import basic_clean
+from core.answer_cache import AnswerCache
+from core.canned import canned_shard
+from core.categories import categorize
+from core.crawler import GONE_STATUS
+from core.dedup import DEDUP_THRESHOLD, NearDupIndex
+from core.docstore import (DOCSTORE_FILE, INDEX_FILE, STAGING_DIR, SqliteDocstore, copy_docstore, index_dir,
+                           migrate_pickle, publish_dir, save_faiss)
+from core.embed_cache import EmbeddingCache
+from core.embed_stage import EMBED_DIMS, EmbeddingStage, dims_param
+from core.faiss_index import FAISS_INDEX, build_index, parse_spec, read_meta
+from core.http_cache import get_http_cache
+from core.lexical import LexicalIndex
+from core.ingest import HTML_TIMEOUT, cached_get, cached_parse, page_links
+from core.manifest import ChunkManifest, content_hash
+from core.pdf_extract import get_pdf_extractor
+from core.pipeline import run_stage, batched
+from core.rag import answer_with_citations, load_lexical, load_shards, load_vectorstore, search
+from core.scheduler import CrawlScheduler, canonicalize, read_seed_sections, url_key
+from core.shards import build_shards, shards_match
 
 load_dotenv()
 
@@ -23,48 +47,100 @@ DATA_DIR = Path("data")
 RAW_DIR = DATA_DIR / "raw"
 SEED_FILE = DATA_DIR / "seed_urls.txt"
 VSTORE_DIR = Path("vectorstore/faiss_index")
+MANIFEST_NAME = "manifest.json"     # kept in each index generation, next to index.faiss
+STAGING = VSTORE_DIR / STAGING_DIR
+CHECKPOINT_FILE = VSTORE_DIR / "ingest_checkpoint.json"
+CRAWL_STATE_FILE = VSTORE_DIR / "crawl_state.json"
 
 EMBED_MODEL = os.getenv("OPENAI_EMBED_MODEL", "text-embedding-3-small")
 
-def load_web_docs(seed_file: Path) -> list[Document]:
-    urls = []
-    
-    # Load from main seed file
-    if seed_file.exists():
-        urls = [u.strip() for u in seed_file.read_text().splitlines() 
-                if u.strip() and not u.strip().startswith("#")]
-    
-    # Load from additional sources file if exists
-    additional_file = DATA_DIR / "additional_sources.txt"
-    if additional_file.exists():
-        additional_urls = [u.strip() for u in additional_file.read_text().splitlines() 
-                          if u.strip() and not u.strip().startswith("#")]
-        urls.extend(additional_urls)
-    
+# Streaming pipeline knobs
+FETCH_WORKERS = int(os.getenv("INGEST_FETCH_WORKERS", "4"))
+INDEX_BATCH = int(os.getenv("INGEST_INDEX_BATCH", "500"))   # chunks per embed + docstore commit
+QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "16"))      # sources buffered between stages
+
+def _page_text(html: str) -> dict:
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.find("title")
+    return {"text": soup.get_text(), "title": title.get_text() if title else ""}
+
+def seed_sections() -> list[tuple[str, str]]:
+    """(url, section header) for the main seed file followed by additional_sources.txt."""
+    return read_seed_sections(SEED_FILE) + read_seed_sections(DATA_DIR / "additional_sources.txt")
+
+def read_seed_urls(seed_file: Path) -> list[str]:
+    urls = [u for u, _ in read_seed_sections(seed_file)]
+    urls.extend(u for u, _ in read_seed_sections(DATA_DIR / "additional_sources.txt"))
+
+    # Remove duplicates, including slash/fragment/query-order variants
+    # (keep order so resumed runs see the same sequence)
+    unique = {}
+    for u in urls:
+        unique.setdefault(url_key(u), canonicalize(u))
+    return list(unique.values())
+
+def load_web_doc(url: str, failed: set | None = None, gone: set | None = None,
+                 links: dict | None = None) -> Document | None:
+    """
+    Fetch one page. A transient failure adds the URL to `failed`, a 404/410 to `gone`;
+    on success the same-host links on the page are stored in `links[url]`.
+    """
+    try:
+        resp = cached_get(url, HTML_TIMEOUT)
+    except Exception as e:
+        print(f"[ingest] Failed to load {url}: {e}")
+        status = getattr(getattr(e, "response", None), "status_code", None)
+        target = gone if status in GONE_STATUS else failed
+        if target is not None:
+            target.add(url)
+        return None
+    page = cached_parse(resp, "web_text", lambda: _page_text(resp.text))
+    if links is not None:
+        try:
+            links[url] = page_links(resp)
+        except Exception as e:
+            print(f"[ingest] While scanning links on {url}: {e}")
+    return Document(page_content=basic_clean(page["text"]), metadata={"source": url, "title": page["title"]})
+
+def load_web_docs(seed_file: Path, failed: set | None = None) -> list[Document]:
+    """Fetch seed pages; URLs that fail transiently (not 404/410) are added to `failed`."""
+    urls = read_seed_urls(seed_file)
     if not urls:
         print("[ingest] No URLs in seed files – skipping web load.")
         return []
-    
-    # Remove duplicates
-    urls = list(set(urls))
     print(f"[ingest] Loading {len(urls)} unique URLs...")
     
-    loader = WebBaseLoader(urls)
-    docs = loader.load()
+    docs = [d for d in (load_web_doc(u, failed) for u in urls) if d is not None]
     
-    # Clean content
+    print(f"[ingest] Successfully loaded {len(docs)} web docs.")
+    return docs
+
+def load_local_file(path: Path) -> list[Document]:
+    """One Document per page for a PDF (like PyPDFLoader), one for a text file."""
+    if path.suffix.lower() == ".pdf":
+        pages = get_pdf_extractor().extract(path.read_bytes(), str(path))
+        docs = [Document(page_content=t, metadata={"source": str(path), "page": i}) for i, t in enumerate(pages)]
+    else:
+        docs = TextLoader(str(path)).load()
     for d in docs:
         d.page_content = basic_clean(d.page_content)
-    
-    print(f"[ingest] Successfully loaded {len(docs)} web docs.")
     return docs
 
+def local_files(raw_dir: Path) -> list[Path]:
+    if not raw_dir.exists():
+        return []
+    return sorted(list(raw_dir.glob("**/*.pdf")) + list(raw_dir.glob("**/*.txt")))
+
 def load_local_docs(raw_dir: Path):
     docs = []
     if not raw_dir.exists():
         return docs
-    pdf_loader = DirectoryLoader(str(raw_dir), glob="**/*.pdf", loader_cls=PyPDFLoader)
-    docs.extend(pdf_loader.load())
+    # PDFs are extracted page by page on a process pool, one Document per page like PyPDFLoader
+    pdfs = sorted(raw_dir.glob("**/*.pdf"))
+    pages_by_path = dict(get_pdf_extractor().extract_many((p, p.read_bytes()) for p in pdfs))
+    for path in pdfs:
+        for i, text in enumerate(pages_by_path.get(path, [])):
+            docs.append(Document(page_content=text, metadata={"source": str(path), "page": i}))
     txt_loader = DirectoryLoader(str(raw_dir), glob="**/*.txt", loader_cls=TextLoader)
     docs.extend(txt_loader.load())
     for d in docs:
@@ -73,26 +149,345 @@ def load_local_docs(raw_dir: Path):
         print(f"[ingest] Loaded {len(docs)} local docs from {raw_dir}.")
     return docs
 
-def chunk_docs(docs, chunk_size=1200, chunk_overlap=200):
+def chunk_docs(docs, chunk_size=1200, chunk_overlap=200, verbose=True):
     splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
     chunks = splitter.split_documents(docs)
-    print(f"[ingest] Chunked into {len(chunks)} passages.")
+    if verbose:
+        print(f"[ingest] Chunked into {len(chunks)} passages.")
     return chunks
 
-def build_faiss(chunks):
-    embeddings = OpenAIEmbeddings(model=EMBED_MODEL)
-    vs = FAISS.from_documents(chunks, embeddings)
-    VSTORE_DIR.mkdir(parents=True, exist_ok=True)
-    vs.save_local(str(VSTORE_DIR))
-    print(f"[ingest] Saved FAISS index to {VSTORE_DIR}.")
+def chunk_ids(chunks) -> list[str]:
+    """
+    Deterministic ids: hash of the chunk's source plus a hash of its text, and a counter
+    for repeats of the same text within that source. Editing one passage changes only
+    that chunk's id, so the rest of the page isn't treated as new.
+    """
+    ids, counts = [], {}
+    for c in chunks:
+        src = hashlib.md5(c.metadata.get("source", "").encode("utf-8", errors="ignore")).hexdigest()
+        text = hashlib.md5(c.page_content.encode("utf-8", errors="ignore")).hexdigest()[:16]
+        n = counts.get((src, text), 0)
+        counts[(src, text)] = n + 1
+        ids.append(f"{src}:{text}:{n}")
+    return ids
 
-if __name__ == "__main__":
-    web_docs = load_web_docs(SEED_FILE)
-    local_docs = load_local_docs(RAW_DIR)
-    all_docs = web_docs + local_docs
-    if not all_docs:
+class FaissWriter:
+    """
+    Applies chunk updates, one batch at a time, to a staged copy of the docstore and manifest
+    under <VSTORE_DIR>/staging; publish() builds the `spec` index and swaps it in for the live one.
+    """
+
+    def __init__(self, full: bool = False, spec: str = FAISS_INDEX, resume: bool = False):
+        parse_spec(spec)   # fail before crawling, not after
+        self.spec = spec
+        self.embeddings = OpenAIEmbeddings(model=EMBED_MODEL,
+                                           dimensions=dims_param(EMBED_MODEL, EMBED_DIMS).get("dimensions"))
+        self.cache = EmbeddingCache(EMBED_MODEL, EMBED_DIMS)
+        self.stage = EmbeddingStage(EMBED_MODEL, self.cache)
+        self.seen: set = set()
+        self.written = self.unchanged = self.deleted = self.relabelled = 0
+
+        self.resumed = resume and (STAGING / MANIFEST_NAME).exists() and (STAGING / DOCSTORE_FILE).exists()
+        if self.resumed:
+            print("[ingest] Continuing the staged index of the interrupted run.")
+            self.manifest = ChunkManifest(STAGING / MANIFEST_NAME)
+            self.store = SqliteDocstore(STAGING / DOCSTORE_FILE)
+            self._reconcile()
+            return
+
+        shutil.rmtree(STAGING, ignore_errors=True)
+        self.manifest = ChunkManifest(STAGING / MANIFEST_NAME)
+        live = index_dir(VSTORE_DIR)
+        current = ChunkManifest(live / MANIFEST_NAME)
+        if not full and current.sources and (live / INDEX_FILE).exists():
+            migrate_pickle(live)   # one-time: index.pkl from older builds -> docstore.sqlite
+            copy_docstore(live / DOCSTORE_FILE, STAGING / DOCSTORE_FILE)
+            self.manifest.sources = current.sources
+            self.manifest.save()
+        elif not full:
+            print("[ingest] No index manifest found – doing a full build.")
+        self.store = SqliteDocstore(STAGING / DOCSTORE_FILE)
+
+    def _reconcile(self) -> None:
+        """Undo a batch whose docstore commit landed but whose manifest save did not."""
+        listed = {cid for ids in self.manifest.sources.values() for cid in ids}
+        stored = self.store.ids()
+        if stored - listed:
+            self.store.delete(list(stored - listed))
+        if listed - stored:
+            self.manifest.sources = {src: {cid: h for cid, h in ids.items() if cid in stored}
+                                     for src, ids in self.manifest.sources.items()}
+            self.manifest.save()
+
+    def write(self, chunks, refreshed=(), ids=None) -> None:
+        """Index chunks of complete sources; each source in `refreshed` (or in `chunks`)
+        has its previous chunk set replaced. `ids` defaults to chunk_ids(chunks)."""
+        by_id = dict(zip(ids or chunk_ids(chunks), chunks))
+        plan = self.manifest.plan(
+            ((cid, c.metadata.get("source", ""), content_hash(c.page_content, c.metadata)) for cid, c in by_id.items()),
+            refreshed=refreshed,
+            partial=True,
+        )
+        self.seen.update(refreshed)
+        self.seen.update(c.metadata.get("source", "") for c in chunks)
+        self._apply(plan, by_id)
+
+    def finish(self, keep=()) -> None:
+        """Delete sources that were neither written this run nor listed in `keep`."""
+        self._apply(self.manifest.plan((), keep=self.seen | set(keep)), {})
+
+    def stored(self, sources):
+        """(chunk id, Document) already in the index for the given sources."""
+        yield from self.store.items(sources)
+
+    def set_merged_sources(self, merged: dict, prune: bool = True) -> None:
+        """
+        Store metadata["sources"] on kept chunks: their own source followed by those whose
+        near-duplicate copies were dropped (`merged`: chunk id -> extra sources). With
+        `prune`, chunks no longer in `merged` lose a stale list from an earlier run.
+        """
+        changed = 0
+        for cid, doc in self.store.items():
+            extra = merged.get(cid)
+            if extra:
+                sources = [doc.metadata.get("source", "")] + extra
+                if doc.metadata.get("sources") == sources:
+                    continue
+                doc.metadata["sources"] = sources
+            elif prune and "sources" in doc.metadata:
+                del doc.metadata["sources"]
+            else:
+                continue
+            self.store.update_metadata(cid, doc.metadata)
+            changed += 1
+        if changed:
+            self.relabelled += changed
+            print(f"[ingest] Updated merged sources on {changed} chunks.")
+
+    def _vectors(self, texts) -> np.ndarray:
+        """Cached vectors of `texts` in order; anything missing from the cache is embedded first."""
+        cached = self.cache.get_many(texts)
+        missing = [t for t, v in zip(texts, cached) if v is None]
+        if missing:
+            self.stage.run(missing)
+            cached = self.cache.get_many(texts)
+        vectors = np.empty((len(texts), self.cache.dims), dtype=np.float32)
+        for i, v in enumerate(cached):
+            vectors[i] = v
+        return vectors
+
+    def publish(self) -> None:
+        """Build the index, shards and BM25 index in staging from the cached vectors and make them live."""
+        live = index_dir(VSTORE_DIR)
+        changed = self.resumed or self.written or self.deleted or self.relabelled
+        if (not changed and read_meta(live).get("requested") == self.spec
+                and shards_match(live, self.store)):
+            self.store.close()
+            shutil.rmtree(STAGING, ignore_errors=True)
+            print("[ingest] Index unchanged.")
+            return
+        items = list(self.store.items())
+        ids = [cid for cid, _ in items]
+        vectors = self._vectors([doc.page_content for _, doc in items])
+        if ids:
+            index, resolved = build_index(self.spec, vectors)
+        else:
+            index, resolved = faiss.IndexFlatL2(self.cache.dims), "flat"
+        vs = FAISS(self.embeddings, index, self.store, dict(enumerate(ids)))
+        save_faiss(vs, STAGING, spec=resolved, requested=self.spec)
+        print(f"[ingest] Saved {resolved} index over {index.ntotal} vectors.")
+        counts = build_shards(vs, STAGING, self.spec, vectors)
+        print("[ingest] Saved category shards: " + ", ".join(f"{c} {n}" for c, n in counts.items()))
+        del vectors, index, vs
+        lexical = LexicalIndex.build(
+            (cid, f"{doc.metadata.get('title', '')}\n{doc.page_content}") for cid, doc in items
+        )
+        lexical.save(STAGING / "bm25")
+        print(f"[ingest] Saved BM25 index over {len(lexical)} chunks ({len(lexical.terms)} terms).")
+        self.store.close()
+        gen = publish_dir(VSTORE_DIR, STAGING)
+        print(f"[ingest] Published {gen}.")
+
+    def _apply(self, plan, by_id) -> None:
+        self.unchanged += plan.unchanged
+        if not plan:
+            return
+        new_docs = {cid: by_id[cid] for cid in plan.upsert}
+        self.stage.run([d.page_content for d in new_docs.values()])   # into the embedding cache
+        # one transaction, then the manifest: _reconcile() covers a crash in between
+        self.store.apply(plan.delete, new_docs)
+        self.manifest.apply(plan)
+        self.written += len(new_docs)
+        self.deleted += len(set(plan.delete) - set(plan.upsert))
+
+    def summary(self) -> str:
+        return (f"FAISS index {VSTORE_DIR}: {self.written} new/changed, "
+                f"{self.unchanged} unchanged, {self.deleted} deleted.")
+
+def build_faiss(chunks, full: bool = False, refreshed=(), keep=(), spec: str = FAISS_INDEX):
+    """
+    Update the FAISS index with only new/changed chunks (full build with full=True or none yet).
+    `refreshed`/`keep` are as in ChunkManifest.plan; `spec` selects the index type (core.faiss_index).
+    """
+    writer = FaissWriter(full=full, spec=spec)
+    writer.write(chunks, refreshed=refreshed)
+    writer.finish(keep=keep)
+    writer.publish()
+    print(f"[ingest] Saved {writer.summary()}")
+    print(f"[ingest] {writer.cache.summary()}")
+
+def _load_checkpoint() -> dict | None:
+    try:
+        return json.loads(CHECKPOINT_FILE.read_text())
+    except (OSError, ValueError):
+        return None
+
+def _save_checkpoint(done: set, failed: set) -> None:
+    CHECKPOINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = CHECKPOINT_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps({"done": sorted(done), "failed": sorted(failed)}))
+    os.replace(tmp, CHECKPOINT_FILE)
+
+def run_pipeline(full: bool = False, resume: bool = False, dedup_threshold: float = DEDUP_THRESHOLD,
+                 spec: str = FAISS_INDEX) -> None:
+    """
+    Streaming ingest: fetch -> clean -> chunk -> dedupe on background threads, embedded and
+    indexed in checkpointed batches (--resume continues them); only due pages are fetched.
+    """
+    ckpt = _load_checkpoint() if resume else None
+    done = set(ckpt["done"]) if ckpt else set()
+    failed = set(ckpt["failed"]) if ckpt else set()
+    if ckpt:
+        print(f"[ingest] Resuming: {len(done)} sources already indexed.")
+
+    scheduler = CrawlScheduler(CRAWL_STATE_FILE)
+    scheduler.sync_seeds(seed_sections())
+    scheduler.discover_sitemaps()
+    web = scheduler.urls() if full else scheduler.due()
+    not_due = set(scheduler.urls()) - set(web)
+    print(f"[ingest] {scheduler.summary(due=len(web))}")
+
+    sources = [("web", u) for u in web] + [("local", str(p)) for p in local_files(RAW_DIR)]
+    todo = [s for s in sources if s[1] not in done]
+    if not sources and not not_due:
         print("[ingest] No documents found. Add URLs to data/seed_urls.txt or files under data/raw/")
-        raise SystemExit(0)
-    chunks = chunk_docs(all_docs)
-    build_faiss(chunks)
+        return
+    print(f"[ingest] {len(todo)} of {len(sources)} sources to process.")
+
+    gone: set = set()
+    links: dict = {}
+
+    def load(src):
+        kind, name = src
+        if kind == "web":
+            doc = load_web_doc(name, failed, gone, links)
+            return (name, [doc]) if doc else None
+        return name, load_local_file(Path(name))
+
+    def chunk(loaded):
+        name, docs = loaded
+        chunks = chunk_docs(docs, verbose=False)
+        section = scheduler.section(name)
+        for c in chunks:
+            c.metadata["category"] = categorize(c.metadata.get("source", name), section)
+        # ids are fixed before dedup so dropping a chunk doesn't renumber its siblings
+        return name, chunks, chunk_ids(chunks)
+
+    near_dups = NearDupIndex(dedup_threshold)
+    owner: dict = {}      # kept chunk id -> its source
+    merged: dict = {}     # kept chunk id -> sources of dropped near-duplicates
+    dropped = 0
+
+    def dedupe(group):
+        nonlocal dropped
+        name, chunks, ids = group
+        if dedup_threshold <= 0:
+            return group
+        kept, kept_ids = [], []
+        for c, cid in zip(chunks, ids):
+            canon = near_dups.check(cid, c.page_content)
+            if canon is None:
+                owner[cid] = name
+                kept.append(c)
+                kept_ids.append(cid)
+                continue
+            dropped += 1
+            extra = merged.setdefault(canon, [])
+            if name != owner[canon] and name not in extra:
+                extra.append(name)
+        return name, kept, kept_ids
+
+    # a resumed run (full or not) continues on its staged index
+    writer = FaissWriter(full=full and not ckpt, spec=spec, resume=bool(ckpt))
+    if dedup_threshold > 0:
+        # chunks of pages not fetched this run still count as the first copy seen
+        for cid, doc in writer.stored(not_due | done):
+            if near_dups.check(cid, doc.page_content) is None:
+                owner[cid] = doc.metadata.get("source", "")
+    loaded = run_stage(load, todo, workers=FETCH_WORKERS, maxsize=QUEUE_SIZE)
+    chunked = run_stage(chunk, loaded, maxsize=QUEUE_SIZE)
+    unique = run_stage(dedupe, chunked, maxsize=QUEUE_SIZE)
+    for n, batch in enumerate(batched(unique, INDEX_BATCH, weight=lambda g: len(g[1])), 1):
+        names = [name for name, _, _ in batch]
+        writer.write([c for _, chunks, _ in batch for c in chunks], refreshed=names,
+                     ids=[cid for _, _, ids in batch for cid in ids])
+        done.update(names)
+        _save_checkpoint(done, failed)
+        print(f"[ingest] Batch {n}: {len(done)}/{len(sources)} sources indexed.")
+
+    writer.finish(keep=done | failed | not_due)
+    # a partial run only saw part of the corpus, so keep lists it could not have rebuilt
+    writer.set_merged_sources(merged, prune=not ckpt and not not_due)
+    writer.publish()
+
+    # only now are this run's pages live; an interrupted run fetches them again
+    for name in done:
+        scheduler.record(name)
+    for url in failed:
+        scheduler.record(url, ok=False)
+    for url in gone:
+        scheduler.record(url, ok=False, gone=True)
+    discovered = sum(scheduler.add_links(url, hrefs) for url, hrefs in links.items())
+    scheduler.save()
+    CHECKPOINT_FILE.unlink(missing_ok=True)
+    if discovered:
+        print(f"[ingest] Scheduled {discovered} newly discovered pages for the next run.")
+    if dropped:
+        print(f"[ingest] Dropped {dropped} near-duplicate chunks.")
+    print(f"[ingest] Saved {writer.summary()}")
+    print(f"[ingest] {writer.cache.summary()}")
+
+def precompute_answers(force: bool = False) -> None:
+    """Answer the canned questions (core.canned) against the current index so the app
+    serves them without retrieval or an LLM call; fresh answers are left alone."""
+    live = index_dir(VSTORE_DIR)
+    if not (live / INDEX_FILE).exists():
+        return
+    vs = load_vectorstore(live)
+    lexical = load_lexical(live)
+    shards = load_shards(vs, live)
+    n = AnswerCache(VSTORE_DIR).precompute(
+        lambda q: answer_with_citations(
+            q, search(vs, q, k=6, lexical=lexical, shards=shards, category=canned_shard(q))
+        ),
+        force=force,
+    )
+    print(f"[ingest] Precomputed {n} canned answers.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the FAISS index.")
+    parser.add_argument("--full", action="store_true", help="rebuild from scratch and re-embed everything")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run from its checkpoint")
+    parser.add_argument("--skip-answers", action="store_true", help="don't precompute canned-question answers")
+    parser.add_argument("--dedup-threshold", type=float, default=DEDUP_THRESHOLD,
+                        help="similarity above which chunks count as near-duplicates (0 disables)")
+    parser.add_argument("--index", default=FAISS_INDEX, metavar="SPEC",
+                        help='FAISS index type: flat, ivf, hnsw or ivfpq, with optional parameters, '
+                             'e.g. "ivf:nlist=512,nprobe=16" (compare with `python -m core.faiss_index`)')
+    args = parser.parse_args()
+
+    run_pipeline(full=args.full, resume=args.resume, dedup_threshold=args.dedup_threshold, spec=args.index)
+    if not args.skip_answers:
+        precompute_answers(force=args.full)
+    print(f"[ingest] {get_http_cache().summary()}")
     print("[ingest] Done.")
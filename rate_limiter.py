@@ -3,18 +3,28 @@ Simple global rate limiting - no per-user tracking
 Just tracks total queries to protect API costs
 """
 import json
+import os
+import threading
 from pathlib import Path
 from datetime import datetime
 
 TOTAL_QUERY_LIMIT = 5000
 ALERT_EMAIL = "saimudragada1@gmail.com"
+LIMIT_MESSAGE = "Demo limit reached. Contact saimudragada1@gmail.com for full access."
+
+# one engine process serves many sessions at once; counts are read-modify-written under this
+_usage_lock = threading.RLock()
+
+class QueryLimitError(RuntimeError):
+    """Raised instead of answering once TOTAL_QUERY_LIMIT queries have been served"""
 
 def load_usage_stats():
     """Load usage statistics from file"""
     stats_file = Path("usage_stats.json")
-    if stats_file.exists():
-        with open(stats_file, 'r') as f:
-            return json.load(f)
+    with _usage_lock:
+        if stats_file.exists():
+            with open(stats_file, 'r') as f:
+                return json.load(f)
     return {
         'total_queries': 0,
         'alert_sent_1000': False,
@@ -22,21 +32,35 @@ def load_usage_stats():
     }
 
 def save_usage_stats(stats):
-    """Save usage statistics"""
-    with open("usage_stats.json", 'w') as f:
-        json.dump(stats, f, indent=2)
+    """Save usage statistics (written to a temp file and swapped in, so readers never see half a file)"""
+    with _usage_lock:
+        with open("usage_stats.json.tmp", 'w') as f:
+            json.dump(stats, f, indent=2)
+        os.replace("usage_stats.json.tmp", "usage_stats.json")
 
 def check_global_limit():
     """Check if global query limit reached"""
     stats = load_usage_stats()
     
     if stats['total_queries'] >= TOTAL_QUERY_LIMIT:
-        return False, "Demo limit reached. Contact saimudragada1@gmail.com for full access."
+        return False, LIMIT_MESSAGE
     
     return True, None
 
+def consume_query():
+    """Count one query if the limit allows it (check and increment in one step)"""
+    with _usage_lock:
+        allowed, error_msg = check_global_limit()
+        if allowed:
+            _increment_usage()
+        return allowed, error_msg
+
 def increment_usage():
     """Increment usage counter and send alerts if needed"""
+    with _usage_lock:
+        return _increment_usage()
+
+def _increment_usage():
     stats = load_usage_stats()
     
     stats['total_queries'] += 1
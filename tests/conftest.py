@@ -0,0 +1,138 @@
+import json
+import re
+import threading
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+
+
+class FakeServer:
+    """
+    Local stand-in for the upstreams (web pages, OpenAI, Gemini). Tests register a
+    handler per path: handler(request) -> (status, headers, body), where body is bytes
+    or a list of byte chunks sent (and flushed) one by one. Every request is recorded,
+    and the peak number handled at once is tracked for concurrency-cap tests.
+    """
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], Callable] = {}
+        self.requests: List[Dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _handle(self, method: str):
+                path, _, query = self.path.partition("?")
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+                request = {"method": method, "path": path, "query": query,
+                           "headers": dict(self.headers), "body": body}
+                with server._lock:
+                    server.requests.append(request)
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                try:
+                    handler = server.routes.get((method, path))
+                    status, headers, payload = handler(request) if handler else (404, {}, b"not found")
+                    chunks = payload if isinstance(payload, list) else [payload]
+                    self.send_response(status)
+                    for k, v in headers.items():
+                        self.send_header(k, v)
+                    self.send_header("Content-Length", str(sum(len(c) for c in chunks)))
+                    self.end_headers()
+                    for chunk in chunks:
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def route(self, method: str, path: str, handler: Callable) -> None:
+        self.routes[(method, path)] = handler
+
+    def hits(self, path: str) -> int:
+        with self._lock:
+            return sum(r["path"] == path for r in self.requests)
+
+    def close(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def json_body(obj, status: int = 200, headers: Dict[str, str] | None = None):
+    return status, {"Content-Type": "application/json", **(headers or {})}, json.dumps(obj).encode()
+
+
+def sse_body(events: List) -> Tuple[int, Dict[str, str], List[bytes]]:
+    chunks = [f"data: {json.dumps(e)}\n\n".encode() for e in events] + [b"data: [DONE]\n\n"]
+    return 200, {"Content-Type": "text/event-stream"}, chunks
+
+
+@pytest.fixture
+def fake_server():
+    server = FakeServer()
+    yield server
+    server.close()
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words embeddings: texts sharing words get similar vectors."""
+
+    model = "hash-test"
+    dims = 32
+
+    def embed_query(self, text: str) -> List[float]:
+        v = np.zeros(self.dims, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            v[zlib.crc32(word.encode()) % self.dims] += 1.0
+        n = float(np.linalg.norm(v))
+        return (v / n if n else v).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.embed_query(t) for t in texts]
+
+
+def publish_index(root: Path, chunks: Dict[str, Tuple[str, Dict]]) -> Path:
+    """
+    Build the index ingest.py would (FAISS + SQLite docstore, category shards, BM25)
+    over `chunks` (id -> (text, metadata)) with HashEmbeddings, and publish it as the
+    live generation of `root`. Returns the generation directory.
+    """
+    from core.docstore import new_faiss, publish_dir, save_faiss
+    from core.lexical import LexicalIndex
+    from core.shards import build_shards
+
+    staging = Path(root) / "staging"
+    vs = new_faiss(staging, HashEmbeddings(), HashEmbeddings.dims)
+    vs.add_texts([t for t, _ in chunks.values()], [m for _, m in chunks.values()], ids=list(chunks))
+    save_faiss(vs, staging)
+    build_shards(vs, staging)
+    LexicalIndex.build((cid, text) for cid, (text, _) in chunks.items()).save(staging / "bm25")
+    vs.docstore.close()
+    return publish_dir(root)
@@ -0,0 +1,34 @@
+import time
+
+from core.answer_cache import DAY, AnswerCache, index_version
+
+EVENTS = "What events are happening on campus?"      # canned, 1-day TTL
+POLICY = "How do I apply for financial aid?"         # canned, 30-day TTL
+
+
+def test_entries_expire_by_category_and_with_the_index(tmp_path, monkeypatch):
+    (tmp_path / "index.faiss").write_bytes(b"first")
+    cache = AnswerCache(tmp_path)
+    cache.put(EVENTS, "Homecoming is Friday.", [])
+    cache.put(POLICY, "File the FAFSA.", [])
+    cache.put("What is for lunch?", "Tacos.", [])     # not canned: never stored
+    assert cache.get("what events are happening on campus") == ("Homecoming is Friday.", [])
+    assert cache.get("What is for lunch?") is None
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 2 * DAY)
+    assert cache.get(EVENTS) is None
+    assert AnswerCache(tmp_path).get(POLICY) == ("File the FAFSA.", [])    # read back from disk
+
+    (tmp_path / "index.faiss").write_bytes(b"second")
+    assert cache.get(POLICY) is None
+
+
+def test_precompute_fills_only_missing_or_stale_questions(tmp_path):
+    (tmp_path / "index.faiss").write_bytes(b"first")
+    cache = AnswerCache(tmp_path)
+    cache.put(POLICY, "File the FAFSA.", [], index_version(tmp_path))
+    asked = []
+    n = cache.precompute(lambda q: asked.append(q) or (f"answer to {q}", []))
+    assert n == len(cache.categories) - 1 and POLICY not in asked
+    assert cache.precompute(lambda q: asked.append(q) or ("", [])) == 0
@@ -0,0 +1,74 @@
+import threading
+import time
+
+from langchain.schema import Document
+
+from core.batching import MicroBatcher
+from core.retrievers import Retriever
+
+
+def first_only(items):
+    time.sleep(0.1)
+    return items[:1]
+
+
+def test_short_batch_result_fails_every_call():
+    batcher = MicroBatcher(first_only, window_ms=50)
+    errors = []
+
+    def call(i):
+        try:
+            batcher.submit(i)
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call, args=(i,), daemon=True) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=2)
+    assert not any(t.is_alive() for t in threads)
+    # the first call runs alone (and succeeds); the rest share a batch that comes up short
+    assert len(errors) >= 2 and all("1 results for" in str(e) for e in errors)
+
+
+RERANK_S = 0.3
+
+
+class SlowReranker:
+    def rerank(self, query, items, top_k):
+        time.sleep(RERANK_S)
+        return list(reversed(items))[:top_k], {"reranked": True}
+
+
+class FakeRetriever(Retriever):
+    name = "fake"
+
+    def __init__(self):
+        super().__init__(SlowReranker(), batch_window_ms=50)
+        self.batches = []
+
+    def _batch_search(self, queries, k, category, vecs):
+        self.batches.append(list(queries))
+        return [[Document(page_content=f"{q} {i}") for i in range(k)] for q in queries]
+
+
+def test_coalesced_searches_rerank_per_caller():
+    callers = 4
+    retriever = FakeRetriever()
+    results = {}
+
+    def call(i):
+        results[i] = retriever.search(f"q{i}", k=2)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    assert len(retriever.batches) < callers                      # searches were coalesced
+    assert all(len(docs) == 2 and docs[0].page_content.startswith(f"q{i} ") for i, docs in results.items())
+    assert elapsed < RERANK_S * 5 / 3      # reranks ran side by side; in a shared batch two take 2 * RERANK_S
@@ -0,0 +1,21 @@
+import random
+
+from core.chunk import split_markdown
+
+
+def subword_count(text: str) -> int:
+    """A tokenizer stand-in that is not additive over words: runs of 3 characters, spaces included."""
+    return (len(text) + 2) // 3
+
+
+def test_wrapped_chunks_stay_within_max_tokens():
+    rng = random.Random(3)
+    words = "registrar transcript tuition https://msutexas.edu/registrar/forms a I-20 CMPS-1044 of".split()
+    prose = " ".join(rng.choice(words) for _ in range(3000))
+    unbroken = "x" * 5000
+    paragraphs = "\n\n".join(prose[i:i + rng.randint(20, 120)] for i in range(0, len(prose), 120))
+    for text in (prose, f"# Forms\n\n{prose}", unbroken, f"{prose} {unbroken} {prose}", paragraphs):
+        chunks = split_markdown(text, max_tokens=60, overlap_tokens=10, count=subword_count)
+        assert chunks
+        assert max(subword_count(c) for c in chunks) <= 60
+    assert "".join(split_markdown(unbroken, max_tokens=60, overlap_tokens=10, count=subword_count)) == unbroken
@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import core.clients
+from conftest import json_body, sse_body
+from core.clients import ApiClient, ChatClient, GeminiClient
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(core.clients, "BACKOFF_BASE", 0.01)
+
+
+def responses(*replies):
+    """Handler answering with `replies` in turn (the last one repeats)."""
+    count = {"n": 0}
+
+    def handler(request):
+        count["n"] += 1
+        reply = replies[min(count["n"], len(replies)) - 1]
+        return reply() if callable(reply) else reply
+    return handler
+
+
+def test_retries_5xx_and_429_then_succeeds(fake_server):
+    fake_server.route("POST", "/v1/x", responses(
+        json_body({"error": "down"}, 503),
+        json_body({"error": "slow down"}, 429, {"Retry-After": "0"}),
+        json_body({"ok": True}),
+    ))
+    api = ApiClient("test", fake_server.url, retries=3)
+
+    assert api.post("/v1/x", {}) == {"ok": True}
+    assert fake_server.hits("/v1/x") == 3
+    assert api.stats()["retries"] == 2 and api.stats()["errors"] == 0
+
+
+def test_gives_up_after_the_retry_budget(fake_server):
+    fake_server.route("POST", "/v1/x", responses(json_body({"error": "down"}, 502)))
+    api = ApiClient("test", fake_server.url, retries=2)
+
+    with pytest.raises(RuntimeError, match="failed after 3 attempts: HTTP 502"):
+        api.post("/v1/x", {})
+    assert fake_server.hits("/v1/x") == 3
+    assert api.stats()["errors"] == 1
+
+
+def test_client_errors_are_not_retried(fake_server):
+    fake_server.route("POST", "/v1/x", responses(json_body({"error": "bad request"}, 400)))
+    api = ApiClient("test", fake_server.url, retries=3)
+
+    with pytest.raises(requests.HTTPError):
+        api.post("/v1/x", {})
+    assert fake_server.hits("/v1/x") == 1
+
+
+def test_read_timeout_is_retried_then_reported(fake_server):
+    def slow():
+        time.sleep(0.5)
+        return json_body({"ok": True})
+    fake_server.route("POST", "/v1/x", responses(slow))
+    api = ApiClient("test", fake_server.url, read_timeout=0.1, retries=1)
+
+    started = time.perf_counter()
+    with pytest.raises(RuntimeError, match="failed after 2 attempts: ReadTimeout"):
+        api.post("/v1/x", {})
+    assert fake_server.hits("/v1/x") == 2
+    assert time.perf_counter() - started < 1.0
+
+
+def test_concurrency_cap_limits_requests_in_flight(fake_server):
+    def slow():
+        time.sleep(0.1)
+        return json_body({"ok": True})
+    fake_server.route("POST", "/v1/x", responses(slow))
+    api = ApiClient("test", fake_server.url, concurrency=2)
+
+    threads = [threading.Thread(target=api.post, args=("/v1/x", {})) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fake_server.hits("/v1/x") == 6
+    assert fake_server.max_in_flight == 2
+    assert api.stats()["in_flight"] == 0
+
+
+def test_chat_stream_parses_server_sent_events(fake_server):
+    events = [{"choices": [{"delta": {"role": "assistant"}}]},
+              {"choices": [{"delta": {"content": "Hello"}}]},
+              {"choices": [{"delta": {"content": " world"}}]}]
+    status, headers, chunks = sse_body(events)
+    fake_server.route("POST", "/chat/completions",
+                      lambda request: (status, headers, [b": keep-alive\n\n"] + chunks + [b"data: {\"late\": 1}\n\n"]))
+    chat = ChatClient("gpt-test", ApiClient("openai", fake_server.url))
+
+    assert "".join(chat.stream([{"role": "user", "content": "hi"}])) == "Hello world"
+    assert b'"stream": true' in fake_server.requests[0]["body"]
+    assert chat.api.stats()["first_event_p50_ms"] > 0
+
+
+def test_gemini_stream_sends_the_key_in_a_header(fake_server, monkeypatch):
+    monkeypatch.setattr(core.clients, "GEMINI_BASE_URL", fake_server.url)
+    monkeypatch.setenv("GEMINI_API_KEY", "secret")
+    fake_server.route("POST", "/models/gemini-test:streamGenerateContent", lambda request: sse_body([
+        {"candidates": [{"content": {"parts": [{"text": "Mus"}]}}]},
+        {"candidates": [{"content": {"parts": [{"text": "tangs"}]}}]},
+    ]))
+    gemini = GeminiClient("gemini-test", core.clients._new_api("gemini"))
+
+    assert "".join(gemini.stream("Who?")) == "Mustangs"
+    request = fake_server.requests[0]
+    assert request["query"] == "alt=sse"
+    assert request["headers"]["x-goog-api-key"] == "secret"
@@ -0,0 +1,39 @@
+from langchain.schema import Document
+
+from core.context import MIN_TAIL_TOKENS, build_context
+
+
+def words(text: str) -> int:
+    return len(text.split())
+
+
+def doc(text: str, source: str = "https://msutexas.edu/registrar") -> Document:
+    return Document(page_content=text, metadata={"source": source})
+
+
+PAGE = " ".join(f"w{i}" for i in range(300))
+SHARED = " ".join(f"w{i}" for i in range(100, 150))
+
+
+def test_adjacent_chunks_of_a_page_are_merged_without_their_overlap():
+    first, second = PAGE[:PAGE.index(" w150 ")], PAGE[PAGE.index("w100 "):]
+    other = doc("Housing applications open in March for the fall semester.", "https://msutexas.edu/housing")
+    # ranked out of reading order, with a chunk fully contained in the merged passage
+    passages = build_context([doc(second), other, doc(first), doc(SHARED)], words, budget=1000)
+    assert [p["source"] for p in passages] == ["https://msutexas.edu/registrar", "https://msutexas.edu/housing"]
+    assert passages[0]["text"] == PAGE
+    assert passages[0]["rank"] == 0 and len(passages[0]["docs"]) == 2
+
+
+def test_passages_are_packed_best_first_and_cut_at_the_budget():
+    best = doc(" ".join(["alpha"] * 150), "https://a")
+    cut = doc(" ".join(f"beta{i}" for i in range(300)), "https://b")
+    dropped = doc(" ".join(["gamma"] * 10), "https://c")
+    passages = build_context([best, cut, dropped], words, budget=150 + MIN_TAIL_TOKENS + 20)
+    assert [p["source"] for p in passages] == ["https://a", "https://b"]
+    assert sum(words(p["text"]) for p in passages) <= 150 + MIN_TAIL_TOKENS + 20
+    assert passages[1]["text"].startswith("beta0 beta1") and words(passages[1]["text"]) >= MIN_TAIL_TOKENS
+
+    # a remainder too small to be worth sending is left out
+    passages = build_context([best, cut], words, budget=150 + MIN_TAIL_TOKENS // 2)
+    assert [p["source"] for p in passages] == ["https://a"]
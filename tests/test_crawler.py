@@ -0,0 +1,46 @@
+import time
+
+import core.crawler
+from core.crawler import Crawler
+from core.http_cache import HttpCache
+
+
+def page(body: str, delay: float = 0.0):
+    def handler(request):
+        time.sleep(delay)
+        return 200, {"Content-Type": "text/html"}, f"<html><head><title>T</title></head><body>{body}</body></html>".encode()
+    return handler
+
+
+def test_each_url_fetched_once_within_per_host_cap(fake_server, tmp_path):
+    paths = [f"/p{i}" for i in range(8)]
+    for p in paths:
+        fake_server.route("GET", p, page(f"<article><p>Page {p} " + "text " * 50 + "</p></article>", delay=0.1))
+    seeds = [fake_server.url + p for p in paths]
+
+    crawler = Crawler(max_workers=8, per_host=2, cache=HttpCache(tmp_path))
+    docs = crawler.run(seeds + seeds[:3])
+
+    assert [d["url"] for d in docs] == seeds
+    assert all(fake_server.hits(p) == 1 for p in paths)
+    assert fake_server.max_in_flight <= 2
+    assert not crawler.failed and not crawler.gone
+
+
+def test_gone_and_unparseable_pages_do_not_stop_the_crawl(fake_server, tmp_path, monkeypatch):
+    fake_server.route("GET", "/ok", page("<article><p>" + "fine " * 50 + "</p></article>"))
+    fake_server.route("GET", "/broken", page("<p>broken</p>"))
+    real = core.crawler.page_doc
+
+    def page_doc(resp, cache=None):
+        if resp.url.endswith("/broken"):
+            raise ValueError("malformed page")
+        return real(resp, cache)
+
+    monkeypatch.setattr(core.crawler, "page_doc", page_doc)
+    crawler = Crawler(max_workers=4, per_host=2, cache=HttpCache(tmp_path))
+    docs = crawler.run([fake_server.url + p for p in ("/ok", "/broken", "/missing")])
+
+    assert [d["url"] for d in docs] == [fake_server.url + "/ok"]
+    assert crawler.failed == {fake_server.url + "/broken"}
+    assert crawler.gone == {fake_server.url + "/missing"}
@@ -0,0 +1,44 @@
+import sqlite3
+import time
+
+from langchain.schema import Document
+
+from core.docstore import SQL_BATCH, SqliteDocstore, index_dir, publish_dir
+
+
+def test_mget_reads_more_ids_than_sqlite_binds_in_one_query(tmp_path):
+    store = SqliteDocstore(tmp_path / "docstore.sqlite")
+    store._db.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, SQL_BATCH)
+    ids = [f"c{i}" for i in range(3 * SQL_BATCH + 7)]
+    store.add({i: Document(page_content=f"text {i}", metadata={"source": f"https://x/{i}"}) for i in ids})
+    docs = store.mget(ids + ["missing"])
+    assert [d.page_content for d in docs[:-1]] == [f"text {i}" for i in ids]
+    assert docs[-1] is None
+
+
+def publish(root, content):
+    staging = root / "staging"
+    staging.mkdir()
+    (staging / "index.faiss").write_bytes(content)
+    return publish_dir(root)
+
+
+def test_publish_switches_current_and_keeps_two_generations(tmp_path):
+    (tmp_path / "index.faiss").write_bytes(b"legacy")     # written before generations existed
+    assert index_dir(tmp_path) == tmp_path
+
+    first = publish(tmp_path, b"first")
+    assert index_dir(tmp_path) == first and (tmp_path / "index.faiss").exists()
+    second = publish(tmp_path, b"second")
+    assert index_dir(tmp_path) == second
+    assert not (tmp_path / "index.faiss").exists()        # superseded twice: legacy files go
+    third = publish(tmp_path, b"third")
+    assert sorted(p.name for p in tmp_path.glob("gen-*")) == [second.name, third.name]
+    assert not (tmp_path / "staging").exists()
+
+    # a crash before CURRENT is replaced leaves the previous generation live
+    (tmp_path / f"gen-{time.time_ns()}").mkdir()
+    assert index_dir(tmp_path) == third
+    # and rolling back is pointing CURRENT at the generation still kept
+    (tmp_path / "CURRENT").write_text(second.name + "\n")
+    assert (index_dir(tmp_path) / "index.faiss").read_bytes() == b"second"
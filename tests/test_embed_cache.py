@@ -0,0 +1,39 @@
+from core.embed_cache import EmbeddingCache
+
+
+def vector(text):
+    return [float(len(text)), float(text.count(" ")), 1.0]
+
+
+def test_texts_are_embedded_once_across_runs_and_writers(tmp_path):
+    requested = []
+
+    def embed_fn(texts):
+        requested.extend(texts)
+        return [vector(t) for t in texts]
+
+    ingest = EmbeddingCache("m", 3, root=tmp_path)
+    assert ingest.embed(["drop a class", "drop  a\nclass", "add a class"], embed_fn) == \
+        [vector("drop a class"), vector("drop a class"), vector("add a class")]
+    assert requested == ["drop a class", "add a class"]
+
+    # another writer (the app's query tier) appends; the first picks its rows up
+    other = EmbeddingCache("m", 3, root=tmp_path)
+    other.embed(["financial aid"], embed_fn)
+    ingest.embed(["housing"], embed_fn)
+    assert len(ingest) == 4
+    assert EmbeddingCache("m", 3, root=tmp_path).embed(["financial aid", "add a class"], embed_fn) == \
+        [vector("financial aid"), vector("add a class")]
+    assert requested == ["drop a class", "add a class", "financial aid", "housing"]
+
+
+def test_a_torn_append_is_trimmed_on_open(tmp_path):
+    cache = EmbeddingCache("m", 3, root=tmp_path)
+    cache.put_many(["a", "b"], [[1, 1, 1], [2, 2, 2]])
+    with open(cache.dir / "vectors.f32", "ab") as f:
+        f.write(b"\0" * 6)    # crash halfway through the next row, before its key
+    reopened = EmbeddingCache("m", 3, root=tmp_path)
+    assert len(reopened) == 2
+    reopened.put_many(["c"], [[3, 3, 3]])
+    assert [v.tolist() for v in EmbeddingCache("m", 3, root=tmp_path).get_many(["a", "c"])] == \
+        [[1, 1, 1], [3, 3, 3]]
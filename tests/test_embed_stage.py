@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from conftest import json_body
+from core.embed_cache import EmbeddingCache
+from core.embed_stage import EmbeddingStage, pack_batches
+
+DIMS = 4
+
+
+def vector(text: str):
+    return [float(len(text)), float(ord(text[0])), 0.0, 1.0]
+
+
+def embeddings(fail=lambda body, n: None):
+    """/embeddings handler; fail(body, n) may return a response to send instead (n = request number)."""
+    count = {"n": 0}
+
+    def handler(request):
+        body = json.loads(request["body"])
+        count["n"] += 1
+        failure = fail(body, count["n"])
+        if failure:
+            return failure
+        return json_body({"data": [{"index": i, "embedding": vector(t)} for i, t in enumerate(body["input"])]})
+    return handler
+
+
+def stage(server, tmp_path, **kwargs):
+    cache = EmbeddingCache("text-embedding-3-small", DIMS, root=tmp_path)
+    return EmbeddingStage("text-embedding-3-small", cache, base_url=server.url, api_key="test", **kwargs)
+
+
+def test_pack_batches_respects_token_and_item_caps():
+    assert pack_batches([5, 5, 5, 20, 1], max_tokens=10, max_items=3) == [[0, 1], [2], [3], [4]]
+    assert pack_batches([1] * 7, max_tokens=100, max_items=3) == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_batches_and_dedupes_requests(fake_server, tmp_path):
+    fake_server.route("POST", "/embeddings", embeddings())
+    texts = [f"text {i}" for i in range(10)] + ["text 0", "text 1"]
+
+    vectors = stage(fake_server, tmp_path, batch_size=3, parallel=2).run(texts)
+
+    assert vectors == [vector(t) for t in texts]
+    bodies = [json.loads(r["body"]) for r in fake_server.requests]
+    assert len(bodies) == 4 and all(len(b["input"]) <= 3 for b in bodies)
+    assert sorted(t for b in bodies for t in b["input"]) == sorted(set(texts))
+    assert all(b["dimensions"] == DIMS for b in bodies)
+    assert fake_server.requests[0]["headers"]["Authorization"] == "Bearer test"
+
+
+def test_retries_rate_limited_batches(fake_server, tmp_path):
+    fake_server.route("POST", "/embeddings", embeddings(
+        lambda body, n: json_body({"error": "slow down"}, 429, {"Retry-After": "0"}) if n == 1 else None))
+
+    assert stage(fake_server, tmp_path, max_retries=2).run(["a", "b"]) == [vector("a"), vector("b")]
+    assert fake_server.hits("/embeddings") == 2
+
+
+def test_failed_batches_resume_from_the_cache(fake_server, tmp_path):
+    down = {"on": True}
+    fake_server.route("POST", "/embeddings", embeddings(
+        lambda body, n: json_body({"error": "boom"}, 500) if down["on"] and "bad" in body["input"] else None))
+    texts = ["good 1", "good 2", "bad", "good 3"]
+
+    with pytest.raises(RuntimeError, match="1/2 embedding batches failed"):
+        stage(fake_server, tmp_path, batch_size=2, max_retries=0).run(texts)
+
+    down["on"] = False
+    fake_server.requests.clear()
+    assert stage(fake_server, tmp_path, batch_size=2, max_retries=0).run(texts) == [vector(t) for t in texts]
+    assert [json.loads(r["body"])["input"] for r in fake_server.requests] == [["bad", "good 3"]]
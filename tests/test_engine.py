@@ -0,0 +1,194 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import core.engine
+from conftest import HashEmbeddings
+from core.docstore import index_dir, publish_dir
+from core.engine import EngineClient, RagEngine, make_app
+from core.retrievers import FaissRetriever
+from rate_limiter import (LIMIT_MESSAGE, TOTAL_QUERY_LIMIT, QueryLimitError, consume_query, load_usage_stats,
+                          save_usage_stats)
+
+CANNED = "How do I apply for financial aid?"
+
+
+class StubRetriever(FaissRetriever):
+    """A FaissRetriever over an empty "index": just the generation it was loaded from."""
+
+    @classmethod
+    def load(cls, path=None, reranker=None):
+        return cls(None, path, reranker=reranker, index_path=index_dir(path))
+
+
+def publish(root, content):
+    staging = root / "staging"
+    staging.mkdir()
+    (staging / "index.faiss").write_bytes(content)
+    return publish_dir(root)
+
+
+def test_engine_reloads_a_published_generation(tmp_path):
+    first = publish(tmp_path, b"first")
+    engine = RagEngine(StubRetriever.load(tmp_path))
+    old_version = engine.retriever.version()
+    engine.answers.put(CANNED, "old answer", [], old_version)
+    assert engine.answer(CANNED) == ("old answer", [])
+
+    second = publish(tmp_path, b"second")
+    retriever = engine.current_retriever()
+    assert retriever.index_path == second != first
+    assert retriever.version() != old_version
+    # the answer generated from the old generation is not served for the new one
+    assert engine.answers.get(CANNED, retriever.version()) is None
+    assert engine.current_retriever() is retriever
+
+
+class FakeRetriever:
+    """Just what RagEngine calls on a retriever; every query embeds to the same vector."""
+
+    name = "fake"
+    reranker = None
+
+    def __init__(self, path):
+        self.path = path
+        self.index = "v1"
+
+    def outdated(self):
+        return False
+
+    def version(self):
+        return self.index
+
+    def lexical_only(self, q):
+        return False
+
+    def embed(self, q):
+        return [1.0, 0.0]
+
+    def search(self, q, k, category=None, vec=None):
+        return []
+
+    def stats(self):
+        return {"backend": self.name}
+
+
+def counted_engine(tmp_path, monkeypatch, gate):
+    engine = RagEngine(FakeRetriever(tmp_path))
+    calls = {"generate": [], "consume": 0}
+    generate = engine._generate
+
+    def _generate(retriever, q, k, version):
+        calls["generate"].append((q, k, version))
+        return generate(retriever, q, k, version)
+
+    def consume_query():
+        calls["consume"] += 1
+        return True, None
+
+    def stream_with_citations(q, docs):
+        def parts():
+            gate.wait(2)
+            yield from ("The drop ", "deadline is ", "March 28.")
+        return parts(), [{"source": "https://msutexas.edu/registrar"}]
+
+    engine._generate = _generate
+    monkeypatch.setattr(core.engine, "consume_query", consume_query)
+    monkeypatch.setattr(core.engine, "stream_with_citations", stream_with_citations)
+    return engine, calls
+
+
+def ask(engine, answers, q, k=6):
+    answer, _ = engine.answer(q, k)
+    answers.append("".join(answer))
+
+
+def wait_for(condition):
+    deadline = time.time() + 2
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def test_identical_questions_in_flight_share_one_generation(tmp_path, monkeypatch):
+    gate = threading.Event()
+    engine, calls = counted_engine(tmp_path, monkeypatch, gate)
+    answers = []
+    threads = [threading.Thread(target=ask, args=(engine, answers, q), daemon=True)
+               for q in ("When is the drop deadline?", "when is the DROP deadline", "When is the drop deadline")]
+    for t in threads:
+        t.start()
+    wait_for(lambda: engine.flights.stats()["joined"] == 2)
+    gate.set()
+    for t in threads:
+        t.join(2)
+    assert answers == ["The drop deadline is March 28."] * 3
+    assert len(calls["generate"]) == 1 and calls["consume"] == 1
+
+
+def test_other_k_or_index_version_is_generated_separately(tmp_path, monkeypatch):
+    gate = threading.Event()
+    engine, calls = counted_engine(tmp_path, monkeypatch, gate)
+    answers = []
+    q = "When is the drop deadline?"
+    threads = [threading.Thread(target=ask, args=(engine, answers, q, k), daemon=True) for k in (6, 4)]
+    for t in threads:
+        t.start()
+    wait_for(lambda: len(calls["generate"]) == 2)
+    engine.retriever.index = "v2"
+    threads.append(threading.Thread(target=ask, args=(engine, answers, q), daemon=True))
+    threads[-1].start()
+    wait_for(lambda: len(calls["generate"]) == 3)
+    gate.set()
+    for t in threads:
+        t.join(2)
+    assert sorted((k, v) for _, k, v in calls["generate"]) == [(4, "v1"), (6, "v1"), (6, "v2")]
+    assert calls["consume"] == 3 and engine.flights.stats()["joined"] == 0
+
+
+class WordRetriever(FakeRetriever):
+    searched = 0
+
+    def embed(self, q):
+        return HashEmbeddings().embed_query(q)
+
+    def search(self, q, k, category=None, vec=None):
+        self.searched += 1
+        return []
+
+
+def serve(app):
+    """Run an aiohttp app on a background event loop; returns its base URL."""
+    from aiohttp import web
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    loop.run_until_complete(site.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+
+def test_engine_stops_answering_at_the_query_limit(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_usage_stats({"total_queries": TOTAL_QUERY_LIMIT - 1})
+    assert consume_query() == (True, None)
+    assert consume_query() == (False, LIMIT_MESSAGE)
+    save_usage_stats({"total_queries": TOTAL_QUERY_LIMIT - 1})
+
+    retriever = WordRetriever(tmp_path)
+    engine = RagEngine(retriever)
+    monkeypatch.setattr(core.engine, "stream_with_citations", lambda q, docs: (iter(["Ask the registrar."]), []))
+    client = EngineClient(serve(make_app(engine, workers=2)))
+
+    answer, _ = client.answer("When is the drop deadline?")
+    assert "".join(answer) == "Ask the registrar."
+    assert client.usage() == {"total_queries": TOTAL_QUERY_LIMIT, "remaining": 0}
+    with pytest.raises(QueryLimitError, match="Demo limit reached"):
+        client.answer("Where is the library?")
+    # a repeat is served from the semantic cache, which doesn't count
+    answer, _ = client.answer("When is the drop deadline?")
+    assert "".join(answer) == "Ask the registrar."
+    assert retriever.searched == 1 and load_usage_stats()["total_queries"] == TOTAL_QUERY_LIMIT
@@ -0,0 +1,40 @@
+import faiss
+import numpy as np
+import pytest
+
+from core.faiss_index import benchmark, build_index, parse_spec, resolve
+
+
+def clustered(n=4000, dims=32, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(40, dims))
+    return (centers[rng.integers(0, 40, n)] + 0.3 * rng.normal(size=(n, dims))).astype(np.float32)
+
+
+def test_specs_resolve_defaults_and_reject_unknown_types():
+    assert parse_spec("IVF:nlist=64, nprobe=8") == ("ivf", {"nlist": 64, "nprobe": 8})
+    assert resolve("ivfpq", 4000, 384)[1] == {"nlist": 102, "nprobe": 10, "m": 64, "nbits": 8}
+    with pytest.raises(ValueError, match="Unknown FAISS index type"):
+        parse_spec("annoy")
+
+
+def test_each_type_builds_and_keeps_its_search_params():
+    x = clustered()
+    for spec, cls in (("flat", faiss.IndexFlat), ("ivf:nlist=32,nprobe=4", faiss.IndexIVFFlat),
+                      ("hnsw:m=16,ef_search=48", faiss.IndexHNSWFlat), ("ivfpq:nlist=32,m=8", faiss.IndexIVFPQ)):
+        index, resolved = build_index(spec, x)
+        reloaded = faiss.deserialize_index(faiss.serialize_index(index))
+        loaded = faiss.downcast_index(reloaded)
+        assert isinstance(loaded, cls) and reloaded.ntotal == len(x)
+        if cls is faiss.IndexIVFFlat:
+            assert loaded.nprobe == 4
+        if cls is faiss.IndexHNSWFlat:
+            assert loaded.hnsw.efSearch == 48
+    # too few vectors to train 32 lists: falls back to exact search
+    assert build_index("ivf:nlist=32", x[:20])[1] == "flat"
+
+
+def test_benchmark_reports_recall_against_exact_search():
+    rows = {r["spec"].split(":")[0]: r for r in benchmark(clustered(), ["flat", "hnsw", "ivf"], queries=50)}
+    assert rows["flat"]["recall"] == 1.0
+    assert rows["hnsw"]["recall"] > 0.9 and rows["ivf"]["recall"] > 0.8
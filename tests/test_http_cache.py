@@ -0,0 +1,17 @@
+from core.http_cache import HttpCache
+
+
+def test_response_without_validators_drops_the_cached_copy(fake_server, tmp_path):
+    responses = [(200, {"ETag": '"v1"'}, b"first"), (200, {}, b"second"), (304, {}, b"")]
+    fake_server.route("GET", "/page", lambda request: responses.pop(0))
+    cache = HttpCache(tmp_path)
+    url = fake_server.url + "/page"
+
+    assert cache.get(url).content == b"first"
+    cache.save_parsed(url, "doc", {"text": "first"})
+    assert cache.get(url).content == b"second"
+    assert cache.load_parsed(url, "doc") is None
+    assert not list(tmp_path.rglob("*.*"))
+    # nothing left to revalidate, so the next fetch is unconditional
+    cache.get(url)
+    assert "If-None-Match" not in fake_server.requests[-1]["headers"]
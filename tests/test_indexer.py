@@ -0,0 +1,25 @@
+import pytest
+
+pytest.importorskip("chromadb")
+
+from core.indexer import _dedupe  # noqa: E402
+
+BOILERPLATE = "Contact the Office of the Registrar at Midwestern State University for transcripts " * 4
+
+
+def chunk(cid, url, text):
+    return {"id": cid, "text": text, "meta": {"url": url}}
+
+
+def test_duplicates_are_merged_into_the_kept_copy_new_or_existing():
+    existing = [chunk("old-1", "https://a/kept", BOILERPLATE)]
+    chunks = {c["id"]: c for c in (chunk("new-1", "https://a/one", "Spring drop deadline is March 28 " * 4),
+                                    chunk("new-2", "https://a/one", BOILERPLATE),
+                                    chunk("new-3", "https://a/two", "Spring drop deadline is March 28 " * 4))}
+
+    kept, merged = _dedupe(chunks, 0.8, existing)
+
+    assert list(kept) == ["new-1"]
+    assert kept["new-1"]["meta"]["urls"] == "https://a/one | https://a/two"
+    assert merged == {"old-1": existing[0]}
+    assert existing[0]["meta"]["urls"] == "https://a/kept | https://a/one"
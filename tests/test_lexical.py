@@ -0,0 +1,29 @@
+from core.lexical import LexicalIndex, rrf, tokenize
+
+CHUNKS = [
+    ("cpt", "CPT/OPT work authorization for international students"),
+    ("cmps", "CMPS 1044 Computer Science I meets MWF; CMPS 1044 lab on Thursday"),
+    ("email", "Email registrar@msutexas.edu for transcripts"),
+    ("science", "The College of Science and Mathematics"),
+]
+
+
+def test_identifiers_tokenize_whole_and_in_parts():
+    assert tokenize("Is CPT/OPT open to me?") == ["cpt/opt", "cpt", "opt", "open"]
+
+
+def test_bm25_ranks_exact_tokens_and_survives_a_save(tmp_path):
+    index = LexicalIndex.build(CHUNKS)
+    assert [i for i, _ in index.search("opt", 2)] == ["cpt"]
+    assert index.search("computer science", 2)[0][0] == "cmps"     # term frequency and both terms
+    assert index.search("what is it", 5) == []                      # stopwords only
+
+    index.save(tmp_path / "bm25")
+    loaded = LexicalIndex.load(tmp_path / "bm25")
+    assert loaded.search("registrar@msutexas.edu", 3) == index.search("registrar@msutexas.edu", 3)
+    assert loaded.decisive("CMPS 1044", loaded.search("CMPS 1044", 1))
+    assert not loaded.decisive("computer science classes", loaded.search("computer science classes", 1))
+
+
+def test_rrf_favours_ids_both_rankings_agree_on():
+    assert rrf([["a", "b", "c"], ["d", "b", "c"]]) == ["b", "c", "a", "d"]
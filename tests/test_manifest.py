@@ -0,0 +1,27 @@
+from core.manifest import ChunkManifest, content_hash
+
+
+def chunks(source, texts):
+    return [(f"{source}:{t}", source, content_hash(t)) for t in texts]
+
+
+def test_plan_touches_only_changed_chunks_and_vanished_sources(tmp_path):
+    manifest = ChunkManifest(tmp_path / "manifest.json")
+    first = chunks("a", ["one", "two"]) + chunks("b", ["three"]) + chunks("c", ["four"]) + chunks("d", ["five"])
+    manifest.apply(manifest.plan(first))
+
+    # a: "two" edited; b: not fetched but kept (e.g. its fetch failed); c: refreshed, now empty; d: gone
+    manifest = ChunkManifest(tmp_path / "manifest.json")
+    plan = manifest.plan(chunks("a", ["one", "two!"]), refreshed=["a", "c"], keep=["b"])
+    assert plan.upsert == ["a:two!"]
+    assert sorted(plan.delete) == ["a:two", "c:four", "d:five"]
+    assert plan.unchanged == 1
+    manifest.apply(plan)
+    assert ChunkManifest(tmp_path / "manifest.json").sources == {
+        "a": {"a:one": content_hash("one"), "a:two!": content_hash("two!")},
+        "b": {"b:three": content_hash("three")},
+    }
+
+    # a batch of a larger run leaves every source it didn't see alone
+    plan = manifest.plan(chunks("a", ["one", "two!"]), refreshed=["a"], partial=True)
+    assert not plan and set(plan.sources) == {"a", "b"}
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from core.pipeline import batched, run_stage
+
+
+def test_slow_consumer_bounds_what_the_stage_reads_ahead():
+    pulled = []
+
+    def source():
+        for i in range(1000):
+            pulled.append(i)
+            yield i
+
+    results = run_stage(lambda i: None if i % 10 == 3 else i * 2, source(), workers=4, maxsize=3)
+    first = [next(results) for _ in range(5)]
+    time.sleep(0.3)
+    # what was consumed, 3 buffered results and a few in flight: far from the whole input
+    assert first == [0, 2, 4, 8, 10] and len(pulled) <= 16
+    results.close()
+
+
+def test_errors_reach_the_consumer_and_stop_the_producer():
+    pulled = []
+
+    def source():
+        for i in range(1000):
+            pulled.append(i)
+            yield i
+
+    def fn(i):
+        if i == 5:
+            raise ValueError("bad page")
+        return i
+
+    with pytest.raises(ValueError, match="bad page"):
+        list(run_stage(fn, source(), workers=2, maxsize=2))
+    time.sleep(0.5)
+    assert len(pulled) < 20
+    assert not [t for t in threading.enumerate() if t.daemon and t.is_alive() and "produce" in t.name]
+
+
+def test_batched_groups_by_weight():
+    assert list(batched(["ab", "c", "def", "g"], 3, weight=len)) == [["ab", "c"], ["def"], ["g"]]
@@ -0,0 +1,37 @@
+import numpy as np
+
+from core.embed_cache import EmbeddingCache, text_key
+from core.query_cache import QueryEmbeddingCache
+
+
+def vector(q):
+    return [float(len(q)), float(sum(map(ord, q)) % 97), 1.0]
+
+
+def test_disk_tier_is_compacted_keeping_recent_queries(tmp_path):
+    cache = QueryEmbeddingCache("m", max_entries=2, disk_dir=tmp_path, disk_rows=10)
+    for i in range(10):
+        cache.embed(f"q{i}", vector)
+    cache.embed("q0", vector)          # back in the memory LRU
+    cache.embed("q10", vector)         # 11th row: compact to 5
+
+    disk = EmbeddingCache("m", 3, root=tmp_path)
+    assert len(disk) == 5
+    assert [v.tolist() for v in disk.get_many(["q0", "q10", "q9"])] == [vector("q0"), vector("q10"), vector("q9")]
+    assert disk.get_many(["q1"]) == [None]
+
+
+def test_interrupted_compaction_is_rolled_forward_only_once_committed(tmp_path):
+    cache = EmbeddingCache("m", 3, root=tmp_path)
+    cache.put_many(["a", "b"], [[1, 1, 1], [2, 2, 2]])
+
+    def stage():
+        np.zeros((1, 3), np.float32).tofile(cache.dir / "vectors.f32.compact")
+        (cache.dir / "keys.txt.compact").write_text(text_key("z") + "\n")
+
+    stage()
+    assert len(EmbeddingCache("m", 3, root=tmp_path)) == 2
+    stage()
+    (cache.dir / "compact.commit").touch()
+    reopened = EmbeddingCache("m", 3, root=tmp_path)
+    assert len(reopened) == 1 and reopened.get_many(["z"])[0].tolist() == [0.0, 0.0, 0.0]
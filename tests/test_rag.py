@@ -0,0 +1,59 @@
+from langchain.schema import Document
+
+import core.rag
+from conftest import sse_body
+from core.clients import ApiClient, ChatClient
+from core.lexical import LexicalIndex
+from core.rag import search_batch, stream_with_citations
+
+CHUNKS = {
+    "catalog-1": "CMPS 1044 Computer Science I, catalog course description",
+    "admissions-1": "Admissions office hours and contact",
+    "admissions-2": "Transfer credit for CMPS courses is evaluated by admissions",
+}
+
+
+class StubStore:
+    _normalize_L2 = False
+
+    def get_by_ids(self, ids):
+        return [Document(id=i, page_content=CHUNKS[i]) for i in ids]
+
+
+class StubShards:
+    indexes = {"admissions": None, "academics": None}
+    shard_of = {"catalog-1": "academics", "admissions-1": "admissions", "admissions-2": "admissions"}
+
+    def members(self, shard, ids):
+        return {i for i in ids if self.shard_of[i] == shard}
+
+    def search_batch(self, x, n, category):
+        return [["admissions-1"] for _ in x]
+
+
+def test_identifier_query_skips_embedding_only_when_decisive_in_the_shard(monkeypatch):
+    embedded = []
+    monkeypatch.setattr(core.rag, "embed_queries", lambda vs, queries: embedded.extend(queries) or [[1.0]] * len(queries))
+    lexical = LexicalIndex.build(CHUNKS.items())
+
+    [docs] = search_batch(StubStore(), ["CMPS 1044"], 2, lexical, shards=StubShards(), category="academics")
+    assert [d.id for d in docs] == ["catalog-1"] and not embedded
+
+    # the whole index's top hit is outside the admissions shard: fall back to hybrid search
+    [docs] = search_batch(StubStore(), ["CMPS 1044"], 2, lexical, shards=StubShards(), category="admissions")
+    assert embedded == ["CMPS 1044"]
+    assert {d.id for d in docs} == {"admissions-1", "admissions-2"}
+
+
+def test_answer_streams_after_the_citations_are_known(fake_server, monkeypatch):
+    events = [{"choices": [{"delta": {"content": part}}]} for part in ("CMPS 1044 ", "is Computer ", "Science I.")]
+    fake_server.route("POST", "/chat/completions", lambda request: sse_body(events))
+    monkeypatch.setattr(core.rag, "get_chat_client", lambda model: ChatClient(model, ApiClient("openai", fake_server.url)))
+    docs = StubStore().get_by_ids(["catalog-1", "admissions-2"])
+
+    stream, cites = stream_with_citations("What is CMPS 1044?", docs)
+    assert [c["preview"] for c in cites] == [CHUNKS["catalog-1"], CHUNKS["admissions-2"]]
+    assert fake_server.hits("/chat/completions") == 0     # nothing sent until the first chunk is read
+    assert list(stream) == ["CMPS 1044 ", "is Computer ", "Science I."]
+    body = fake_server.requests[0]["body"].decode()
+    assert '"stream": true' in body and "CMPS 1044 Computer Science I" in body
@@ -0,0 +1,49 @@
+import pytest
+
+import core.query_cache
+from conftest import HashEmbeddings, publish_index
+from core.docstore import load_faiss
+from core.lexical import LexicalIndex
+from core.query_cache import QueryEmbeddingCache
+from core.retrievers import FaissRetriever, load_retriever
+from core.shards import ShardedIndex
+from test_shards import CHUNKS
+
+
+def open_retriever(root, live):
+    vs = load_faiss(root, HashEmbeddings())
+    return FaissRetriever(vs, root, LexicalIndex.load(live / "bm25"), ShardedIndex.load(live, vs.docstore))
+
+
+@pytest.fixture(autouse=True)
+def query_cache(monkeypatch):
+    monkeypatch.setitem(core.query_cache._caches, HashEmbeddings.model,
+                        QueryEmbeddingCache(HashEmbeddings.model, disk_dir=None))
+
+
+def test_faiss_backend_searches_the_published_index(tmp_path):
+    retriever = open_retriever(tmp_path, publish_index(tmp_path, CHUNKS))
+    queries = ["financial aid FAFSA", "freshmen housing on campus"]
+
+    results = [retriever.search(q, k=2) for q in queries]
+    assert [docs[0].id for docs in results] == ["aid-1", "house-1"]
+    assert results[0][0].metadata["source"] == "https://msutexas.edu/financial-aid"
+    assert [[d.id for d in docs] for docs in retriever.batch_search(queries, k=2)] == \
+        [[d.id for d in docs] for docs in results]
+    assert {d.id for d in retriever.search("requirements transcripts", k=4, category="admissions")} == \
+        {"adm-1", "adm-2"}
+    assert retriever.stats()["chunks"] == len(CHUNKS) and retriever.stats()["queries"] >= 5
+
+
+def test_new_generation_changes_version_and_marks_the_retriever_outdated(tmp_path):
+    retriever = open_retriever(tmp_path, publish_index(tmp_path, CHUNKS))
+    version = retriever.version()
+    assert not retriever.outdated()
+    publish_index(tmp_path, dict(CHUNKS, **{"aid-2": ("Scholarship deadlines", {"source": "https://x/aid"})}))
+    assert retriever.outdated() and retriever.version() == version
+    assert open_retriever(tmp_path, tmp_path / (tmp_path / "CURRENT").read_text().strip()).version() != version
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown retriever backend"):
+        load_retriever("elasticsearch")
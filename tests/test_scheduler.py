@@ -0,0 +1,25 @@
+from core.scheduler import CrawlScheduler, _scope
+
+
+def test_scope_reads_the_seed_path_as_a_directory():
+    assert _scope("https://a.edu/library") == _scope("https://a.edu/library/") == ("a.edu", "/library/")
+    assert _scope("https://a.edu/housing/apply.php") == ("a.edu", "/housing/")
+
+
+def test_whole_host_scope_needs_an_opt_in():
+    assert _scope("https://a.edu/") is None
+    assert _scope("https://a.edu/index.php") is None
+    assert _scope("https://a.edu/", whole_hosts={"a.edu"}) == ("a.edu", "/")
+
+
+def test_root_seed_discovers_nothing_without_opt_in(tmp_path):
+    scheduler = CrawlScheduler(tmp_path / "state.json")
+    scheduler.sync_seeds([("https://a.edu/", "Home"), ("https://a.edu/library", "Library")])
+
+    assert scheduler.add("https://a.edu/library/hours", 1)
+    assert not scheduler.add("https://a.edu/athletics/", 1)
+    assert not scheduler.add("https://a.edu/libraryx", 1)
+
+    opted_in = CrawlScheduler(tmp_path / "state2.json", whole_hosts={"a.edu"})
+    opted_in.sync_seeds([("https://a.edu/", "Home")])
+    assert opted_in.add("https://a.edu/athletics/", 1)
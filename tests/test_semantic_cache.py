@@ -0,0 +1,28 @@
+import numpy as np
+
+from core.semantic_cache import SemanticAnswerCache
+
+
+def near(vec, cos):
+    """A unit vector at cosine `cos` from unit vector `vec`."""
+    other = np.zeros_like(vec)
+    other[np.argmin(np.abs(vec))] = 1.0
+    other -= (other @ vec) * vec
+    other /= np.linalg.norm(other)
+    return cos * vec + np.sqrt(1 - cos * cos) * other
+
+
+def test_hits_need_the_same_k_category_and_a_close_enough_question():
+    rng = np.random.default_rng(0)
+    spring = rng.normal(size=16).astype(np.float32)
+    spring /= np.linalg.norm(spring)
+    cache = SemanticAnswerCache(threshold=0.92)
+    cache.put("drop deadline spring", spring, "March 28", [], "v1", k=6, category="registrar")
+
+    assert cache.get(near(spring, 0.97), "v1", k=6, category="registrar") == ("March 28", [])
+    # "drop deadline fall": a near miss that must get its own answer
+    assert cache.get(near(spring, 0.88), "v1", k=6, category="registrar") is None
+    assert cache.get(spring, "v1", k=4, category="registrar") is None
+    assert cache.get(spring, "v1", k=6, category=None) is None
+    assert cache.get(spring, "v2", k=6, category="registrar") is None
+    assert cache.stats()["hits"] == 1
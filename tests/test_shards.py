@@ -0,0 +1,45 @@
+import numpy as np
+
+from conftest import HashEmbeddings, publish_index
+from core.docstore import load_faiss
+from core.shards import ShardedIndex
+
+CHUNKS = {
+    "adm-1": ("Admission requirements for freshmen: transcripts and test scores",
+              {"source": "https://msutexas.edu/admissions/freshmen", "category": "admissions"}),
+    "adm-2": ("Transfer admission requirements and transcripts",
+              {"source": "https://msutexas.edu/admissions/transfer", "category": "admissions"}),
+    "aid-1": ("Financial aid requirements: file the FAFSA and send transcripts",
+              {"source": "https://msutexas.edu/financial-aid", "category": "financial_aid"}),
+    "house-1": ("Housing requirements for freshmen living on campus",
+                {"source": "https://msutexas.edu/housing", "category": "housing"}),
+}
+
+
+def query(text):
+    return np.asarray([HashEmbeddings().embed_query(text)], dtype=np.float32)
+
+
+def test_category_searches_its_shard_and_fan_out_merges_all(tmp_path):
+    live = publish_index(tmp_path, CHUNKS)
+    vs = load_faiss(tmp_path, HashEmbeddings())
+    shards = ShardedIndex.load(live, vs.docstore)
+    assert sorted(shards.categories) == ["admissions", "financial_aid", "housing"]
+
+    x = query("freshmen requirements transcripts")
+    assert set(shards.search(x, 4, "admissions")) == {"adm-1", "adm-2"}
+    merged = shards.search(x, 4)
+    assert sorted(merged) == sorted(CHUNKS)
+    # the fan-out keeps global distance order: same ranking as the unsharded index
+    _, idx = vs.index.search(x, 4)
+    assert merged == [vs.index_to_docstore_id[i] for i in idx[0]]
+    assert shards.members("housing", list(CHUNKS)) == {"house-1"}
+    # an unknown category searches everything
+    assert shards.search(x, 4, "athletics") == merged
+
+
+def test_shards_out_of_step_with_their_id_maps_are_not_used(tmp_path):
+    live = publish_index(tmp_path, CHUNKS)
+    store = load_faiss(tmp_path, HashEmbeddings(), writable=True).docstore
+    store.set_shard_ids({"admissions": ["adm-1"]})
+    assert ShardedIndex.load(live, store) is None
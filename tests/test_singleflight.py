@@ -0,0 +1,62 @@
+import threading
+import time
+
+import pytest
+
+from core.singleflight import SingleFlight
+
+
+def stream(parts, gate, fail_after=None):
+    for i, part in enumerate(parts):
+        gate.wait(2)
+        if i == fail_after:
+            raise ConnectionError("upstream closed")
+        yield part
+
+
+def joined(flights, n):
+    deadline = time.time() + 2
+    while flights.stats()["joined"] < n and time.time() < deadline:
+        time.sleep(0.01)
+    return flights.stats()["joined"] == n
+
+
+def test_follower_reads_everything_after_the_leader_stops_reading():
+    flights, gate, calls = SingleFlight(), threading.Event(), []
+
+    def fn():
+        calls.append(1)
+        return stream(["a", "b", "c"], gate), [{"source": "s"}]
+
+    leader, cites = flights.do("q", fn)
+    follower, follower_cites = flights.do("q", fn)
+    gate.set()
+    assert next(leader) == "a"
+    leader.close()   # the leader's session goes away mid-answer
+    assert "".join(follower) == "abc" and follower_cites == cites
+    assert len(calls) == 1 and flights.stats()["in_flight"] == 0
+
+
+def test_upstream_error_reaches_every_caller_after_the_parts_generated():
+    flights, gate = SingleFlight(), threading.Event()
+    leader, _ = flights.do("q", lambda: (stream(["a", "b", "c"], gate, fail_after=2), []))
+    out = {}
+
+    def follow():
+        answer, _ = flights.do("q", lambda: pytest.fail("second generation"))
+        parts = []
+        try:
+            for part in answer:
+                parts.append(part)
+        except ConnectionError:
+            out["parts"] = parts
+
+    t = threading.Thread(target=follow, daemon=True)
+    t.start()
+    assert joined(flights, 1)
+    gate.set()
+    t.join(2)
+    with pytest.raises(ConnectionError):
+        list(leader)
+    assert out["parts"] == ["a", "b"]
+    assert flights.stats() == {"leaders": 1, "joined": 1, "in_flight": 0}